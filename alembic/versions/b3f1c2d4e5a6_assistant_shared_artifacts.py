@@ -0,0 +1,54 @@
+# Plantilla de archivos de versión (migraciones)
+
+"""assistant shared artifacts
+
+Revision ID: b3f1c2d4e5a6
+Revises: 37964a4ad2f9
+Create Date: 2026-10-19 10:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'b3f1c2d4e5a6'
+down_revision = '37964a4ad2f9'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'assistant_artifacts',
+        sa.Column('id', sa.String(length=64), primary_key=True),
+        sa.Column('topic_id', sa.Integer(), nullable=False),
+        sa.Column('style', sa.String(length=16), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('prompt_version', sa.String(length=16), nullable=False),
+        sa.Column('variant', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('payload', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now(), nullable=False),
+
+        sa.ForeignKeyConstraint(['topic_id'], ['topics.id'], name='fk_assistant_artifacts_topic_id'),
+        sa.UniqueConstraint('topic_id', 'style', 'content_hash', 'prompt_version', 'variant',
+                            name='uq_assistant_artifacts_key'),
+    )
+    op.create_index('ix_assistant_artifacts_status', 'assistant_artifacts', ['status'])
+
+    op.add_column('assistant_explanations', sa.Column('artifact_id', sa.String(length=64), nullable=True))
+    op.create_foreign_key(
+        'fk_assistant_expl_artifact_id', 'assistant_explanations', 'assistant_artifacts',
+        ['artifact_id'], ['id'],
+    )
+    op.create_index('ix_assistant_expl_artifact_id', 'assistant_explanations', ['artifact_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_assistant_expl_artifact_id', table_name='assistant_explanations')
+    op.drop_constraint('fk_assistant_expl_artifact_id', 'assistant_explanations', type_='foreignkey')
+    op.drop_column('assistant_explanations', 'artifact_id')
+    op.drop_index('ix_assistant_artifacts_status', table_name='assistant_artifacts')
+    op.drop_table('assistant_artifacts')
@@ -0,0 +1,223 @@
+# app/ai/cache.py
+"""
+Caché de respuestas de Gemini (generateContent).
+Clave = sha256(modelo + payload canónico [prompt + generationConfig] + salt opcional).
+- Nivel memoria: LRU acotado por nº de entradas y por bytes (tamaño del JSON). Las
+                 respuestas con imagen (inlineData en base64, varios MB) van solo a disco.
+- Nivel disco:   un JSON por clave (AI_CACHE_DIR/ab/abcd....json), acotado por MB;
+                 al pasarse se borran los menos usados (mtime se refresca en cada hit).
+- TTL común a ambos niveles.
+Solo se guardan respuestas útiles (con candidatos); los errores nunca se cachean.
+"""
+import os, json, time, hashlib, threading, logging
+from collections import OrderedDict
+from pathlib import Path
+
+from app.core.settings_static import REPO_ROOT
+
+log = logging.getLogger("genai.cache")
+
+AI_CACHE_ENABLED   = os.getenv("AI_CACHE", "1") == "1"
+AI_CACHE_DIR       = Path(os.getenv("AI_CACHE_DIR", REPO_ROOT / ".cache" / "genai")).resolve()
+AI_CACHE_TTL_SEC   = int(os.getenv("AI_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+AI_CACHE_MEM_ITEMS = int(os.getenv("AI_CACHE_MEM_ITEMS", "256"))
+AI_CACHE_MEM_MB    = int(os.getenv("AI_CACHE_MEM_MB", "32"))   # por worker
+AI_CACHE_DISK_MB   = int(os.getenv("AI_CACHE_DISK_MB", "512"))
+
+def cache_key(model: str, payload: dict, salt: str | None = None) -> str:
+    canon = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    h = hashlib.sha256()
+    h.update(model.encode("utf-8")); h.update(b"\0")
+    h.update(canon.encode("utf-8"))
+    if salt:
+        h.update(b"\0"); h.update(salt.encode("utf-8"))
+    return h.hexdigest()
+
+def _has_inline_data(data: dict) -> bool:
+    for cand in (data or {}).get("candidates") or []:
+        for p in (cand.get("content") or {}).get("parts") or []:
+            if p.get("inlineData") or p.get("inline_data"):
+                return True
+    return False
+
+def is_cacheable(data: dict) -> bool:
+    """Respuestas vacías/bloqueadas no se guardan (un reintento podría salir bien)."""
+    cands = (data or {}).get("candidates") or []
+    if not cands:
+        return False
+    parts = (cands[0].get("content") or {}).get("parts") or []
+    return any((p.get("text") or "").strip() or p.get("inlineData") or p.get("inline_data") for p in parts)
+
+class ResponseCache:
+    def __init__(self, directory: Path, ttl_sec: int, mem_items: int, disk_mb: int, mem_mb: int = 32):
+        self.dir = directory
+        self.ttl = ttl_sec
+        self.mem_items = max(0, mem_items)
+        self.mem_bytes = max(0, mem_mb) * 1024 * 1024
+        # una sola entrada no puede ocupar más de 1/16 del nivel memoria
+        self.mem_item_max = self.mem_bytes // 16
+        self.disk_bytes = max(0, disk_mb) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._mem: OrderedDict[str, tuple[float, dict, int]] = OrderedDict()
+        self._mem_used = 0
+        self._disk_used: int | None = None  # se calcula perezosamente
+        self.hits_mem = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key}.json"
+
+    # ---- lectura ----
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                ts, data, _ = hit
+                if now - ts <= self.ttl:
+                    self._mem.move_to_end(key)
+                    self.hits_mem += 1
+                    return data
+                self._forget(key)
+
+        p = self._path(key)
+        try:
+            st = p.stat()
+            raw = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        ts = float(raw.get("ts") or 0)
+        if now - ts > self.ttl:
+            self._unlink(p, st.st_size)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(p, None)  # LRU en disco
+        except OSError:
+            pass
+        data = raw.get("data")
+        with self._lock:
+            self.hits_disk += 1
+            self._remember(key, ts, data, st.st_size)
+        return data
+
+    # ---- escritura ----
+    def put(self, key: str, data: dict):
+        ts = time.time()
+        blob = json.dumps({"ts": ts, "data": data}, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self._remember(key, ts, data, len(blob))
+            self.stores += 1
+        if not self.disk_bytes:
+            return
+        p = self._path(key)
+        try:
+            p.parent.mkdir(parents=True, exist_ok=True)
+            tmp = p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(blob)
+            os.replace(tmp, p)  # atómico: otro worker nunca ve un JSON a medias
+        except OSError as e:
+            log.warning("[genai.cache] no se pudo escribir %s: %s", p, e)
+            return
+        with self._lock:
+            if self._disk_used is not None:
+                self._disk_used += len(blob)
+            over = self._disk_used is None or self._disk_used > self.disk_bytes
+        if over:
+            self._enforce_quota()
+
+    def _remember(self, key: str, ts: float, data: dict, size: int):
+        self._forget(key)
+        if not self.mem_items or size > self.mem_item_max or _has_inline_data(data):
+            return  # imágenes y respuestas enormes: solo disco
+        self._mem[key] = (ts, data, size)
+        self._mem_used += size
+        while len(self._mem) > self.mem_items or self._mem_used > self.mem_bytes:
+            _, (_, _, old) = self._mem.popitem(last=False)
+            self._mem_used -= old
+
+    def _forget(self, key: str):
+        hit = self._mem.pop(key, None)
+        if hit is not None:
+            self._mem_used -= hit[2]
+
+    def _unlink(self, p: Path, size: int):
+        try:
+            p.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self.evictions += 1
+            if self._disk_used is not None:
+                self._disk_used -= size
+
+    def _enforce_quota(self):
+        """Recalcula el uso real y borra por mtime (menos usados primero) hasta bajar del 90% del límite."""
+        files = []
+        total = 0
+        for f in self.dir.glob("*/*.json"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+            total += st.st_size
+        with self._lock:
+            self._disk_used = total
+        if total <= self.disk_bytes:
+            return
+        target = int(self.disk_bytes * 0.9)
+        files.sort()
+        for _, size, f in files:
+            if total <= target:
+                break
+            self._unlink(f, size)
+            total -= size
+
+    def discard(self, key: str):
+        """Olvida una entrada (p.ej. respuesta que luego no se pudo parsear)."""
+        with self._lock:
+            self._forget(key)
+        p = self._path(key)
+        try:
+            size = p.stat().st_size
+        except OSError:
+            return
+        self._unlink(p, size)
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._mem_used = 0
+            self._disk_used = None
+        for f in self.dir.glob("*/*.json"):
+            try:
+                f.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits_mem + self.hits_disk + self.misses
+            return {
+                "enabled": AI_CACHE_ENABLED,
+                "hitsMemory": self.hits_mem,
+                "hitsDisk": self.hits_disk,
+                "misses": self.misses,
+                "hitRate": round((self.hits_mem + self.hits_disk) / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "memoryItems": len(self._mem),
+                "memoryBytes": self._mem_used,
+                "diskBytes": self._disk_used,
+            }
+
+response_cache = ResponseCache(AI_CACHE_DIR, AI_CACHE_TTL_SEC, AI_CACHE_MEM_ITEMS, AI_CACHE_DISK_MB, AI_CACHE_MEM_MB)
@@ -0,0 +1,178 @@
+# app/ai/exercise_schema.py
+"""
+Esquema de salida estructurada para la generación de ejercicios.
+- response_schema(style): responseSchema de Gemini (subconjunto OpenAPI) con los tres tipos.
+  Un objeto con claves libres no se puede expresar, así que en el cable:
+    match_pairs.pairs      = [{"left","right"}]      (interno: [[L, R]])
+    drag_to_bucket.solution = [{"bucket","items"}]    (interno: {bucket: [items]})
+- from_wire(): pasa del formato del cable al interno.
+- validate_item(): validadores por tipo, resueltos una vez en un dict (sin recorrer
+  el esquema por ítem). Devuelve None si el ítem es válido o el motivo si no.
+"""
+import re
+from typing import Any, Callable, Dict, List
+
+ITEM_TYPES = ("multiple_choice", "match_pairs", "drag_to_bucket")
+KINESTHETIC_TYPES = ("match_pairs", "drag_to_bucket")
+
+_STR = {"type": "STRING"}
+_STR_LIST = {"type": "ARRAY", "items": _STR}
+
+# "Opción 1".."Opción 4": el modelo no llenó las alternativas
+_PLACEHOLDER_RE = re.compile(r"^\s*Opción\s+\d+\s*$", re.IGNORECASE)
+
+def response_schema(style: str) -> dict:
+    kin = (style or "").lower().strip() == "kinestesico"
+    return {
+        "type": "ARRAY",
+        "minItems": 10,
+        "maxItems": 10,
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "type": {"type": "STRING", "enum": list(KINESTHETIC_TYPES if kin else ITEM_TYPES)},
+                "title": _STR,
+                "question": _STR,
+                "choices": _STR_LIST,
+                "correct_index": {"type": "INTEGER"},
+                "pairs": {
+                    "type": "ARRAY",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {"left": _STR, "right": _STR},
+                        "required": ["left", "right"],
+                    },
+                },
+                "items": _STR_LIST,
+                "buckets": _STR_LIST,
+                "solution": {
+                    "type": "ARRAY",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {"bucket": _STR, "items": _STR_LIST},
+                        "required": ["bucket", "items"],
+                    },
+                },
+                "explain": _STR,
+            },
+            "required": ["type", "explain"],
+            "propertyOrdering": ["type", "title", "question", "choices", "correct_index",
+                                 "pairs", "items", "buckets", "solution", "explain"],
+        },
+    }
+
+# ------------------ Cable → interno ------------------
+def _s(x: Any) -> str:
+    return str(x).strip() if x is not None else ""
+
+def from_wire(it: Dict[str, Any]) -> Dict[str, Any]:
+    t = _s(it.get("type"))
+    explain = _s(it.get("explain"))
+    if t == "multiple_choice":
+        return {
+            "type": t,
+            "question": _s(it.get("question")),
+            "choices": [_s(c) for c in (it.get("choices") or [])],
+            "correct_index": it.get("correct_index"),
+            "explain": explain,
+        }
+    if t == "match_pairs":
+        pairs = []
+        for p in (it.get("pairs") or []):
+            if isinstance(p, dict):
+                pairs.append([_s(p.get("left")), _s(p.get("right"))])
+            elif isinstance(p, (list, tuple)) and len(p) == 2:  # por si el modelo ignora el esquema
+                pairs.append([_s(p[0]), _s(p[1])])
+        return {"type": t, "title": _s(it.get("title")) or "Empareja", "pairs": pairs, "explain": explain}
+    if t == "drag_to_bucket":
+        sol = it.get("solution") or []
+        if isinstance(sol, dict):
+            solution = {_s(k): [_s(x) for x in (v or [])] for k, v in sol.items()}
+        else:
+            solution = {}
+            for entry in sol:
+                if isinstance(entry, dict):
+                    solution.setdefault(_s(entry.get("bucket")), []).extend(_s(x) for x in (entry.get("items") or []))
+        return {
+            "type": t,
+            "title": _s(it.get("title")) or "Clasifica",
+            "items": [_s(x) for x in (it.get("items") or [])],
+            "buckets": [_s(b) for b in (it.get("buckets") or [])],
+            "solution": solution,
+            "explain": explain,
+        }
+    return {"type": t}
+
+# ------------------ Validadores por tipo ------------------
+def _valid_mcq(it: Dict[str, Any]) -> str | None:
+    if not it["question"]:
+        return "mcq_no_question"
+    ch = it["choices"]
+    if len(ch) != 4 or not all(ch) or len(set(ch)) != 4:
+        return "mcq_choices"
+    if any(_PLACEHOLDER_RE.match(c) for c in ch):
+        return "mcq_placeholder_choices"
+    idx = it["correct_index"]
+    if not isinstance(idx, int) or isinstance(idx, bool) or not (0 <= idx < 4):
+        return "mcq_correct_index"
+    return None
+
+def _valid_pairs(it: Dict[str, Any]) -> str | None:
+    pairs = it["pairs"]
+    if not (2 <= len(pairs) <= 6):
+        return "pairs_count"
+    if not all(l and r for l, r in pairs):
+        return "pairs_empty"
+    if len({l for l, _ in pairs}) != len(pairs) or len({r for _, r in pairs}) != len(pairs):
+        return "pairs_duplicate"
+    return None
+
+def _valid_drag(it: Dict[str, Any]) -> str | None:
+    items, buckets, sol = it["items"], it["buckets"], it["solution"]
+    if len(items) < 2 or not all(items) or len(set(items)) != len(items):
+        return "drag_items"
+    if len(buckets) < 2 or not all(buckets) or len(set(buckets)) != len(buckets):
+        return "drag_buckets"
+    if set(sol) - set(buckets):
+        return "drag_unknown_bucket"
+    placed = [x for b in buckets for x in sol.get(b, [])]
+    # partición: cada tarjeta en exactamente una caja
+    if sorted(placed) != sorted(items):
+        return "drag_not_partition"
+    return None
+
+_VALIDATORS: Dict[str, Callable[[Dict[str, Any]], str | None]] = {
+    "multiple_choice": _valid_mcq,
+    "match_pairs": _valid_pairs,
+    "drag_to_bucket": _valid_drag,
+}
+
+def validate_item(it: Dict[str, Any], style: str) -> str | None:
+    t = it.get("type")
+    check = _VALIDATORS.get(t)
+    if check is None:
+        return "unknown_type"
+    if (style or "").lower().strip() == "kinestesico" and t not in KINESTHETIC_TYPES:
+        return "type_not_allowed"
+    return check(it)
+
+def split_valid(raw: List[Any], style: str) -> tuple[List[Dict[str, Any] | None], List[str]]:
+    """
+    Convierte y valida cada ítem. Devuelve (ítems con None en los inválidos, motivos de rechazo).
+    Mantiene las posiciones para poder reemplazar solo los huecos.
+    """
+    out: List[Dict[str, Any] | None] = []
+    reasons: List[str] = []
+    for r in raw:
+        if not isinstance(r, dict):
+            out.append(None); reasons.append("not_an_object")
+            continue
+        it = from_wire(r)
+        why = validate_item(it, style)
+        if why:
+            out.append(None); reasons.append(why)
+        else:
+            if not it.get("explain"):
+                it["explain"] = "Revisa el concepto clave."
+            out.append(it)
+    return out, reasons
@@ -1,9 +1,14 @@
 # app/ai/gemini.py
-import os, json, random, re, base64
+import os, json, random, re, base64, time, logging
 from typing import List, Dict, Any
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from app.ai import genai_client
+from app.ai import cache as ai_cache
+from app.ai import ratelimit
+from app.ai import prompts
+from app.ai import exercise_schema
+from app.core.metrics import metrics
+
+log = logging.getLogger("gemini")
 
 # ------------------ Config ------------------
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip()
@@ -12,7 +17,8 @@ IMAGE_MODEL    = os.getenv("GEMINI_IMAGE_MODEL", "gemini-2.5-flash-image").strip
 TTS_MODEL      = os.getenv("GEMINI_TTS_MODEL", "gemini-2.5-flash-preview-tts").strip()
 AI_ENABLED     = bool(GEMINI_API_KEY) and bool(MODEL_NAME)
 
-BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+# apuntar a scripts/genai_standin.py en pruebas: GEMINI_BASE_URL=http://127.0.0.1:8790/v1beta/models
+BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/models").strip().rstrip("/")
 FRACTION_RE = re.compile(r"\b(\d{1,2})\s*/\s*(\d{1,2})\b", re.IGNORECASE)
 _OPCION_RE = re.compile(r"^\s*Opción\s+\d+\s*$", re.IGNORECASE)
 
@@ -24,36 +30,83 @@ def ensure_ai_ready():
     if not MODEL_NAME:
         raise RuntimeError("MODEL_NAME no está definido (AI_DISABLED).")
 
-# Session con reintentos (para 429/5xx)
-_session = requests.Session()
-_session.mount(
-    "https://",
-    HTTPAdapter(
-        max_retries=Retry(
-            total=3,
-            backoff_factor=1.2,
-            status_forcelist=(408, 409, 429, 500, 502, 503, 504),
-            allowed_methods=frozenset(["POST"]),
-            raise_on_status=False,
-        )
-    ),
-)
-
-def _post_genai(model: str, payload: dict, timeout: int = 60) -> dict:
-    """model es el id (p.ej. 'gemini-2.5-flash'), NO una URL."""
+def _post_genai(model: str, payload: dict, timeout: int = 60, *,
+                cache: bool = True, cache_salt: str | None = None, site: str = "other") -> dict:
+    """
+    model es el id (p.ej. 'gemini-2.5-flash'), NO una URL.
+    Adaptador síncrono sobre el cliente async compartido (pool, límite en vuelo,
+    reintentos y circuit breaker). Con el circuito abierto lanza CircuitOpenError
+    (RuntimeError) al instante y el caller cae a su fallback local.
+    Con cache=True la respuesta se guarda por (modelo, payload, cache_salt) y las
+    llamadas idénticas en vuelo se agrupan; las que deben variar pasan cache=False.
+    `site` etiqueta las métricas con el punto de llamada (exercises, explanation, ...).
+    """
     if model.startswith("http"):
         parts = model.split("/models/")
         model = parts[-1].split(":")[0] if len(parts) > 1 else model
-    url = f"{BASE_URL}/{model}:generateContent"
-    resp = _session.post(url, params={"key": GEMINI_API_KEY}, json=payload, timeout=timeout)
-    if resp.status_code != 200:
-        raise RuntimeError(f"[gemini] non-200: {resp.status_code} body={resp.text[:400]}")
-    return resp.json()
+
+    t0 = time.perf_counter()
+    outcome, usage = "ok", None
+
+    def _fetch() -> dict:
+        nonlocal usage
+        data = genai_client.post_sync(model, payload, timeout=timeout)
+        usage = _record_usage(model, site, data)
+        if cache and ai_cache.AI_CACHE_ENABLED and ai_cache.is_cacheable(data):
+            ai_cache.response_cache.put(key, data)
+        return data
+
+    try:
+        if not cache:
+            return _fetch()
+        key = ai_cache.cache_key(model, payload, cache_salt)
+        if ai_cache.AI_CACHE_ENABLED:
+            hit = ai_cache.response_cache.get(key)
+            if hit is not None:
+                outcome = "cache"
+                return hit
+        # peticiones idénticas concurrentes (30 alumnos abriendo el mismo tema) comparten una llamada
+        return ratelimit.single_flight.do(key, _fetch, wait_timeout=float(timeout) + 5)
+    except genai_client.GenAIBusyError:
+        outcome = "rejected"
+        raise
+    except genai_client.CircuitOpenError:
+        outcome = "circuit_open"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        metrics.observe("ai_call_seconds", elapsed, model=model, site=site, outcome=outcome)
+        metrics.inc("ai_calls_total", model=model, site=site, outcome=outcome)
+        log.info(json.dumps({
+            "event": "ai_call", "model": model, "site": site, "outcome": outcome,
+            "ms": round(elapsed * 1000, 1), "tokens": usage,
+        }))
+
+def _record_usage(model: str, site: str, data: dict) -> dict | None:
+    """Suma usageMetadata (solo llamadas reales; los aciertos de caché no gastan tokens)."""
+    um = (data or {}).get("usageMetadata") or {}
+    usage = {}
+    for kind, field in (("prompt", "promptTokenCount"), ("output", "candidatesTokenCount"),
+                        ("thoughts", "thoughtsTokenCount"), ("total", "totalTokenCount")):
+        n = um.get(field)
+        if isinstance(n, (int, float)) and n:
+            usage[kind] = n
+            metrics.inc("ai_tokens_total", n, model=model, site=site, kind=kind)
+    return usage or None
+
+def _fallback(site: str, reason: str):
+    metrics.inc("ai_fallbacks_total", site=site, reason=reason)
 
 def _call_gemini_json(prompt_text: str,
                       model: str | None = None,
                       timeout: int = 60,
-                      temperature: float = 0.3) -> dict | list:
+                      temperature: float = 0.3,
+                      cache: bool = True,
+                      cache_salt: str | None = None,
+                      site: str = "json") -> dict | list:
     """
     Envía un prompt en texto y espera una respuesta en formato JSON.
     - Extrae el texto del primer candidato/parte.
@@ -73,7 +126,7 @@ def _call_gemini_json(prompt_text: str,
         "contents": [{"parts": [{"text": prompt_text}]}],
     }
 
-    data = _post_genai(model, payload, timeout=timeout)
+    data = _post_genai(model, payload, timeout=timeout, cache=cache, cache_salt=cache_salt, site=site)
 
     # ---- extraer texto de la respuesta ----
     text = ""
@@ -86,6 +139,7 @@ def _call_gemini_json(prompt_text: str,
         text = ""
 
     if not text:
+        metrics.inc("ai_parse_failures_total", site=site, reason="empty")
         raise RuntimeError("Gemini devolvió texto vacío o sin partes .text")
 
     # ---- limpieza de fences y prefijos ----
@@ -120,6 +174,10 @@ def _call_gemini_json(prompt_text: str,
             pass
 
     # si todo falla, lanza error para que el caller decida (o use fallback)
+    # y olvida la respuesta cacheada: el próximo intento debe ir a la red
+    metrics.inc("ai_parse_failures_total", site=site, reason="invalid_json")
+    if cache:
+        ai_cache.response_cache.discard(ai_cache.cache_key(model, payload, cache_salt))
     raise RuntimeError(f"No se pudo parsear JSON de Gemini. Texto recibido (recortado): {t[:400]}")
 
 # ------------------ Utils ------------------
@@ -556,59 +614,58 @@ def generate_exercises_variant(ctx: dict, style: str, avoid_numbers=None) -> lis
     print(f"[gemini] generate_exercises_variant → usando IA con modelo={MODEL_NAME}, style={style}")
 
     try:
-        prompt = {
-            "task": "Genera 10 ejercicios alineados al tema y estilo VAK",
-            "style": style,
-            "avoid_numbers": avoid_numbers or [],
-            "context_json": ctx,
-            "must_follow": [
-                "Usa SOLO el contenido del JSON de contexto.",
-                "Devuelve JSON válido: un array con 10 objetos.",
-                "Tipos permitidos: 'multiple_choice'|'match_pairs'|'drag_to_bucket'.",
-                "Para estilo 'kinestesico', NO devuelvas 'multiple_choice', solo 'match_pairs' y 'drag_to_bucket'.",
-                "match_pairs: title, pairs [[L,R],...].",
-                "drag_to_bucket: title, items[], buckets[], solution{bucket:[items]} (partición válida)."
-            ]
-        }
+        prompt = prompts.build_exercises_prompt(ctx, style, avoid_numbers)
+        prompts.record_prompt_size("exercises", prompt)
 
         data = _post_genai(
             MODEL_NAME,
-            {"contents": [{"parts": [{"text": json.dumps(prompt, ensure_ascii=False)}]}]} ,
+            {
+                "generationConfig": {
+                    "responseMimeType": "application/json",
+                    "responseSchema": exercise_schema.response_schema(style),
+                },
+                "contents": [{"parts": [{"text": prompt}]}],
+            },
             timeout=60,
+            cache=False,  # cada sesión debe traer ejercicios distintos
+            site="exercises",
         )
 
         text = (data.get("candidates", [{}])[0]
                     .get("content", {}).get("parts", [{}])[0]
                     .get("text", "") or "").strip()
         if not text:
+            metrics.inc("ai_parse_failures_total", site="exercises", reason="empty")
             raise RuntimeError("Gemini devolvió texto vacío")
 
+        # con responseMimeType=application/json no hay cercas ni prefijos: un solo parse
         try:
             parsed = json.loads(text)
-        except Exception:
-            t2 = text.strip().strip("`")
-            t2 = re.sub(r"^json", "", t2, flags=re.I).strip()
-            parsed = json.loads(t2)
+        except ValueError:
+            metrics.inc("ai_parse_failures_total", site="exercises", reason="invalid_json")
+            raise
 
         if not isinstance(parsed, list) or len(parsed) == 0:
+            metrics.inc("ai_parse_failures_total", site="exercises", reason="not_a_list")
             raise RuntimeError("Gemini devolvió un JSON que no es lista no vacía")
 
-        items = _sanitize_items(parsed, style)
-        if not isinstance(items, list) or len(items) == 0:
-            raise RuntimeError("Sanitización dejó la lista vacía")
-
-        # Normaliza a 10 sin usar fallback local silencioso
-        if len(items) > 10:
-            items = items[:10]
-        elif len(items) < 10:
-            # rellena con clones ligeros de los ya generados (pero no con fallback de JSON)
-            base = items[:]
-            i = 0
-            while len(items) < 10 and base:
-                items.append(base[i % len(base)])
-                i += 1
-
-        print(f"[gemini] IA generó {len(items)} items")
+        items, reasons = exercise_schema.split_valid(parsed[:10], style)
+        valid = sum(1 for it in items if it is not None)
+        if not valid:
+            raise RuntimeError(f"Ningún ítem de la IA pasó la validación: {sorted(set(reasons))}")
+        for why in reasons:
+            metrics.inc("ai_items_replaced_total", site="exercises", reason=why)
+
+        # Solo los huecos (inválidos o faltantes) se rellenan con ejercicios locales del tema
+        missing = 10 - valid
+        if missing:
+            if len(items) < 10:
+                metrics.inc("ai_items_replaced_total", 10 - len(items), site="exercises", reason="missing")
+                items += [None] * (10 - len(items))
+            spare = iter(fallback_generate_exercises(ctx, style, avoid_numbers=avoid_numbers or []))
+            items = [it if it is not None else next(spare) for it in items]
+
+        print(f"[gemini] IA generó {valid} items válidos (+{missing} locales)")
         return items[:10]
 
     except Exception as e:
@@ -623,60 +680,45 @@ def generate_explanation(ctx: Dict[str, Any]) -> str:
     if not AI_ENABLED:
         return fallback_generate_explanation(ctx)
     try:
-        payload = {
-            "contents":[{"parts":[{"text": json.dumps({
-                "instruction": (
-                    "Escribe una explicación de 4 a 7 oraciones, clara y motivadora para primaria. "
-                    "No copies texto literal del JSON. Parafrasea y complementa con un ejemplo simple. "
-                    "Usa solo la información del contexto. Devuelve solo el texto."
-                ),
-                "context_json": ctx
-            }, ensure_ascii=False)}]}]
-        }
-        data = _post_genai(MODEL_NAME, payload, timeout=40)
+        prompt = prompts.build_explanation_prompt(ctx)
+        prompts.record_prompt_size("explanation", prompt)
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        data = _post_genai(MODEL_NAME, payload, timeout=40, site="explanation")
         text = (data.get("candidates",[{}])[0].get("content",{}).get("parts",[{}])[0].get("text","") or "").strip()
+        if not text:
+            _fallback("explanation", "empty")
         return text or fallback_generate_explanation(ctx)
     except Exception as e:
         print("[gemini.explanation] exception:", e)
+        _fallback("explanation", type(e).__name__)
         return fallback_generate_explanation(ctx)
 
 # ------------------ IA: imagen (visual) ------------------
-def generate_one_image_png(prompt: str) -> bytes | None:
+def generate_one_image_png(prompt: str, site: str = "image") -> bytes | None:
     if not AI_ENABLED or not IMAGE_MODEL:
         return None
     try:
-        data = _post_genai(IMAGE_MODEL, {"contents": [{"parts":[{"text": prompt}]}]}, timeout=60)
+        data = _post_genai(IMAGE_MODEL, {"contents": [{"parts":[{"text": prompt}]}]}, timeout=60, site=site)
         parts = data.get("candidates",[{}])[0].get("content",{}).get("parts",[])
         for p in parts:
             inline = p.get("inlineData") or p.get("inline_data")
             if inline and inline.get("data"):
                 return base64.b64decode(inline["data"])
+        metrics.inc("ai_parse_failures_total", site=site, reason="no_image")
         return None
     except Exception as e:
         print(f"[gemini] image exception: {e}")
         return None
 
-def generate_assistant_explanation(context_json: dict, style: str) -> dict:
-
-    prompt = f"""
-Eres un asistente pedagógico para primaria.
-Contexto ESTRICTO del tema (no inventes fuera de esto):
-{json.dumps(context_json, ensure_ascii=False)}
-
-Tarea:
-- Redacta una EXPLICACIÓN LARGA y CLARA para un estudiante de primaria.
-- 4 a 5 párrafos, cada uno ~4 líneas (no más de 450 caracteres por párrafo).
-- Incluye al final 2 a 3 ejemplos numéricos explicados PASO A PASO.
-- Estilo: {"VISUAL (menciona apoyos visuales simples, comparaciones)" if style=="visual" else "AUDITIVO (frases cortas, ritmo oral, transiciones suaves)"}.
-- No pongas viñetas; devuélvelo estructurado en JSON.
-
-FORMATO JSON ESTRICTO:
-{{
-  "paragraphs": [{{"text": "..."}} , ...],
-  "examples": [{{"title":"...", "text":"..."}}, ...]
-}}
-"""
-    data = _call_gemini_json(prompt)
+# Súbela al cambiar el prompt (app/ai/prompts.build_assistant_prompt): invalida las explicaciones compartidas del asistente
+ASSISTANT_PROMPT_VERSION = "v2"
+
+def generate_assistant_explanation(context_json: dict, style: str, variant: int = 0) -> dict:
+    """variant > 0 (regenerar) no reutiliza la respuesta cacheada de otra variante."""
+
+    prompt = prompts.build_assistant_prompt(context_json, style)
+    prompts.record_prompt_size("assistant", prompt)
+    data = _call_gemini_json(prompt, cache_salt=f"variant:{variant}" if variant else None, site="assistant")
     # saneo mínimo
     paras = [p for p in (data.get("paragraphs") or []) if (p.get("text") or "").strip()]
     exs   = [e for e in (data.get("examples") or []) if (e.get("text") or "").strip()]
@@ -0,0 +1,361 @@
+# app/ai/genai_client.py
+"""
+Cliente HTTP asíncrono para la API de Gemini (generativelanguage).
+- Un único httpx.AsyncClient con pool de conexiones acotado (keep-alive).
+- Límite global de llamadas en vuelo; quien espera demasiado por un hueco falla rápido.
+- Reintentos con backoff + jitter dentro de un deadline total (no más allá del timeout pedido).
+- Circuit breaker: si la tasa de error supera el umbral, corta las llamadas durante un
+  cooldown y los callers caen enseguida a sus fallbacks locales.
+Los callers síncronos usan post_sync(): el cliente vive en un event loop propio en un hilo.
+"""
+import asyncio, threading, time, os, random, logging
+from collections import deque
+import httpx
+
+from app.ai import ratelimit
+from app.core.metrics import metrics
+
+log = logging.getLogger("genai")
+
+RETRY_STATUS = frozenset([408, 409, 429, 500, 502, 503, 504])
+
+class GenAIError(RuntimeError):
+    """Error de la API de Gemini (los callers existentes ya capturan RuntimeError)."""
+    def __init__(self, msg: str, status: int | None = None):
+        super().__init__(msg)
+        self.status = status
+
+class CircuitOpenError(GenAIError):
+    """El circuito está abierto: no se llama a la API."""
+
+class GenAIBusyError(GenAIError):
+    """No hubo hueco en el límite de llamadas en vuelo a tiempo."""
+
+class RateLimitedError(GenAIBusyError):
+    """El cubo de fichas del modelo no dio paso a tiempo: se descarta antes de que lo haga el proveedor."""
+
+class CircuitBreaker:
+    """
+    Ventana deslizante de resultados. Abre el circuito cuando hay al menos
+    `min_calls` resultados y la proporción de errores >= `error_rate`.
+    Tras `cooldown` segundos deja pasar UNA llamada de prueba (half-open); si la prueba
+    no informa resultado en `probe_timeout` segundos se da por perdida y se admite otra.
+    """
+
+    def __init__(self, window: int = 20, min_calls: int = 8, error_rate: float = 0.5, cooldown: float = 30.0,
+                 probe_timeout: float = 120.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._results: deque = deque(maxlen=window)
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self._probe_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self._state = "half_open"
+                self._probe_inflight = False
+            # half_open: una sola llamada de prueba a la vez
+            if self._probe_inflight and time.monotonic() - self._probe_at < self.probe_timeout:
+                return False
+            self._probe_inflight = True
+            self._probe_at = time.monotonic()
+            return True
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self._state == "half_open":
+                self._probe_inflight = False
+                if ok:
+                    self._state = "closed"
+                    self._results.clear()
+                else:
+                    self._trip()
+                return
+            self._results.append(ok)
+            if len(self._results) >= self.min_calls:
+                errors = sum(1 for r in self._results if not r)
+                if errors / len(self._results) >= self.error_rate:
+                    self._trip()
+
+    def release_probe(self):
+        """La llamada admitida no llegó a salir (cupo, saturación): libera la prueba half-open sin registrar resultado."""
+        with self._lock:
+            if self._state == "half_open":
+                self._probe_inflight = False
+
+    def _trip(self):
+        if self._state != "open":
+            log.warning("[genai] circuit OPEN for %.0fs", self.cooldown)
+        self._state = "open"
+        self._opened_at = time.monotonic()
+        self._results.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state,
+                "window": len(self._results),
+                "errors": sum(1 for r in self._results if not r),
+            }
+
+class _Outcome:
+    """Resultado de UNA llamada admitida por el breaker: se informa (o se libera) una sola vez."""
+    __slots__ = ("breaker", "settled")
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self.settled = False
+
+    def record(self, ok: bool):
+        if not self.settled:
+            self.settled = True
+            self.breaker.record(ok)
+
+    def release(self):
+        if not self.settled:
+            self.settled = True
+            self.breaker.release_probe()
+
+class AsyncGenAIClient:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        *,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        max_inflight: int = 16,
+        queue_timeout: float = 10.0,
+        retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.max_inflight = max_inflight
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        # se crean dentro del loop del cliente (httpx/asyncio los atan a ese loop)
+        self._http: httpx.AsyncClient | None = None
+        self._sem: asyncio.Semaphore | None = None
+        self._inflight = 0
+
+    def _ensure(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=30.0,
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            )
+            self._sem = asyncio.Semaphore(self.max_inflight)
+
+    def _backoff(self, attempt: int, resp: httpx.Response | None) -> float:
+        if resp is not None:
+            ra = resp.headers.get("retry-after")
+            if ra:
+                try:
+                    return min(self.backoff_max, max(0.0, float(ra)))
+                except ValueError:
+                    pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)  # jitter
+
+    async def post(self, model: str, payload: dict, timeout: float = 60) -> dict:
+        """POST {base}/{model}:generateContent. Reintenta dentro de `timeout` segundos en total."""
+        self._ensure()
+        if not self.breaker.allow():
+            metrics.inc("ai_rejected_total", model=model, reason="circuit")
+            raise CircuitOpenError("[gemini] circuit open: usando fallback local")
+
+        # toda salida informa al breaker: si no, una prueba half-open perdida lo deja cerrado para siempre
+        outcome = _Outcome(self.breaker)
+        try:
+            return await self._post(outcome, model, payload, timeout)
+        except asyncio.CancelledError:
+            outcome.release()
+            raise
+        except GenAIError:
+            outcome.record(False)
+            raise
+        except (httpx.HTTPError, OSError, ValueError) as e:
+            # errores no previstos (DecodingError, flock del cubo, JSON inválido): los callers esperan RuntimeError
+            outcome.record(False)
+            raise GenAIError(f"[gemini] unexpected error: {e!r}") from e
+        except BaseException:
+            outcome.record(False)
+            raise
+
+    async def _post(self, outcome: _Outcome, model: str, payload: dict, timeout: float) -> dict:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + float(timeout)
+        try:
+            # la ficha del primer intento se espera fuera del límite en vuelo,
+            # así un modelo lento de cupo no acapara huecos de los demás
+            await self._throttle(model, deadline)
+        except RateLimitedError:
+            outcome.release()
+            metrics.inc("ai_rejected_total", model=model, reason="rate_limit")
+            raise
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=min(self.queue_timeout, float(timeout)))
+        except asyncio.TimeoutError:
+            # no cuenta como fallo del proveedor: es saturación nuestra
+            outcome.release()
+            metrics.inc("ai_rejected_total", model=model, reason="busy")
+            raise GenAIBusyError("[gemini] demasiadas llamadas en vuelo")
+
+        self._inflight += 1
+        try:
+            url = f"{self.base_url}/{model}:generateContent"
+            attempt = 0
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    outcome.record(False)
+                    raise GenAIError("[gemini] timeout total agotado", status=408)
+                resp = None
+                try:
+                    resp = await self._http.post(
+                        url, params={"key": self.api_key}, json=payload, timeout=remaining,
+                    )
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    metrics.inc("ai_http_responses_total", model=model,
+                                status="timeout" if isinstance(e, httpx.TimeoutException) else "transport")
+                    err: GenAIError = GenAIError(f"[gemini] transport error: {e!r}")
+                else:
+                    metrics.inc("ai_http_responses_total", model=model, status=resp.status_code)
+                    if resp.status_code == 200:
+                        outcome.record(True)
+                        return resp.json()
+                    err = GenAIError(
+                        f"[gemini] non-200: {resp.status_code} body={resp.text[:400]}",
+                        status=resp.status_code,
+                    )
+                    if resp.status_code not in RETRY_STATUS:
+                        # 4xx de petición (prompt inválido, etc.): no es caída del proveedor
+                        outcome.record(True)
+                        raise err
+
+                delay = self._backoff(attempt, resp)
+                if attempt >= self.retries or loop.time() + delay >= deadline:
+                    outcome.record(False)
+                    raise err
+                attempt += 1
+                metrics.inc("ai_retries_total", model=model)
+                log.info("[genai] retry %s for %s in %.2fs (%s)", attempt, model, delay, err)
+                await asyncio.sleep(delay)
+                try:
+                    await self._throttle(model, deadline)  # los reintentos también gastan cupo
+                except RateLimitedError:
+                    outcome.record(False)
+                    raise err
+        finally:
+            self._inflight -= 1
+            self._sem.release()
+
+    async def _throttle(self, model: str, deadline: float):
+        bucket = ratelimit.bucket_for(model)
+        if bucket is None:
+            return
+        loop = asyncio.get_running_loop()
+        limit = min(deadline, loop.time() + ratelimit.AI_RATE_WAIT_SEC)
+        while True:
+            if getattr(bucket, "blocking_io", False):
+                # cubo compartido (flock): un lock disputado no debe frenar al resto de llamadas del loop
+                wait = await loop.run_in_executor(None, bucket.try_acquire)
+            else:
+                wait = bucket.try_acquire()
+            if not wait:
+                return
+            if loop.time() + wait > limit:
+                raise RateLimitedError(f"[gemini] cupo de {model} agotado", status=429)
+            await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self._inflight,
+            "maxInflight": self.max_inflight,
+            "maxConnections": self.max_connections,
+            "breaker": self.breaker.stats(),
+        }
+
+# ------------------ Loop dedicado + adaptador síncrono ------------------
+class _LoopThread:
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="genai-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+_loop_thread = _LoopThread()
+_client: AsyncGenAIClient | None = None
+_client_lock = threading.Lock()
+
+def get_client() -> AsyncGenAIClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            from app.ai import gemini  # config central (BASE_URL, API key)
+            _client = AsyncGenAIClient(
+                gemini.BASE_URL,
+                gemini.GEMINI_API_KEY,
+                max_connections=int(os.getenv("AI_MAX_CONNECTIONS", "20")),
+                max_keepalive=int(os.getenv("AI_MAX_KEEPALIVE", "10")),
+                max_inflight=int(os.getenv("AI_MAX_INFLIGHT", "16")),
+                queue_timeout=float(os.getenv("AI_QUEUE_TIMEOUT_SEC", "10")),
+                retries=int(os.getenv("AI_RETRIES", "2")),
+                breaker=CircuitBreaker(
+                    window=int(os.getenv("AI_BREAKER_WINDOW", "20")),
+                    min_calls=int(os.getenv("AI_BREAKER_MIN_CALLS", "8")),
+                    error_rate=float(os.getenv("AI_BREAKER_ERROR_RATE", "0.5")),
+                    cooldown=float(os.getenv("AI_BREAKER_COOLDOWN_SEC", "30")),
+                    probe_timeout=float(os.getenv("AI_BREAKER_PROBE_TIMEOUT_SEC", "120")),
+                ),
+            )
+        return _client
+
+def post_sync(model: str, payload: dict, timeout: float = 60) -> dict:
+    """Adaptador para callers síncronos (routers sync, workers en hilos)."""
+    fut = asyncio.run_coroutine_threadsafe(get_client().post(model, payload, timeout), _loop_thread.loop())
+    try:
+        # margen sobre el deadline interno por si el loop va cargado
+        return fut.result(timeout=float(timeout) + 5)
+    except TimeoutError:
+        fut.cancel()
+        raise GenAIError("[gemini] timeout esperando respuesta", status=408)
+
+async def post_async(model: str, payload: dict, timeout: float = 60) -> dict:
+    """Para callers async desde cualquier event loop (p.ej. el de uvicorn)."""
+    fut = asyncio.run_coroutine_threadsafe(get_client().post(model, payload, timeout), _loop_thread.loop())
+    return await asyncio.wrap_future(fut)
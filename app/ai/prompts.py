@@ -0,0 +1,101 @@
+# app/ai/prompts.py
+"""
+Constructores de prompt por tarea.
+Cada tarea envía solo los campos del contexto que necesita (nada de exercise_bank,
+explanation_variants, visual_assets ni reuse_policy) y en JSON compacto.
+PROMPT_BUDGETS fija el tamaño máximo en bytes por tarea; scripts/check_prompt_budget.py
+falla si algún tema lo supera.
+"""
+import json
+from typing import Any, Dict, List
+
+from app.core.metrics import metrics
+
+# Campos del context_json que usa cada tarea
+TASK_FIELDS: Dict[str, tuple] = {
+    "exercises":   ("slug", "title", "grade", "concepts", "examples", "constraints", "variation_rules"),
+    "explanation": ("title", "grade", "concepts", "examples"),
+    "assistant":   ("title", "grade", "concepts", "examples", "constraints"),
+}
+
+# Presupuesto en bytes (UTF-8) del prompt completo por tarea
+PROMPT_BUDGETS: Dict[str, int] = {
+    "exercises":   3072,
+    "explanation": 1536,
+    "assistant":   2560,
+}
+
+metrics.describe("ai_prompt_bytes", "Tamaño en bytes de los prompts enviados a Gemini",
+                 buckets=(256, 512, 1024, 2048, 3072, 4096, 6144, 8192, 16384))
+metrics.describe("ai_prompt_tokens_est", "Tokens estimados del prompt (bytes/4) antes de enviarlo",
+                 buckets=(64, 128, 256, 512, 768, 1024, 1536, 2048, 4096))
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def project_ctx(ctx: Dict[str, Any], task: str, style: str | None = None) -> Dict[str, Any]:
+    """Subconjunto del contexto que necesita `task` (vacíos fuera)."""
+    fields = list(TASK_FIELDS[task])
+    if task == "exercises" and (style or "").lower() == "kinestesico":
+        fields.append("kinesthetic_setups")
+    ctx = ctx or {}
+    return {k: ctx[k] for k in fields if ctx.get(k) not in (None, "", [], {})}
+
+def estimate_tokens(text: str) -> int:
+    # ~4 bytes por token en español; el conteo real llega luego en usageMetadata
+    return max(1, len(text.encode("utf-8")) // 4)
+
+def record_prompt_size(task: str, text: str) -> int:
+    size = len(text.encode("utf-8"))
+    metrics.observe("ai_prompt_bytes", size, task=task)
+    metrics.observe("ai_prompt_tokens_est", estimate_tokens(text), task=task)
+    return size
+
+# ------------------ Builders ------------------
+def build_exercises_prompt(ctx: Dict[str, Any], style: str, avoid_numbers: List[Any] | None = None) -> str:
+    prompt = {
+        "task": "Genera 10 ejercicios alineados al tema y estilo VAK",
+        "style": style,
+        "avoid_numbers": avoid_numbers or [],
+        "context_json": project_ctx(ctx, "exercises", style),
+        "must_follow": [
+            "Usa SOLO el contenido del JSON de contexto.",
+            "Devuelve un array con 10 objetos según el esquema de respuesta.",
+            "Tipos permitidos: 'multiple_choice'|'match_pairs'|'drag_to_bucket'.",
+            "Para estilo 'kinestesico', NO devuelvas 'multiple_choice', solo 'match_pairs' y 'drag_to_bucket'.",
+            "multiple_choice: question, 4 choices distintas, correct_index (0-3).",
+            "match_pairs: title, 2 a 6 pairs [{left,right}] sin repetir.",
+            "drag_to_bucket: title, items[], buckets[], solution [{bucket,items[]}] (cada item en una sola caja)."
+        ]
+    }
+    return compact_json(prompt)
+
+def build_explanation_prompt(ctx: Dict[str, Any]) -> str:
+    return compact_json({
+        "instruction": (
+            "Escribe una explicación de 4 a 7 oraciones, clara y motivadora para primaria. "
+            "No copies texto literal del JSON. Parafrasea y complementa con un ejemplo simple. "
+            "Usa solo la información del contexto. Devuelve solo el texto."
+        ),
+        "context_json": project_ctx(ctx, "explanation"),
+    })
+
+def build_assistant_prompt(ctx: Dict[str, Any], style: str) -> str:
+    return f"""
+Eres un asistente pedagógico para primaria.
+Contexto ESTRICTO del tema (no inventes fuera de esto):
+{compact_json(project_ctx(ctx, "assistant"))}
+
+Tarea:
+- Redacta una EXPLICACIÓN LARGA y CLARA para un estudiante de primaria.
+- 4 a 5 párrafos, cada uno ~4 líneas (no más de 450 caracteres por párrafo).
+- Incluye al final 2 a 3 ejemplos numéricos explicados PASO A PASO.
+- Estilo: {"VISUAL (menciona apoyos visuales simples, comparaciones)" if style=="visual" else "AUDITIVO (frases cortas, ritmo oral, transiciones suaves)"}.
+- No pongas viñetas; devuélvelo estructurado en JSON.
+
+FORMATO JSON ESTRICTO:
+{{
+  "paragraphs": [{{"text": "..."}} , ...],
+  "examples": [{{"title":"...", "text":"..."}}, ...]
+}}
+"""
@@ -0,0 +1,192 @@
+# app/ai/ratelimit.py
+"""
+Control de carga hacia Gemini.
+- SingleFlight: llamadas idénticas concurrentes comparten una sola petición en vuelo.
+- TokenBucket:  límite de peticiones por modelo dentro del proceso.
+- FileTokenBucket: el mismo límite compartido entre workers (gunicorn) vía un
+  fichero con flock; todos los procesos de la máquina consumen del mismo cubo.
+Los cubos no bloquean: try_acquire() devuelve 0 si hay ficha o los segundos a esperar.
+"""
+import os, time, threading, logging
+from pathlib import Path
+from typing import Any, Callable
+
+try:
+    import fcntl  # solo POSIX; en Windows se usa el cubo en memoria
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from app.core.settings_static import REPO_ROOT
+
+log = logging.getLogger("genai.ratelimit")
+
+# ------------------ Single-flight ------------------
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable[[], Any], wait_timeout: float | None = None) -> Any:
+        """
+        Ejecuta fn() una sola vez por `key` mientras esté en vuelo; el resto de
+        llamadas con la misma clave esperan y reciben el mismo resultado (o excepción).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            if not call.event.wait(wait_timeout):
+                raise TimeoutError("single-flight: la llamada compartida no terminó a tiempo")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"inflight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
+
+# ------------------ Token buckets ------------------
+class TokenBucket:
+    """`rate` fichas por segundo, hasta `burst` acumuladas. Estado en memoria del proceso."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._ts = time.monotonic()
+        self.granted = 0
+        self.delayed = 0
+
+    def try_acquire(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+            self._ts = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.granted += 1
+                return 0.0
+            self.delayed += 1
+            return (1.0 - self._tokens) / self.rate
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "rate": self.rate, "burst": self.burst,
+                    "tokens": round(self._tokens, 2), "granted": self.granted, "delayed": self.delayed}
+
+class FileTokenBucket(TokenBucket):
+    """
+    Igual que TokenBucket pero el estado ("tokens timestamp") vive en un fichero
+    bloqueado con flock, así que todos los workers de la máquina comparten el cubo.
+    Usa time.time() (reloj de pared) porque monotonic no es comparable entre procesos.
+    """
+
+    # flock bloquea hasta que otro worker suelte el fichero: no llamar desde el event loop
+    blocking_io = True
+
+    def __init__(self, rate: float, burst: float, path: Path):
+        super().__init__(rate, burst)
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def try_acquire(self) -> float:
+        with self._lock, open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                now = time.time()
+                try:
+                    tokens_s, ts_s = f.read().split()
+                    tokens = min(self.burst, float(tokens_s) + max(0.0, now - float(ts_s)) * self.rate)
+                except ValueError:
+                    tokens = self.burst  # fichero nuevo o corrupto
+                if tokens >= 1.0:
+                    tokens -= 1.0
+                    wait = 0.0
+                    self.granted += 1
+                else:
+                    wait = (1.0 - tokens) / self.rate
+                    self.delayed += 1
+                f.seek(0); f.truncate()
+                f.write(f"{tokens:.6f} {now:.6f}")
+                f.flush()
+                self._tokens = tokens
+                return wait
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        st = super().stats()
+        st["backend"] = "file"
+        return st
+
+# ------------------ Registro por modelo ------------------
+AI_RATE_BACKEND  = os.getenv("AI_RATE_BACKEND", "memory").strip().lower()  # memory | file
+AI_RATE_DIR      = Path(os.getenv("AI_RATE_DIR", REPO_ROOT / ".cache" / "ratelimit")).resolve()
+AI_RATE_WAIT_SEC = float(os.getenv("AI_RATE_WAIT_SEC", "10"))  # espera máx. antes de descartar
+AI_RATE_BURST    = float(os.getenv("AI_RATE_BURST", "5"))
+
+_buckets: dict[str, TokenBucket | None] = {}
+_buckets_lock = threading.Lock()
+
+def _rpm_for(model: str) -> float:
+    from app.ai import gemini  # nombres de modelo configurados
+    if model == gemini.IMAGE_MODEL:
+        return float(os.getenv("AI_RPM_IMAGE", "10"))
+    if model == gemini.MODEL_NAME:
+        return float(os.getenv("AI_RPM_TEXT", "60"))
+    return float(os.getenv("AI_RPM_DEFAULT", "60"))
+
+def bucket_for(model: str) -> TokenBucket | None:
+    """Cubo del modelo (None = sin límite, RPM <= 0)."""
+    with _buckets_lock:
+        if model in _buckets:
+            return _buckets[model]
+        rpm = _rpm_for(model)
+        b: TokenBucket | None = None
+        if rpm > 0:
+            rate = rpm / 60.0
+            if AI_RATE_BACKEND == "file" and fcntl is not None:
+                safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+                b = FileTokenBucket(rate, AI_RATE_BURST, AI_RATE_DIR / f"{safe}.bucket")
+            else:
+                b = TokenBucket(rate, AI_RATE_BURST)
+        _buckets[model] = b
+        return b
+
+def stats() -> dict:
+    with _buckets_lock:
+        items = list(_buckets.items())
+    return {m: (b.stats() if b else None) for m, b in items}
+
+single_flight = SingleFlight()
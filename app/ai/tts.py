@@ -1,9 +1,23 @@
 import os
 from google.cloud import texttospeech
 
+# Si se define (p.ej. http://127.0.0.1:8790 con scripts/genai_standin.py),
+# se usa el transporte REST contra ese host y sin credenciales.
+TTS_API_ENDPOINT = os.getenv("TTS_API_ENDPOINT", "").strip()
+
+def tts_client() -> texttospeech.TextToSpeechClient:
+    if TTS_API_ENDPOINT:
+        from google.auth.credentials import AnonymousCredentials
+        return texttospeech.TextToSpeechClient(
+            transport="rest",
+            credentials=AnonymousCredentials(),
+            client_options={"api_endpoint": TTS_API_ENDPOINT},
+        )
+    return texttospeech.TextToSpeechClient()
+
 def synthesize_mp3(text: str, voice: str | None = None) -> bytes:
     voice_name = voice or os.getenv("TTS_VOICE", "es-ES-Standard-A")
-    client = texttospeech.TextToSpeechClient()
+    client = tts_client()
     input_ = texttospeech.SynthesisInput(text=text)
     voice_ = texttospeech.VoiceSelectionParams(language_code="es-ES", name=voice_name)
     config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
@@ -0,0 +1,97 @@
+# app/core/assets.py
+"""
+URLs de assets versionadas por contenido.
+versioned_url("/media/covers/fracciones.png") → "/media/covers/fracciones.png?v=3f2a9c1d0b7e4a55"
+- El hash (blake2b, 8 bytes) se calcula sobre los bytes del archivo y se memoriza por
+  (ruta, mtime, tamaño): solo se vuelve a leer el archivo si cambió.
+- Con `v` igual al hash actual, VariantStaticFiles responde con caché inmutable de un año;
+  sin `v` (o con uno viejo) responde no-cache + ETag fuerte, y el cliente revalida con 304.
+En BD se guardan las URLs sin versión; `v` se agrega al armar la respuesta.
+Las refs /blobs/<clave> (almacenamiento S3, ver app/core/storage.py) se cambian por su URL firmada.
+"""
+import os, hashlib, threading
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+from app.core.settings_static import STATIC_DIR, MEDIA_DIR
+
+ASSET_MAX_AGE     = int(os.getenv("ASSET_MAX_AGE", str(365 * 24 * 3600)))
+ASSET_HASH_ITEMS  = int(os.getenv("ASSET_HASH_ITEMS", "4096"))
+
+IMMUTABLE_CACHE = f"public, max-age={ASSET_MAX_AGE}, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+_MOUNTS = (("/static/", STATIC_DIR), ("/media/", MEDIA_DIR))
+
+_lock = threading.Lock()
+_hashes: OrderedDict[str, tuple[int, int, str]] = OrderedDict()
+
+def content_hash(path: Path) -> str | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    key = str(path)
+    with _lock:
+        hit = _hashes.get(key)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            _hashes.move_to_end(key)
+            return hit[2]
+    h = hashlib.blake2b(digest_size=8)
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    digest = h.hexdigest()
+    with _lock:
+        _hashes[key] = (st.st_mtime_ns, st.st_size, digest)
+        _hashes.move_to_end(key)
+        while len(_hashes) > ASSET_HASH_ITEMS:
+            _hashes.popitem(last=False)
+    return digest
+
+def path_for_url(url: str) -> Path | None:
+    """Archivo local detrás de una URL /static/... o /media/... (None si no es nuestra)."""
+    path = (url or "").split("?", 1)[0].split("#", 1)[0]
+    for prefix, root in _MOUNTS:
+        if path.startswith(prefix):
+            p = (root / path[len(prefix):]).resolve()
+            try:
+                p.relative_to(root)
+            except ValueError:
+                return None
+            return p
+    return None
+
+def versioned_url(url: str | None) -> str | None:
+    """Agrega ?v=<hash> a URLs locales de /static y /media; el resto pasa igual."""
+    if not url:
+        return url
+    from app.core.storage import get_store, key_for_ref
+    key = key_for_ref(url)
+    if key is not None:
+        return get_store().signed_url(key)
+    p = path_for_url(url)
+    if p is None:
+        return url
+    digest = content_hash(p)
+    if digest is None:
+        return url  # aún no existe (p. ej. figura renderizándose): se sirve sin versión
+    base, _, query = url.partition("?")
+    params = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k != "v"]
+    params.append(("v", digest))
+    return f"{base}?{urlencode(params)}"
+
+def versioned_items(items: list | None) -> list | None:
+    """Copia de los ítems de una sesión con imageUrl versionada (los de BD no se tocan)."""
+    if not items:
+        return items
+    out = []
+    for it in items:
+        if isinstance(it, dict) and it.get("imageUrl"):
+            it = {**it, "imageUrl": versioned_url(it["imageUrl"])}
+        out.append(it)
+    return out
@@ -11,6 +11,7 @@ from app.ai.gemini import (
 
 # Base
 from app.core.engines.base import TopicEngine
+from app.core.metrics import metrics
 
 log = logging.getLogger(__name__)
 
@@ -644,6 +645,8 @@ class FraccionesBasicasEngine(TopicEngine):
             else:
                 log.warning("IA timeout (>90s) — uso fallback local")
             from app.ai.gemini import fallback_generate_exercises
+            metrics.inc("ai_fallbacks_total", site="exercises",
+                        reason=type(_exc[0]).__name__ if _exc[0] else "timeout")
             raw_items = fallback_generate_exercises(context_json, style, avoid_numbers or [])
 
         items: List[Dict[str, Any]] = []    
@@ -6,7 +6,8 @@ from typing import Any, Dict, List, Literal, Optional
 
 from app.core.engines.base import TopicEngine
 from app.core.content import resolve_context_path
-from app.ai.gemini import generate_explanation, generate_exercises_variant
+from app.core.metrics import metrics
+from app.ai.gemini import generate_explanation, generate_exercises_variant, fallback_generate_exercises
 
 VAK = Literal["visual","auditivo","kinestesico"]
 
@@ -41,7 +42,13 @@ class PorcentajesEngine(TopicEngine):
         explanation = generate_explanation(ctx)
 
         # Ítems según estilo (visual/auditivo generan MCQ/pareo/drag; kinestésico evita MCQ).
-        items = generate_exercises_variant(ctx, style, avoid_numbers=avoid_numbers or [])
+        # Si la IA falla (o el circuito está abierto) cae rápido a los ejercicios locales.
+        try:
+            items = generate_exercises_variant(ctx, style, avoid_numbers=avoid_numbers or [])
+        except Exception as e:
+            print(f"[porcentajes] IA no disponible, usando fallback local: {e}")
+            metrics.inc("ai_fallbacks_total", site="exercises", reason=type(e).__name__)
+            items = fallback_generate_exercises(ctx, style, avoid_numbers=avoid_numbers or [])
 
         # Meta y assets iniciales
         style_meta = {"style": style}
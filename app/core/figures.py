@@ -0,0 +1,115 @@
+# app/core/figures.py
+"""
+Figuras de apoyo como datos: especificación declarativa + SVG compacto.
+- spec:  {"kind": "fraction_bar", "n": 3, "d": 5} | {"kind": "percent_grid", "percent": 40}
+- name:  "frac-3-5" | "pct-40" (el mismo nombre que el PNG compartido, clave gen/<name>.png)
+El PNG (utils_imgs) queda como formato de respaldo para clientes que no aceptan SVG.
+"""
+import re
+from functools import lru_cache
+
+from app.core.utils_imgs import fraction_key, percent_key
+
+_NAME_RE = re.compile(r"^(?:frac-(\d{1,3})-(\d{1,3})|pct-(\d{1,3}))$")
+
+# misma paleta que los PNG
+_BLUE, _GREY, _INK, _BORDER = "#60a5fa", "#e5e7eb", "#1f2937", "#e5e7eb"
+
+def fraction_spec(n: int, d: int) -> dict:
+    n, d = fraction_key(n, d)
+    return {"kind": "fraction_bar", "n": n, "d": d}
+
+def percent_spec(pct: float) -> dict:
+    return {"kind": "percent_grid", "percent": percent_key(pct)}
+
+def spec_name(spec: dict) -> str:
+    if spec["kind"] == "fraction_bar":
+        return f"frac-{spec['n']}-{spec['d']}"
+    return f"pct-{spec['percent']}"
+
+def spec_from_name(name: str) -> dict | None:
+    m = _NAME_RE.match(name or "")
+    if not m:
+        return None
+    if m.group(3) is not None:
+        return percent_spec(int(m.group(3)))
+    d = int(m.group(2))
+    if d < 1 or d > 100:
+        return None
+    return fraction_spec(int(m.group(1)), d)
+
+def _n(x: float) -> str:
+    return f"{x:.1f}".rstrip("0").rstrip(".")
+
+@lru_cache(maxsize=1024)
+def _fraction_svg(n: int, d: int) -> str:
+    w, h, margin, gap, cell_h = 1200, 400, 40, 8, 140
+    y = h // 2 - cell_h // 2
+    cw = (w - 2 * margin - (d - 1) * gap) / d
+    filled = ' class="f"'
+    cells = "".join(
+        f'<rect x="{_n(margin + k * (cw + gap))}" y="{y}" width="{_n(cw)}" height="{cell_h}"'
+        f'{filled if k < n else ""}/>'
+        for k in range(d)
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {w} {h}">'
+        f'<style>rect{{fill:{_GREY};stroke:{_INK};stroke-width:2}}.f{{fill:{_BLUE}}}'
+        f'.b{{fill:#fff;stroke:{_BORDER}}}text{{font:48px sans-serif;fill:#111827}}</style>'
+        f'<rect class="b" x="20" y="20" width="{w - 40}" height="{h - 40}" rx="24"/>'
+        f'{cells}'
+        f'<text x="{w // 2}" y="{y + cell_h + 72}" text-anchor="middle">{n}/{d}</text></svg>'
+    )
+
+@lru_cache(maxsize=128)
+def _percent_svg(p: int) -> str:
+    # 10x10 celdas con patrones: 4 rects en lugar de 100
+    w, h = 1200, 400
+    left, top = 60, 140
+    grid_w, grid_h, gap = w - 120, h - 180, 2
+    cw, ch = (grid_w - 9 * gap) / 10, (grid_h - 9 * gap) / 10
+    sw, sh = cw + gap, ch + gap
+    full_rows, rest = divmod(p, 10)
+
+    def cell_pattern(pid: str, color: str) -> str:
+        return (f'<pattern id="{pid}" x="{left}" y="{top}" width="{_n(sw)}" height="{_n(sh)}" '
+                f'patternUnits="userSpaceOnUse"><rect x="1" y="1" width="{_n(cw - 2)}" height="{_n(ch - 2)}" '
+                f'fill="{color}" stroke="{_INK}" stroke-width="2"/></pattern>')
+
+    rects = []
+    def area(x0: float, y0: float, x1: float, y1: float, pid: str):
+        if x1 > x0 and y1 > y0:
+            rects.append(f'<rect x="{_n(x0)}" y="{_n(y0)}" width="{_n(x1 - x0)}" height="{_n(y1 - y0)}" fill="url(#{pid})"/>')
+
+    bottom, right = top + 10 * sh, left + 10 * sw
+    area(left, top, right, top + full_rows * sh, "f")                               # filas completas
+    if full_rows < 10:
+        row_top, row_bottom = top + full_rows * sh, top + (full_rows + 1) * sh
+        area(left, row_top, left + rest * sw, row_bottom, "f")                     # fila parcial
+        area(left + rest * sw, row_top, right, row_bottom, "e")
+        area(left, row_bottom, right, bottom, "e")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {w} {h}">'
+        f'<defs>{cell_pattern("f", _BLUE)}{cell_pattern("e", _GREY)}</defs>'
+        f'<rect x="20" y="20" width="{w - 40}" height="{h - 40}" rx="24" fill="#fff" stroke="{_BORDER}" stroke-width="2"/>'
+        f'{"".join(rects)}</svg>'
+    )
+
+def render_svg(spec: dict) -> str:
+    if spec["kind"] == "fraction_bar":
+        return _fraction_svg(spec["n"], spec["d"])
+    return _percent_svg(spec["percent"])
+
+def render_png(spec: dict) -> str | None:
+    """
+    Respaldo raster: clave del PNG compartido en el almacenamiento (se genera si aún no existe).
+    None si no quedó listo a tiempo (espera agotada, pool caído).
+    """
+    from app.core.storage import get_store
+    from app.core.utils_imgs import ensure_fraction_png, ensure_percent_png
+    if spec["kind"] == "fraction_bar":
+        ensure_fraction_png(spec["n"], spec["d"], wait=True)
+    else:
+        ensure_percent_png(spec["percent"], wait=True)
+    key = f"gen/{spec_name(spec)}.png"
+    return key if get_store().exists(key) else None
@@ -0,0 +1,115 @@
+# app/core/image_variants.py
+"""
+Variantes codificadas de imágenes estáticas (figuras, portadas, avatares, insignias).
+- PNG con paleta (≤256 colores): las figuras son de color plano, la paleta es exacta.
+- WebP: sin pérdida si la imagen tiene ≤256 colores (figuras), con pérdida si es foto/ilustración.
+- Anchos fijos (IMAGE_VARIANT_WIDTHS); un `w=` arbitrario se ajusta al siguiente ancho,
+  así el número de variantes por archivo está acotado.
+Las variantes viven junto al original en `_v/`:  covers/_v/fracciones.w640.webp
+"""
+import os, logging, threading
+from pathlib import Path
+
+from PIL import Image
+
+log = logging.getLogger("image_variants")
+
+IMAGE_VARIANTS = os.getenv("IMAGE_VARIANTS", "1") == "1"
+VARIANT_WIDTHS = tuple(sorted({
+    int(x) for x in os.getenv("IMAGE_VARIANT_WIDTHS", "160,320,640,1200").split(",") if x.strip().isdigit()
+}))
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", "80"))
+
+SOURCE_SUFFIXES = (".png", ".jpg", ".jpeg")
+VARIANT_DIR = "_v"
+FORMATS = ("webp", "png")
+
+# ------------------ Selección ------------------
+def snap_width(w: int | None, original: int) -> int:
+    """Ancho de la variante para la pista `w` (0 = ancho original)."""
+    if not w or w <= 0:
+        return 0
+    for cand in VARIANT_WIDTHS:
+        if cand >= w:
+            return 0 if cand >= original else cand
+    return 0
+
+def pick_format(accept: str | None) -> str:
+    return "webp" if "image/webp" in (accept or "").lower() else "png"
+
+def variant_path(src: Path, fmt: str, width: int) -> Path:
+    tag = f"w{width}" if width else "full"
+    return src.parent / VARIANT_DIR / f"{src.stem}.{tag}.{fmt}"
+
+def is_variant(path: str) -> bool:
+    return f"/{VARIANT_DIR}/" in f"/{path}"
+
+# ------------------ Codificación ------------------
+def _is_flat(img: Image.Image) -> bool:
+    return img.getcolors(256) is not None
+
+def _resized(img: Image.Image, width: int) -> Image.Image:
+    if not width or width >= img.width:
+        return img
+    h = max(1, round(img.height * width / img.width))
+    return img.resize((width, h), Image.Resampling.LANCZOS)
+
+def to_palette(img: Image.Image) -> Image.Image:
+    """Paleta adaptativa de 256 colores (exacta si la imagen ya tiene ≤256)."""
+    if img.mode == "P":
+        return img
+    if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+        # MEDIANCUT no soporta alfa
+        return img.convert("RGBA").quantize(256, method=Image.Quantize.FASTOCTREE)
+    return img.convert("RGB").convert("P", palette=Image.Palette.ADAPTIVE, colors=256)
+
+def _atomic_save(img: Image.Image, out: Path, **params):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    img.save(tmp, **params)
+    os.replace(tmp, out)
+
+def save_png(img: Image.Image, out: Path):
+    """PNG con paleta, escritura atómica."""
+    _atomic_save(to_palette(img), out, format="PNG", optimize=True)
+
+def encode_variant(img: Image.Image, out: Path, fmt: str, width: int):
+    im = _resized(img, width)
+    if fmt == "webp":
+        if _is_flat(im):
+            _atomic_save(im, out, format="WEBP", lossless=True, method=4)
+        else:
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "PA") else "RGB")
+            _atomic_save(im, out, format="WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        save_png(im, out)
+
+def write_variants(src: Path, img: Image.Image | None = None, formats: tuple = ("webp",)):
+    """Pregenera las variantes de `src` (p. ej. al renderizar una figura)."""
+    if img is None:
+        with Image.open(src) as im:
+            img = im.copy()
+    for fmt in formats:
+        for width in (0,) + tuple(w for w in VARIANT_WIDTHS if w < img.width):
+            encode_variant(img, variant_path(src, fmt, width), fmt, width)
+
+def ensure_variant(src: Path, fmt: str, w: int | None) -> Path | None:
+    """
+    Devuelve la variante (fmt, w) de `src`, generándola si falta o si el original cambió.
+    None si no hay variante que servir (se sirve el original).
+    """
+    try:
+        with Image.open(src) as im:
+            width = snap_width(w, im.width)
+            if fmt == "png" and width == 0:
+                return None
+            out = variant_path(src, fmt, width)
+            if out.exists() and out.stat().st_mtime >= src.stat().st_mtime:
+                return out
+            im.load()
+            encode_variant(im, out, fmt, width)
+            return out
+    except Exception as e:
+        log.warning("image variant failed (%s, %s, w=%s): %r", src.name, fmt, w, e)
+        return None
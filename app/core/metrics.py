@@ -0,0 +1,143 @@
+"""
+Registro de métricas en proceso (sin dependencias externas).
+- counter:   inc("ai_retries_total", model="...")
+- histogram: observe("ai_call_seconds", 1.23, model="...", site="...")
+- gauge:     set_gauge("ai_cache_items", 12)
+snapshot() devuelve JSON para /metrics; render_prometheus() el formato de texto
+de Prometheus (exposition 0.0.4) para que lo pueda raspar un scraper.
+"""
+import threading, math
+from bisect import bisect_left
+
+# segundos; cubren desde aciertos de caché hasta el join de 90 s de ejercicios
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 45, 60, 90)
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # último = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float):
+        self.counts[bisect_left(self.buckets, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Aproximación por cubos (límite superior del cubo que contiene el cuantil)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return self.buckets[i] if i < len(self.buckets) else math.inf
+        return math.inf
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._gauges: dict[str, dict[tuple, float]] = {}
+        self._hists: dict[str, dict[tuple, _Histogram]] = {}
+        self._hist_buckets: dict[str, tuple] = {}
+        self._help: dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str, buckets: tuple | None = None):
+        with self._lock:
+            self._help[name] = help_text
+            if buckets:
+                self._hist_buckets[name] = tuple(sorted(buckets))
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels_key(labels)] = float(value)
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._hists.setdefault(name, {})
+            h = series.get(key)
+            if h is None:
+                h = series[key] = _Histogram(self._hist_buckets.get(name, DEFAULT_BUCKETS))
+            h.observe(float(value))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear(); self._gauges.clear(); self._hists.clear()
+
+    # ---- exportación ----
+    def snapshot(self) -> dict:
+        with self._lock:
+            out: dict = {"counters": {}, "gauges": {}, "histograms": {}}
+            for name, series in self._counters.items():
+                out["counters"][name] = [{"labels": dict(k), "value": v} for k, v in series.items()]
+            for name, series in self._gauges.items():
+                out["gauges"][name] = [{"labels": dict(k), "value": v} for k, v in series.items()]
+            for name, series in self._hists.items():
+                out["histograms"][name] = [{
+                    "labels": dict(k),
+                    "count": h.count,
+                    "sum": round(h.sum, 4),
+                    "avg": round(h.sum / h.count, 4) if h.count else None,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "p99": h.quantile(0.99),
+                } for k, h in series.items()]
+            return out
+
+    def render_prometheus(self) -> str:
+        def fmt_labels(key: tuple, extra: tuple = ()) -> str:
+            items = list(key) + list(extra)
+            if not items:
+                return ""
+            esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+        lines: list[str] = []
+        with self._lock:
+            for kind, store in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(store.items()):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for k, v in series.items():
+                        lines.append(f"{name}{fmt_labels(k)} {v:g}")
+            for name, series in sorted(self._hists.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for k, h in series.items():
+                    acc = 0
+                    for i, c in enumerate(h.counts):
+                        acc += c
+                        le = f"{h.buckets[i]:g}" if i < len(h.buckets) else "+Inf"
+                        lines.append(f"{name}_bucket{fmt_labels(k, (('le', le),))} {acc}")
+                    lines.append(f"{name}_sum{fmt_labels(k)} {h.sum:g}")
+                    lines.append(f"{name}_count{fmt_labels(k)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = Registry()
+
+metrics.describe("ai_call_seconds", "Duración de llamadas a Gemini vista por el caller (incluye reintentos)")
+metrics.describe("ai_calls_total", "Llamadas a Gemini por modelo, sitio y resultado")
+metrics.describe("ai_http_responses_total", "Respuestas HTTP de Gemini por intento")
+metrics.describe("ai_retries_total", "Reintentos hacia Gemini")
+metrics.describe("ai_rejected_total", "Llamadas cortadas antes de salir (circuito, saturación, cupo)")
+metrics.describe("ai_tokens_total", "Tokens según usageMetadata")
+metrics.describe("ai_parse_failures_total", "Respuestas de Gemini que no se pudieron parsear")
+metrics.describe("ai_items_replaced_total", "Ejercicios de la IA reemplazados por locales, por motivo de rechazo")
+metrics.describe("ai_fallbacks_total", "Veces que se usó el fallback local en lugar de la IA")
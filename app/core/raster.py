@@ -0,0 +1,178 @@
+# app/core/raster.py
+"""
+Render raster de las figuras compartidas (barra de fracción, rejilla de porcentaje).
+- Fuentes: se cargan una vez por tamaño recorriendo FIGURE_FONTS (la imagen slim
+  trae DejaVu, no Arial); si ninguna carga se usa la fuente por defecto de Pillow.
+- Plantillas: lienzo con borde, rejilla vacía y barras vacías se dibujan una vez y
+  quedan cacheadas como arrays de solo lectura.
+- Relleno: las celdas se pintan por slices del buffer NumPy, sin una llamada de
+  dibujo por celda. scripts/bench_figures.py lo compara con el dibujo anterior.
+"""
+import os, logging
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+log = logging.getLogger("raster")
+
+SIZE = (1200, 400)
+
+WHITE  = (255, 255, 255)
+BORDER = (229, 231, 235)
+EMPTY  = (229, 231, 235)
+FILL   = (96, 165, 250)
+INK    = (31, 41, 55)
+TEXT   = (17, 24, 39)
+TITLE  = (30, 58, 138)
+SUB    = (55, 65, 81)
+
+OUTLINE = 2
+
+FONT_CANDIDATES = [
+    f.strip() for f in os.getenv(
+        "FIGURE_FONTS",
+        "DejaVuSans.ttf,/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf,arial.ttf",
+    ).split(",") if f.strip()
+]
+
+# ------------------ Fuentes ------------------
+@lru_cache(maxsize=16)
+def get_font(size: int) -> ImageFont.ImageFont:
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    log.warning("Ninguna fuente de FIGURE_FONTS disponible (%s); uso la de Pillow", FONT_CANDIDATES)
+    return ImageFont.load_default(size=size)
+
+# ------------------ Plantillas ------------------
+def _frozen(a: np.ndarray) -> np.ndarray:
+    a.flags.writeable = False
+    return a
+
+@lru_cache(maxsize=1)
+def _canvas() -> np.ndarray:
+    """Fondo blanco con el borde redondeado (común a todas las figuras)."""
+    w, h = SIZE
+    img = Image.new("RGB", SIZE, WHITE)
+    ImageDraw.Draw(img).rounded_rectangle([20, 20, w - 20, h - 20], radius=24, outline=BORDER, width=2, fill=WHITE)
+    return _frozen(np.array(img))
+
+def _span(start: float, length: float) -> tuple[int, int]:
+    # ImageDraw trunca las coordenadas y el extremo es inclusivo
+    return int(start), int(start + length) + 1
+
+def _paint_cell(a: np.ndarray, box: tuple, color: tuple):
+    y0, y1, x0, x1 = box
+    a[y0:y1, x0:x1] = INK
+    a[y0 + OUTLINE:y1 - OUTLINE, x0 + OUTLINE:x1 - OUTLINE] = color
+
+def _fill_interior(a: np.ndarray, box: tuple, color: tuple = FILL):
+    y0, y1, x0, x1 = box
+    a[y0 + OUTLINE:y1 - OUTLINE, x0 + OUTLINE:x1 - OUTLINE] = color
+
+# ---- barra n/d ----
+_BAR_MARGIN, _BAR_GAP, _BAR_CELL_H = 40, 8, 140
+
+def _bar_top() -> int:
+    return SIZE[1] // 2 - _BAR_CELL_H // 2
+
+@lru_cache(maxsize=128)
+def _bar_boxes(d: int) -> tuple:
+    """(y0, y1, x0, x1) de cada celda, con extremos exclusivos."""
+    w = SIZE[0]
+    y = _bar_top()
+    cw = (w - 2 * _BAR_MARGIN - (d - 1) * _BAR_GAP) / d
+    return tuple(_span(y, _BAR_CELL_H) + _span(_BAR_MARGIN + k * (cw + _BAR_GAP), cw) for k in range(d))
+
+@lru_cache(maxsize=16)
+def _bar_template(d: int) -> np.ndarray:
+    # ~1.4 MB por denominador; los habituales (2..12) caben de sobra
+    a = _canvas().copy()
+    for box in _bar_boxes(d):
+        _paint_cell(a, box, EMPTY)
+    return _frozen(a)
+
+# ---- rejilla 10x10 ----
+_GRID_LEFT, _GRID_TOP, _GRID_GAP, _GRID_N = 60, 140, 2, 10
+
+@lru_cache(maxsize=1)
+def _grid_spans() -> tuple[tuple, tuple]:
+    """[(inicio, fin)] de columnas y filas, con los mismos redondeos que ImageDraw.rectangle."""
+    w, h = SIZE
+    cw = ((w - 120) - (_GRID_N - 1) * _GRID_GAP) / _GRID_N
+    ch = ((h - 180) - (_GRID_N - 1) * _GRID_GAP) / _GRID_N
+    cols = tuple(_span(_GRID_LEFT + c * (cw + _GRID_GAP), cw) for c in range(_GRID_N))
+    rows = tuple(_span(_GRID_TOP + r * (ch + _GRID_GAP), ch) for r in range(_GRID_N))
+    return cols, rows
+
+def _grid_box(r: int, c: int) -> tuple:
+    cols, rows = _grid_spans()
+    return rows[r] + cols[c]
+
+@lru_cache(maxsize=1)
+def _grid_templates() -> tuple[np.ndarray, np.ndarray]:
+    """(rejilla vacía, rejilla llena): solo difieren en el interior de las celdas."""
+    empty, full = _canvas().copy(), _canvas().copy()
+    for r in range(_GRID_N):
+        for c in range(_GRID_N):
+            box = _grid_box(r, c)
+            _paint_cell(empty, box, EMPTY)
+            _paint_cell(full, box, FILL)
+    return _frozen(empty), _frozen(full)
+
+# ------------------ Render ------------------
+def render_fraction_bar(n: int, d: int) -> Image.Image:
+    d = max(1, int(d)); n = max(0, min(int(n), d))
+    a = _bar_template(d).copy()
+    for box in _bar_boxes(d)[:n]:
+        _fill_interior(a, box)
+    img = Image.fromarray(a)
+
+    draw = ImageDraw.Draw(img)
+    label, font = f"{n}/{d}", get_font(48)
+    tw = draw.textbbox((0, 0), label, font=font)[2]
+    draw.text(((SIZE[0] - tw) / 2, _bar_top() + _BAR_CELL_H + 24), label, fill=TEXT, font=font)
+    return img
+
+def render_percent_grid(percent: int) -> Image.Image:
+    """Rejilla 10×10; sombrea `percent` celdas (por filas) copiando franjas de la plantilla llena."""
+    p = max(0, min(100, round(percent)))
+    empty, full = _grid_templates()
+    a = empty.copy()
+    cols, rows = _grid_spans()
+    x0, x_end = cols[0][0], cols[-1][1]
+    full_rows, rest = divmod(p, _GRID_N)
+    if full_rows:
+        y0, y1 = rows[0][0], rows[full_rows - 1][1]
+        a[y0:y1, x0:x_end] = full[y0:y1, x0:x_end]
+    if rest:
+        y0, y1 = rows[full_rows]
+        a[y0:y1, x0:cols[rest - 1][1]] = full[y0:y1, x0:cols[rest - 1][1]]
+    return Image.fromarray(a)
+
+def draw_title_sub(img: Image.Image, title: str, sub: str):
+    draw = ImageDraw.Draw(img)
+    draw.text((40, 30), title, fill=TITLE, font=get_font(35))
+    draw.text((40, 90), sub, fill=SUB, font=get_font(20))
+
+def render_placeholder() -> Image.Image:
+    """Figura genérica (se sirve cuando no hay capacidad para renderizar la real)."""
+    img = Image.fromarray(_canvas().copy())
+    draw_title_sub(img, "Figura de apoyo", "Observa el enunciado y resuélvelo paso a paso.")
+    return img
+
+def render(job: tuple) -> Image.Image:
+    """
+    job = (kind, params, title, sub); kind: "frac" | "pct" | "generic".
+    Es picklable para poder mandarlo a otro proceso (ver render_pool).
+    """
+    kind, params, title, sub = job
+    if kind == "generic":
+        return render_placeholder()
+    img = render_fraction_bar(*params) if kind == "frac" else render_percent_grid(*params)
+    if title is not None:
+        draw_title_sub(img, title, sub or "")
+    return img
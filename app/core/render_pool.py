@@ -0,0 +1,129 @@
+# app/core/render_pool.py
+"""
+Pool de procesos acotado para renderizar figuras.
+Dibujar con Pillow y codificar PNG es CPU puro y retiene el GIL, así que hacerlo
+dentro de _open_session_core frena al resto de requests del worker.
+- submit(job, key): encola el render (sin esperar). Devuelve None si el pool está
+  saturado (FIGURE_QUEUE_MAX renders pendientes) para que el caller use la figura genérica.
+- render_now(job, key): encola y espera; si no hay pool, renderiza en línea.
+`key` es la clave en el almacenamiento (app/core/storage.py), p. ej. gen/frac-3-5.png.
+Los nombres dependen solo del contenido, así que la URL final se conoce
+antes de que el archivo exista y se puede devolver de inmediato.
+FIGURE_WORKERS=0 desactiva el pool (render en línea, como antes).
+"""
+import os, time, logging, threading
+import multiprocessing as mp
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.core.metrics import metrics
+
+log = logging.getLogger("render_pool")
+
+FIGURE_WORKERS   = int(os.getenv("FIGURE_WORKERS", "2"))
+FIGURE_QUEUE_MAX = int(os.getenv("FIGURE_QUEUE_MAX", "32"))
+FIGURE_WAIT_SEC  = float(os.getenv("FIGURE_WAIT_SEC", "10"))
+
+metrics.describe("figure_renders_total", "Renders de figuras por resultado (ok, error, saturated, inline)")
+metrics.describe("figure_render_seconds", "Tiempo de render + PNG de una figura dentro del worker",
+                 buckets=(0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1, 2))
+
+# ------------------ Trabajo (corre en el proceso hijo) ------------------
+def render_to_file(job: tuple, key: str) -> float:
+    """Renderiza `job` y lo publica en el almacenamiento bajo `key`. Devuelve los segundos usados."""
+    from app.core import raster, image_variants
+    from app.core.storage import get_store
+    t0 = time.perf_counter()
+    store = get_store()
+    if not store.exists(key):
+        img = raster.render(job)
+        # PNG con paleta (el writer lo publica de forma atómica)
+        with store.writer(key) as tmp:
+            image_variants.to_palette(img).save(tmp, format="PNG", optimize=True)
+        # WebP por ancho, ya que estamos en el worker (solo en disco local: las sirve VariantStaticFiles)
+        path = store.local_path(key)
+        if path is not None and image_variants.IMAGE_VARIANTS:
+            image_variants.write_variants(path, img)
+    return time.perf_counter() - t0
+
+# ------------------ Pool (proceso web) ------------------
+_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+_inflight: dict[str, Future] = {}
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: el proceso web tiene hilos (loop de Gemini, escáneres) y fork los copiaría a medias
+        _pool = ProcessPoolExecutor(max_workers=FIGURE_WORKERS, mp_context=mp.get_context("spawn"))
+    return _pool
+
+def _done(key: str, fut: Future):
+    global _pool
+    with _lock:
+        _inflight.pop(key, None)
+    err = fut.exception()
+    if err is None:
+        metrics.inc("figure_renders_total", outcome="ok")
+        metrics.observe("figure_render_seconds", fut.result())
+        return
+    metrics.inc("figure_renders_total", outcome="error")
+    log.warning("figure render failed (%s): %r", key, err)
+    if isinstance(err, BrokenProcessPool):
+        with _lock:
+            _pool = None  # se recrea en el próximo submit
+
+def _inline(job: tuple, key: str) -> Future:
+    fut: Future = Future()
+    try:
+        fut.set_result(render_to_file(job, key))
+        metrics.inc("figure_renders_total", outcome="inline")
+    except Exception as e:
+        fut.set_exception(e)
+    return fut
+
+def submit(job: tuple, key: str) -> Future | None:
+    if FIGURE_WORKERS <= 0:
+        return _inline(job, key)
+    with _lock:
+        fut = _inflight.get(key)
+        if fut is not None:
+            return fut
+        if len(_inflight) >= FIGURE_QUEUE_MAX:
+            metrics.inc("figure_renders_total", outcome="saturated")
+            return None
+        try:
+            fut = _get_pool().submit(render_to_file, job, key)
+        except (BrokenProcessPool, RuntimeError) as e:
+            log.warning("render pool unavailable, rendering inline: %r", e)
+            fut = None
+        if fut is not None:
+            _inflight[key] = fut
+    if fut is None:
+        return _inline(job, key)
+    fut.add_done_callback(lambda f, key=key: _done(key, f))
+    return fut
+
+def render_now(job: tuple, key: str, timeout: float | None = None) -> bool:
+    """Renderiza y espera (para quien necesita el archivo ya: /figures, precompute)."""
+    fut = submit(job, key)
+    if fut is None:
+        fut = _inline(job, key)
+    try:
+        fut.result(timeout=timeout or FIGURE_WAIT_SEC)
+        return True
+    except Exception as e:
+        log.warning("figure render wait failed (%s): %r", key, e)
+        from app.core.storage import get_store
+        return get_store().exists(key)
+
+def pending() -> int:
+    with _lock:
+        return len(_inflight)
+
+def shutdown():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
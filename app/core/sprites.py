@@ -0,0 +1,129 @@
+# app/core/sprites.py
+"""
+Atlas de sprites para insignias y avatares de stock.
+Cada grupo (SPRITE_GROUPS) empaqueta sus PNG en una sola imagen más un mapa de coordenadas:
+    static/sprites/badges.png   +  static/sprites/badges.json
+    {"image": "/media/sprites/badges.png", "width": 512, "height": 512, "tile": 128,
+     "sprites": {"/media/badges/welcome.png": {"x": 0, "y": 0, "w": 128, "h": 128}, ...}}
+- Cada imagen entra en una celda de SPRITE_TILE px (se reduce conservando proporción).
+- Las claves del mapa son las mismas URLs que guarda la BD (Badge.image_url, avatar_url),
+  así una respuesta puede pasar de URL a atlas + offset sin tablas extra.
+- La URL del atlas se versiona por contenido (assets.versioned_url): caché inmutable, y
+  VariantStaticFiles la sirve como WebP a quien lo acepte.
+El atlas se reconstruye solo si cambian los originales (firma por nombre, mtime y tamaño).
+Build explícito: python scripts/build_sprites.py
+"""
+import os, json, math, hashlib, logging, threading
+from pathlib import Path
+
+from PIL import Image
+
+from app.core import assets, image_variants
+from app.core.settings_static import MEDIA_DIR, media_url_for
+
+log = logging.getLogger("sprites")
+
+SPRITE_TILE = int(os.getenv("SPRITE_TILE", "128"))
+SPRITE_DIR = MEDIA_DIR / "sprites"
+
+# grupo → carpeta de MEDIA_DIR; solo el primer nivel (los avatares subidos viven en shards)
+SPRITE_GROUPS = {"badges": "badges", "avatars": "avatars"}
+# avatares subidos por usuarios que hayan quedado en la raíz (almacenamiento sin shards)
+_EXCLUDE_PREFIX = "user_"
+
+_lock = threading.Lock()
+_manifests: dict[str, dict] = {}
+
+def _sources(group: str) -> list[Path]:
+    root = MEDIA_DIR / SPRITE_GROUPS[group]
+    return sorted(p for p in root.glob("*.png") if p.is_file() and not p.name.startswith(_EXCLUDE_PREFIX))
+
+def _signature(files: list[Path]) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    h.update(f"tile={SPRITE_TILE}".encode())
+    for p in files:
+        st = p.stat()
+        h.update(f"{p.name}:{st.st_mtime_ns}:{st.st_size}".encode())
+    return h.hexdigest()
+
+def _atomic_write(out: Path, write):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, out)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def build(group: str) -> dict:
+    """Empaqueta el grupo y escribe atlas + mapa. Devuelve el mapa."""
+    files = _sources(group)
+    cols = max(1, math.ceil(math.sqrt(len(files))))
+    rows = max(1, math.ceil(len(files) / cols))
+    atlas = Image.new("RGBA", (cols * SPRITE_TILE, rows * SPRITE_TILE), (0, 0, 0, 0))
+    sprites = {}
+    for i, src in enumerate(files):
+        with Image.open(src) as im:
+            im = im.convert("RGBA")
+            im.thumbnail((SPRITE_TILE, SPRITE_TILE), Image.Resampling.LANCZOS)
+        x, y = (i % cols) * SPRITE_TILE, (i // cols) * SPRITE_TILE
+        atlas.paste(im, (x, y))
+        sprites[media_url_for(src)] = {"x": x, "y": y, "w": im.width, "h": im.height}
+
+    png = SPRITE_DIR / f"{group}.png"
+    _atomic_write(png, lambda p: atlas.save(p, format="PNG", optimize=True))
+    if image_variants.IMAGE_VARIANTS:
+        # solo el ancho completo: una variante reducida rompería las coordenadas
+        image_variants.encode_variant(atlas, image_variants.variant_path(png, "webp", 0), "webp", 0)
+
+    manifest = {
+        "image": media_url_for(png),
+        "width": atlas.width, "height": atlas.height, "tile": SPRITE_TILE,
+        "signature": _signature(files),
+        "sprites": sprites,
+    }
+    _atomic_write(SPRITE_DIR / f"{group}.json",
+                  lambda p: p.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8"))
+    log.info("sprite atlas %s: %d images, %dx%d", group, len(files), atlas.width, atlas.height)
+    return manifest
+
+def manifest(group: str) -> dict | None:
+    """Mapa vigente del grupo (lo reconstruye si los originales cambiaron). None si no existe el grupo."""
+    if group not in SPRITE_GROUPS:
+        return None
+    sig = _signature(_sources(group))
+    cached = _manifests.get(group)
+    if cached and cached["signature"] == sig:
+        return cached
+    with _lock:
+        cached = _manifests.get(group)
+        if cached and cached["signature"] == sig:
+            return cached
+        path = SPRITE_DIR / f"{group}.json"
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = None
+        if not data or data.get("signature") != sig or not (SPRITE_DIR / f"{group}.png").exists():
+            data = build(group)
+        _manifests[group] = data
+        return data
+
+def public_manifest(group: str) -> dict | None:
+    """Mapa para el cliente: URL del atlas versionada y sin la firma interna."""
+    m = manifest(group)
+    if m is None:
+        return None
+    return {"image": assets.versioned_url(m["image"]), "width": m["width"], "height": m["height"],
+            "tile": m["tile"], "sprites": m["sprites"]}
+
+def sprite_refs(group: str) -> dict[str, dict]:
+    """URL de BD → {"atlas", "x", "y", "w", "h"} para armar respuestas ({} si no hay atlas)."""
+    m = manifest(group)
+    if m is None:
+        return {}
+    atlas = assets.versioned_url(m["image"])
+    return {url: {"atlas": atlas, **cell} for url, cell in m["sprites"].items()}
+
+def lookup(refs: dict[str, dict], url: str | None) -> dict | None:
+    return refs.get(url.split("?", 1)[0]) if url else None
@@ -0,0 +1,103 @@
+# app/core/static_files.py
+"""
+StaticFiles con variantes de imagen y caché por contenido.
+- Variantes (ver app/core/image_variants.py):
+    GET /media/covers/fracciones.png?w=320  con  Accept: image/webp
+      → covers/_v/fracciones.w320.webp (se genera la primera vez)
+  Sin `w=` ni soporte WebP se sirve el original, como antes.
+- Caché (ver app/core/assets.py): ETag fuerte = hash del contenido servido;
+  `?v=` igual al hash del original → inmutable un año; si no, no-cache y 304 al revalidar.
+- Offload (STATIC_OFFLOAD): Python resuelve el archivo, arma cabeceras y contesta los 304,
+  pero el cuerpo lo entrega el proxy de delante:
+    x-accel    → X-Accel-Redirect: <accel_prefix><ruta relativa>   (nginx)
+    x-sendfile → X-Sendfile: <ruta absoluta>                       (Apache, lighttpd)
+  Vacío = el worker sirve el archivo (desarrollo). Ejemplo nginx para /media:
+    location /_accel/media/ { internal; alias /srv/edumath/static/; }
+"""
+import os, stat
+from pathlib import Path
+from urllib.parse import parse_qs, quote
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.core import assets, image_variants
+
+STATIC_OFFLOAD = os.getenv("STATIC_OFFLOAD", "").strip().lower()  # "" | x-accel | x-sendfile
+
+class VariantStaticFiles(StaticFiles):
+    def __init__(self, *args, accel_prefix: str | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.accel_prefix = (accel_prefix or "").rstrip("/") + "/"
+
+    def _wants_variant(self, path: str, scope: Scope) -> tuple[str, int | None] | None:
+        if not image_variants.IMAGE_VARIANTS or scope["method"] not in ("GET", "HEAD"):
+            return None
+        if not path.lower().endswith(image_variants.SOURCE_SUFFIXES) or image_variants.is_variant(path):
+            return None
+        fmt = image_variants.pick_format(Headers(scope=scope).get("accept"))
+        qs = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        try:
+            w = int((qs.get("w") or ["0"])[0])
+        except ValueError:
+            w = 0
+        if fmt == "png" and w <= 0:
+            return None
+        return fmt, w
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        want = self._wants_variant(path, scope)
+        if want is not None:
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                variant = await anyio.to_thread.run_sync(
+                    image_variants.ensure_variant, Path(full_path), want[0], want[1]
+                )
+                if variant is not None:
+                    return self.file_response(str(variant), os.stat(variant), scope)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        served_hash = assets.content_hash(Path(full_path))
+        if served_hash:
+            response.headers["etag"] = f'"{served_hash}"'
+        qs = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        version = (qs.get("v") or [""])[0]
+        if version and version == assets.content_hash(self._source_path(full_path, scope)):
+            response.headers["cache-control"] = assets.IMMUTABLE_CACHE
+        else:
+            response.headers["cache-control"] = assets.REVALIDATE_CACHE
+        if str(scope.get("path", "")).lower().endswith(image_variants.SOURCE_SUFFIXES):
+            # la misma URL devuelve WebP o PNG según Accept
+            response.headers["vary"] = "Accept"
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        if STATIC_OFFLOAD in ("x-accel", "x-sendfile"):
+            return self._offload(full_path, response)
+        return response
+
+    def _offload(self, full_path, file_response: FileResponse) -> Response:
+        """Respuesta vacía con la ruta para que el proxy envíe el archivo."""
+        full = Path(full_path).resolve()
+        headers = {k: v for k, v in file_response.headers.items()
+                   if k in ("content-type", "etag", "last-modified", "cache-control", "vary")}
+        if STATIC_OFFLOAD == "x-accel":
+            rel = full.relative_to(Path(self.directory).resolve()).as_posix()
+            headers["x-accel-redirect"] = quote(self.accel_prefix + rel)
+        else:
+            headers["x-sendfile"] = str(full)
+        return Response(status_code=200, headers=headers)
+
+    def _source_path(self, full_path, scope: Scope) -> Path:
+        """El original de la URL pedida (para una variante, `v` versiona al original)."""
+        full = Path(full_path)
+        if image_variants.VARIANT_DIR not in full.parts:
+            return full
+        return assets.path_for_url(str(scope.get("path", ""))) or full
@@ -0,0 +1,284 @@
+# app/core/storage.py
+"""
+Almacenamiento de archivos generados (figuras, TTS, avatares) detrás de una interfaz.
+Las claves son "<área>/<nombre>": gen/frac-3-5.png, tts/sess-12-explanation.wav, avatars/u7.webp
+- local: directorios con prefijo de hash (gen/3f/a1/frac-3-5.png) para que ningún
+         directorio acumule millones de archivos; escritura atómica (tmp + os.replace).
+- s3:    API compatible con S3 (AWS, MinIO, R2...) firmada con SigV4 sobre httpx;
+         un PUT es atómico por definición. Las URLs que recibe el cliente son prefirmadas.
+En BD se guarda ref(key) (estable); la URL para el cliente sale de signed_url(key) al
+armar la respuesta (ver assets.versioned_url). /blobs/<key> redirige a una URL fresca.
+STORAGE_BACKEND=local|s3.
+"""
+import os, hmac, time, shutil, hashlib, logging, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from app.core.settings_static import GEN_DIR, TTS_DIR, MEDIA_DIR
+
+log = logging.getLogger("storage")
+
+STORAGE_BACKEND     = os.getenv("STORAGE_BACKEND", "local").strip().lower()
+STORAGE_SHARD_DEPTH = int(os.getenv("STORAGE_SHARD_DEPTH", "2"))   # niveles de 2 hex (256 dirs c/u)
+
+S3_ENDPOINT    = os.getenv("S3_ENDPOINT", "https://s3.amazonaws.com").rstrip("/")
+S3_BUCKET      = os.getenv("S3_BUCKET", "edumath")
+S3_REGION      = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY  = os.getenv("S3_ACCESS_KEY", "")
+S3_SECRET_KEY  = os.getenv("S3_SECRET_KEY", "")
+S3_PATH_STYLE  = os.getenv("S3_PATH_STYLE", "1") == "1"           # MinIO: endpoint/bucket/key
+S3_PUBLIC_URL  = os.getenv("S3_PUBLIC_URL", "").rstrip("/")        # bucket/CDN público: sin firmar
+S3_URL_TTL_SEC = int(os.getenv("S3_URL_TTL_SEC", str(24 * 3600)))
+S3_TIMEOUT_SEC = float(os.getenv("S3_TIMEOUT_SEC", "30"))
+
+BLOB_PREFIX = "/blobs/"
+
+class StorageError(RuntimeError):
+    pass
+
+def _split_key(key: str) -> tuple[str, str]:
+    area, _, name = key.strip("/").partition("/")
+    if not area or not name or ".." in key.split("/") or "/" in name:
+        raise StorageError(f"clave inválida: {key!r}")
+    return area, name
+
+class BlobStore:
+    """Interfaz común. `writer(key)` da un Path temporal; al salir sin error se publica."""
+    name = "base"
+
+    @contextmanager
+    def writer(self, key: str):
+        raise NotImplementedError
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        with self.writer(key) as tmp:
+            tmp.write_bytes(data)
+        return self.ref(key)
+
+    def put_file(self, key: str, src: Path) -> str:
+        with self.writer(key) as tmp:
+            shutil.copyfile(src, tmp)
+        return self.ref(key)
+
+    def exists(self, key: str) -> bool: raise NotImplementedError
+    def delete(self, key: str) -> None: raise NotImplementedError
+    def ref(self, key: str) -> str: raise NotImplementedError
+    def signed_url(self, key: str) -> str: return self.ref(key)
+    def local_path(self, key: str) -> Path | None: return None
+
+# ------------------ Local con shards ------------------
+class LocalStore(BlobStore):
+    name = "local"
+
+    def __init__(self, areas: dict[str, tuple[Path, str]], depth: int):
+        self.areas = areas
+        self.depth = max(0, depth)
+
+    def _shard(self, name: str) -> str:
+        h = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        return "/".join(h[2 * i:2 * i + 2] for i in range(self.depth))
+
+    def _locate(self, key: str) -> tuple[Path, str]:
+        area, name = _split_key(key)
+        if area not in self.areas:
+            raise StorageError(f"área desconocida: {area}")
+        root, prefix = self.areas[area]
+        rel = f"{self._shard(name)}/{name}" if self.depth else name
+        return root / rel, f"{prefix}/{rel}"
+
+    @contextmanager
+    def writer(self, key: str):
+        final, _ = self._locate(key)
+        final.parent.mkdir(parents=True, exist_ok=True)
+        tmp = final.with_name(f".{final.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            yield tmp
+            if tmp.exists():
+                os.replace(tmp, final)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return self._locate(key)[0].exists()
+
+    def delete(self, key: str) -> None:
+        self._locate(key)[0].unlink(missing_ok=True)
+
+    def ref(self, key: str) -> str:
+        return self._locate(key)[1]
+
+    def local_path(self, key: str) -> Path | None:
+        return self._locate(key)[0]
+
+# ------------------ S3 compatible (SigV4) ------------------
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+class S3Store(BlobStore):
+    name = "s3"
+
+    def __init__(self, endpoint: str, bucket: str, region: str, access_key: str, secret_key: str,
+                 path_style: bool = True, public_url: str = "", url_ttl: int = 86400, timeout: float = 30):
+        self.endpoint, self.bucket, self.region = endpoint, bucket, region
+        self.access_key, self.secret_key = access_key, secret_key
+        self.path_style, self.public_url, self.url_ttl = path_style, public_url, url_ttl
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+        self._known: OrderedDict[str, None] = OrderedDict()  # claves que sabemos que existen
+
+    # ---- direcciones ----
+    def _target(self, key: str) -> tuple[str, str, str]:
+        """(scheme, host, path canónico) del objeto."""
+        _split_key(key)
+        parts = urlsplit(self.endpoint)
+        obj = quote(key, safe="/-_.~")
+        if self.path_style:
+            return parts.scheme, parts.netloc, f"/{self.bucket}/{obj}"
+        return parts.scheme, f"{self.bucket}.{parts.netloc}", f"/{obj}"
+
+    def _signing_key(self, day: str) -> bytes:
+        k = _hmac(("AWS4" + self.secret_key).encode("utf-8"), day)
+        k = _hmac(k, self.region)
+        k = _hmac(k, "s3")
+        return _hmac(k, "aws4_request")
+
+    def _signature(self, amz_date: str, canonical_request: str) -> tuple[str, str]:
+        day = amz_date[:8]
+        scope = f"{day}/{self.region}/s3/aws4_request"
+        to_sign = "\n".join(("AWS4-HMAC-SHA256", amz_date, scope, _sha256(canonical_request.encode("utf-8"))))
+        return scope, hmac.new(self._signing_key(day), to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def presign(self, key: str, expires: int, now: float | None = None, method: str = "GET") -> str:
+        scheme, host, path = self._target(key)
+        amz_date = datetime.fromtimestamp(now if now is not None else time.time(), timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        day = amz_date[:8]
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{day}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires),
+            "X-Amz-SignedHeaders": "host",
+        }
+        query = "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(params.items()))
+        canonical = "\n".join((method, path, query, f"host:{host}\n", "host", "UNSIGNED-PAYLOAD"))
+        _, sig = self._signature(amz_date, canonical)
+        return f"{scheme}://{host}{path}?{query}&X-Amz-Signature={sig}"
+
+    def _headers(self, method: str, key: str, payload_hash: str, extra: dict | None = None) -> tuple[str, dict]:
+        scheme, host, path = self._target(key)
+        amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        headers = {"host": host, "x-amz-content-sha256": payload_hash, "x-amz-date": amz_date}
+        headers.update({k.lower(): v for k, v in (extra or {}).items()})
+        names = sorted(headers)
+        canonical = "\n".join((
+            method, path, "",
+            "".join(f"{n}:{str(headers[n]).strip()}\n" for n in names),
+            ";".join(names), payload_hash,
+        ))
+        scope, sig = self._signature(amz_date, canonical)
+        headers["authorization"] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                    f"SignedHeaders={';'.join(names)}, Signature={sig}")
+        return f"{scheme}://{host}{path}", headers
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(timeout=self.timeout)
+        return self._client
+
+    def _remember(self, key: str, present: bool):
+        with self._lock:
+            if present:
+                self._known[key] = None
+                self._known.move_to_end(key)
+                while len(self._known) > 10000:
+                    self._known.popitem(last=False)
+            else:
+                self._known.pop(key, None)
+
+    # ---- operaciones ----
+    @contextmanager
+    def writer(self, key: str):
+        import mimetypes, tempfile
+        fd, name = tempfile.mkstemp(prefix=".blob-", suffix=Path(key).suffix)
+        os.close(fd)
+        tmp = Path(name)
+        try:
+            yield tmp
+            if tmp.exists() and tmp.stat().st_size > 0:
+                data = tmp.read_bytes()
+                ctype = mimetypes.guess_type(key)[0] or "application/octet-stream"
+                url, headers = self._headers("PUT", key, _sha256(data), {"content-type": ctype})
+                r = self._http().put(url, content=data, headers=headers)
+                if r.status_code >= 300:
+                    raise StorageError(f"PUT {key}: HTTP {r.status_code} {r.text[:200]}")
+                self._remember(key, True)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        if key in self._known:
+            return True
+        url, headers = self._headers("HEAD", key, _sha256(b""))
+        r = self._http().head(url, headers=headers)
+        if r.status_code not in (200, 404):
+            raise StorageError(f"HEAD {key}: HTTP {r.status_code}")
+        self._remember(key, r.status_code == 200)
+        return r.status_code == 200
+
+    def delete(self, key: str) -> None:
+        url, headers = self._headers("DELETE", key, _sha256(b""))
+        r = self._http().delete(url, headers=headers)
+        if r.status_code >= 300 and r.status_code != 404:
+            raise StorageError(f"DELETE {key}: HTTP {r.status_code}")
+        self._remember(key, False)
+
+    def ref(self, key: str) -> str:
+        return BLOB_PREFIX + key
+
+    def signed_url(self, key: str) -> str:
+        if self.public_url:
+            return f"{self.public_url}/{quote(key, safe='/-_.~')}"
+        # fecha redondeada a media vida: la URL no cambia en cada respuesta y el navegador la cachea
+        window = max(1, self.url_ttl // 2)
+        start = int(time.time()) // window * window
+        return self.presign(key, self.url_ttl, now=start)
+
+# ------------------ Singleton ------------------
+_store: BlobStore | None = None
+_store_lock = threading.Lock()
+
+def _build() -> BlobStore:
+    if STORAGE_BACKEND == "s3":
+        if not (S3_ACCESS_KEY and S3_SECRET_KEY):
+            raise StorageError("STORAGE_BACKEND=s3 requiere S3_ACCESS_KEY y S3_SECRET_KEY")
+        return S3Store(S3_ENDPOINT, S3_BUCKET, S3_REGION, S3_ACCESS_KEY, S3_SECRET_KEY,
+                       path_style=S3_PATH_STYLE, public_url=S3_PUBLIC_URL, url_ttl=S3_URL_TTL_SEC,
+                       timeout=S3_TIMEOUT_SEC)
+    return LocalStore({
+        "gen":     (GEN_DIR, "/static/gen"),
+        "tts":     (TTS_DIR, "/static/tts"),
+        "avatars": (MEDIA_DIR / "avatars", "/media/avatars"),
+    }, STORAGE_SHARD_DEPTH)
+
+def get_store() -> BlobStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _build()
+    return _store
+
+def key_for_ref(url: str | None) -> str | None:
+    """Clave de una ref /blobs/<key> (None si la URL no es de ese tipo)."""
+    path = urlsplit(url or "").path
+    return path[len(BLOB_PREFIX):] if path.startswith(BLOB_PREFIX) else None
@@ -1,9 +1,9 @@
 # app/core/utils_imgs.py
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
-import re, os, io, math, random
+import re, os, random
 
-from app.core.settings_static import GEN_DIR, static_url_for
+from app.core import render_pool
+from app.core.storage import get_store
 
 # --- patrones ---
 _FRAC_RE = re.compile(r"(\d+)\s*/\s*(\d+)")
@@ -18,145 +18,117 @@ _NL_NUM_DEN_RE = re.compile(
     re.IGNORECASE
 )
 
-def _draw_fraction_bar_png(n: int, d: int, size=(1200, 400)) -> Image.Image:
-    # (igual a tu versión actual de barras, con borde redondeado)
-    w, h = size
-    img = Image.new("RGB", size, color=(255,255,255))
-    draw = ImageDraw.Draw(img)
-    margin, gap = 40, 8
-    cell_h = 140
-    y = h//2 - cell_h//2
-    den = max(1, d)
-    cell_w = (w - 2*margin - (den-1)*gap) / den
-
-    draw.rounded_rectangle([20, 20, w-20, h-20], radius=24, outline=(229,231,235), width=2, fill=(255,255,255))
-
-    for k in range(den):
-        x = margin + k*(cell_w+gap)
-        fill = (96,165,250) if k < n else (229,231,235)
-        draw.rectangle([x, y, x+cell_w, y+cell_h], fill=fill, outline=(31,41,55), width=2)
-
-    label = f"{max(0,min(n,den))}/{den}"
-    try:
-        font = ImageFont.truetype("arial.ttf", 48)
-    except:
-        font = None
-    tw, th = (draw.textbbox((0,0), label, font=font)[2:] if font else (len(label)*20, 40))
-    draw.text(((w-tw)/2, y+cell_h+24), label, fill=(17,24,39), font=font)
-    return img
-
-def _draw_percent_grid_png(percent: int, size=(1200, 400)) -> Image.Image:
-    """Rejilla 10×10; sombrea `percent` celdas (por filas)."""
-    percent = max(0, min(100, percent))
-    w, h = size
-    img = Image.new("RGB", size, color=(255,255,255))
-    draw = ImageDraw.Draw(img)
-
-    draw.rounded_rectangle([20, 20, w-20, h-20], radius=24, outline=(229,231,235), width=2, fill=(255,255,255))
-
-    grid_w, grid_h = w - 120, h - 180
-    left, top = 60, 140
-    cols = rows = 10
-    gap = 2
-    cw = (grid_w - (cols-1)*gap) / cols
-    ch = (grid_h - (rows-1)*gap) / rows
-
-    filled = round(percent)  # número de celdas a sombrear
-    k = 0
-    for r in range(rows):
-        for c in range(cols):
-            x = left + c*(cw+gap)
-            y = top  + r*(ch+gap)
-            fill = (96,165,250) if k < filled else (229,231,235)
-            draw.rectangle([x, y, x+cw, y+ch], fill=fill, outline=(31,41,55), width=2)
-            k += 1
-    return img
-
-def _draw_title_sub(img: Image.Image, title: str, sub: str):
-    draw = ImageDraw.Draw(img)
-    try:
-        font_t = ImageFont.truetype("arial.ttf", 35)
-        font_s = ImageFont.truetype("arial.ttf", 20)
-    except:
-        font_t = font_s = None
-    draw.text((40, 30), title, fill=(30,58,138), font=font_t)
-    draw.text((40, 90), sub,   fill=(55,65,81), font=font_s)
-    
-def ensure_fraction_png(n: int, d: int, name: str) -> str:
+# ------------- Figuras direccionadas por contenido ----------
+# El nombre depende solo de los parámetros de la figura (frac-3-5.png, pct-40.png),
+# así todos los usuarios comparten el mismo archivo (clave gen/<nombre>.png) y el
+# almacenamiento no crece con ellos.
+# Si el archivo aún no existe, el render va al pool de procesos (render_pool) sin esperar
+# y mientras tanto se devuelve la genérica: solo se entrega (y se guarda) la URL real de
+# una figura ya renderizada. Quien guardó la genérica la cambia al leer (refresh_item_figures).
+GENERIC_FIGURE = "figure-generic"
+
+def _save_once(job: tuple, name: str, wait: bool = False) -> str:
+    key = f"gen/{name}.png"
+    store = get_store()
+    if not store.exists(key):
+        if wait:
+            render_pool.render_now(job, key)
+        else:
+            render_pool.submit(job, key)
+        if not store.exists(key):
+            return generic_figure_url()
+    return store.ref(key)
+
+def generic_figure_url() -> str:
+    key = f"gen/{GENERIC_FIGURE}.png"
+    store = get_store()
+    if not store.exists(key):
+        # se precalcula al arrancar; esto es solo por si aún no existe
+        render_pool.render_to_file(("generic", (), None, None), key)
+    return store.ref(key)
+
+def is_generic_figure(url: str | None) -> bool:
+    return bool(url) and url.rsplit("/", 1)[-1] == f"{GENERIC_FIGURE}.png"
+
+def fraction_key(n: int, d: int) -> tuple[int, int]:
     d = max(1, int(d)); n = max(0, min(int(n), d))
-    out = (GEN_DIR / f"{name}.png").resolve()
-    out.parent.mkdir(parents=True, exist_ok=True)
-    if not out.exists():
-        img = _draw_fraction_bar_png(n, d)
-        img.save(out, "PNG")
-    return static_url_for(out)
-
-def ensure_percent_png(pct: float, name: str) -> str:
-    out = (GEN_DIR / f"{name}.png").resolve()
-    out.parent.mkdir(parents=True, exist_ok=True)
-    if not out.exists():
-        img = _draw_percent_grid_png(float(pct))
-        img.save(out, "PNG")
-    return static_url_for(out)
+    return n, d
+
+def percent_key(pct: float) -> int:
+    # la rejilla solo distingue celdas enteras (round), así que 12.4% y 12% son la misma figura
+    return max(0, min(100, round(float(pct))))
+
+def ensure_fraction_png(n: int, d: int, name: str | None = None, wait: bool = False) -> str:
+    n, d = fraction_key(n, d)
+    return _save_once(("frac", (n, d), None, None), name or f"frac-{n}-{d}", wait)
+
+def ensure_percent_png(pct: float, name: str | None = None, wait: bool = False) -> str:
+    p = percent_key(pct)
+    return _save_once(("pct", (p,), None, None), name or f"pct-{p}", wait)
 
 # ------------- EXPLANATION FIGURE (topic-aware) -------------
+_EXPL_TEXTS = {
+    "fracciones-basicas": (
+        "Fracciones: partes de un todo",
+        "El numerador (arriba) indica cuántas partes tomamos; el denominador (abajo), en cuántas partes iguales está dividido el total."
+    ),
+    "porcentajes": (
+        "Porcentajes: partes de cien",
+        "Un porcentaje N% significa N de cada 100. 50% = mitad; 25% = un cuarto; 10% = diez de cien."
+    ),
+}
+_EXPL_GENERIC = ("Concepto: representación visual", "Figura de apoyo generada automáticamente.")
+
+def _explanation_params(slug: str, base_text: str | None) -> tuple[str, tuple]:
+    """(tipo de figura, parámetros) de la figura de explicación para el tema."""
+    if slug == "fracciones-basicas":
+        # 1) primera a/b del texto; 2) 3/5 fijo (compartido) si no hay
+        m = _FRAC_RE.search(base_text or "")
+        if m and int(m.group(2)) > 0:
+            return "frac", fraction_key(int(m.group(1)), int(m.group(2)))
+        return "frac", (3, 5)
+    if slug == "porcentajes":
+        # % representativo para la portada
+        return "pct", (50,)
+    return "frac", (1, 2)
+
+def _ensure_explanation_png(slug: str, kind: str, params: tuple, wait: bool = False) -> str:
+    title, sub = _EXPL_TEXTS.get(slug, _EXPL_GENERIC)
+    tag = slug if slug in _EXPL_TEXTS else "generic"
+    return _save_once((kind, params, title, sub), f"expl-{tag}-{kind}-{'-'.join(str(x) for x in params)}", wait)
+
 def make_explanation_figure_png(topic_slug: str, topic_id: int, user_id: int, base_text: str | None = None) -> str:
     """
-    Genera una figura didáctica CONSISTENTE por tema y usuario (sin IA).
-    Cachea por (user_id, topic_slug). Nunca se sobreescribe si ya existe.
+    Figura didáctica por tema (sin IA), compartida entre usuarios:
+    el archivo se nombra por (tema, parámetros de la figura). topic_id/user_id se
+    mantienen por compatibilidad con los callers.
     """
-    name = f"expl-{user_id}-{topic_slug}.png"
-    out = (GEN_DIR / name).resolve()
-    if out.exists():
-        return static_url_for(out)
-
-    # --- Selección por tema (slug) ---
     slug = (topic_slug or "").strip().lower()
-    if slug == "fracciones-basicas":
-        # 1) intenta extraer primera a/b; 2) fallback 3/5
-        n = d = None
-        m = _FRAC_RE.search(base_text or "")
-        if m:
-            n, d = int(m.group(1)), int(m.group(2))
-        if not m or d == 0:
-            d = random.randint(4, 8)
-            n = random.randint(1, d-1)
-        img = _draw_fraction_bar_png(n, d)
-        _draw_title_sub(
-            img,
-            "Fracciones: partes de un todo",
-            "El numerador (arriba) indica cuántas partes tomamos; el denominador (abajo), en cuántas partes iguales está dividido el total."
-        )
-
-    elif slug == "porcentajes":
-        # elige un % representativo para la portada (p.ej., 50%)
-        img = _draw_percent_grid_png(50)
-        _draw_title_sub(
-            img,
-            "Porcentajes: partes de cien",
-            "Un porcentaje N% significa N de cada 100. 50% = mitad; 25% = un cuarto; 10% = diez de cien."
-        )
-    else:
-        # Fallback genérico: barra 1/2 con título neutro
-        img = _draw_fraction_bar_png(1, 2)
-        _draw_title_sub(
-            img,
-            "Concepto: representación visual",
-            "Figura de apoyo generada automáticamente."
-        )
-
-    out.parent.mkdir(parents=True, exist_ok=True)
-    img.save(out, "PNG")
-    return static_url_for(out)
+    kind, params = _explanation_params(slug, base_text)
+    return _ensure_explanation_png(slug, kind, params)
 
 # ------------- Visual helpers per item ----------------------
+# png: imageUrl al PNG compartido en /static/gen (clientes antiguos)
+# svg: imageUrl a /figures/<nombre>.svg; no se usa Pillow en el request
+FIGURE_FORMAT = os.getenv("FIGURE_FORMAT", "png").strip().lower()
+
+def _figure_url(spec: dict) -> str:
+    from app.core import figures
+    if FIGURE_FORMAT == "svg":
+        return f"/figures/{figures.spec_name(spec)}.svg"
+    if spec["kind"] == "fraction_bar":
+        return ensure_fraction_png(spec["n"], spec["d"])
+    return ensure_percent_png(spec["percent"])
+
 def decorate_visuals_for_items(items: list, topic_id: int, user_id: int, topic_slug: str | None = None) -> None:
     """
-    Genera imagen de apoyo por pregunta SOLO en la primera pasada.
+    Imagen de apoyo por pregunta (compartida: frac-n-d / pct-p).
     - Si hay fracción a/b -> barra n/d
     - Si hay porcentaje N% -> grilla 10x10 con N celdas
+    Cada ítem lleva además `figure` (spec declarativa) para que el cliente pueda dibujarla.
     """
-    for i, it in enumerate(items or []):
+    from app.core import figures
+    for it in (items or []):
         if (it or {}).get("type") != "multiple_choice":
             continue
         if it.get("imageUrl"):
@@ -172,11 +144,9 @@ def decorate_visuals_for_items(items: list, topic_id: int, user_id: int, topic_s
                 m = _FRAC_RE.search(str(ch[ci]) or "")
 
         if m:
-            n, d = int(m.group(1)), int(m.group(2))
-            it["imageUrl"] = ensure_fraction_png(
-                max(0, min(n, d)), max(1, d),
-                name=f"qfrac-{user_id}-{topic_id}-{i}"
-            )
+            spec = figures.fraction_spec(int(m.group(1)), int(m.group(2)))
+            it["figure"] = spec
+            it["imageUrl"] = _figure_url(spec)
             continue
 
         # 2) porcentaje en pregunta o en la correcta
@@ -187,10 +157,57 @@ def decorate_visuals_for_items(items: list, topic_id: int, user_id: int, topic_s
             if isinstance(ci, int) and 0 <= ci < len(ch):
                 mp = _PCT_RE.search(str(ch[ci]) or "")
         if mp:
-            pct = float(mp.group(1))
-            it["imageUrl"] = ensure_percent_png(
-                pct, name=f"qpct-{user_id}-{topic_id}-{i}"
-            )
+            spec = figures.percent_spec(float(mp.group(1)))
+            it["figure"] = spec
+            it["imageUrl"] = _figure_url(spec)
+
+def refresh_item_figures(items: list | None) -> list | None:
+    """
+    Cambia la genérica de los ítems por su figura (`figure`) si ya está renderizada;
+    si no, vuelve a encolar el render. Devuelve la lista nueva, o None si no cambió nada.
+    """
+    out, changed = [], False
+    for it in (items or []):
+        if isinstance(it, dict) and it.get("figure") and is_generic_figure(it.get("imageUrl")):
+            url = _figure_url(it["figure"])
+            if not is_generic_figure(url):
+                it = {**it, "imageUrl": url}
+                changed = True
+        out.append(it)
+    return out if changed else None
+
+# ------------- Precalculo al arrancar -----------------------
+def precompute_figures(content_dir: Path) -> int:
+    """
+    Renderiza de antemano todo el dominio finito de figuras de cada tema:
+    - fracciones: n/d con d en constraints.allowed_numbers [min, max] y 0 <= n <= d
+      (barra + figura de explicación)
+    - porcentajes: rejillas 0..100 (la rejilla solo tiene 100 celdas)
+    Los archivos existentes se saltan. Devuelve cuántas figuras quedaron disponibles.
+    El dibujo ocurre en el pool de procesos; este hilo solo espera.
+    """
+    import json
+    generic_figure_url()
+    done = 1
+    for f in sorted(Path(content_dir).glob("grade-*/*.json")):
+        try:
+            ctx = json.loads(f.read_text(encoding="utf-8"))
+        except Exception:
+            continue
+        slug = (ctx.get("slug") or f.stem).lower()
+        if "porcentaje" in slug:
+            for p in range(0, 101):
+                ensure_percent_png(p, wait=True); done += 1
+            _ensure_explanation_png(slug, *_explanation_params(slug, None), wait=True); done += 1
+        elif "fraccion" in slug:
+            rng = (ctx.get("constraints") or {}).get("allowed_numbers") or {}
+            lo, hi = max(1, int(rng.get("min", 1))), int(rng.get("max", 12))
+            for d in range(lo, hi + 1):
+                for n in range(0, d + 1):
+                    ensure_fraction_png(n, d, wait=True)
+                    _ensure_explanation_png(slug, "frac", (n, d), wait=True)
+                    done += 2
+    return done
 
 # ------------- pick image from JSON context -----------------
 def pick_visual_expl_image_from_ctx(ctx: dict) -> str | None:
@@ -206,7 +223,4 @@ def pick_visual_expl_image_from_ctx(ctx: dict) -> str | None:
 # ------------- save raw PNG bytes ---------------------------
 def save_png_return_url(topic_slug: str, png_bytes: bytes) -> str:
     name = f"{topic_slug}-{random.randint(10_000, 99_999)}.png"
-    out = (GEN_DIR / name).resolve()
-    out.parent.mkdir(parents=True, exist_ok=True)
-    out.write_bytes(png_bytes)
-    return static_url_for(out)
+    return get_store().put_bytes(f"gen/{name}", png_bytes)
@@ -3,7 +3,7 @@ from pathlib import Path
 import os, requests, logging, io, wave, math, struct, tempfile
 
 log = logging.getLogger("tts")
-TTS_ENDPOINT = "http://localhost:8000/ai/tts"
+TTS_ENDPOINT = os.getenv("TTS_ENDPOINT", "http://localhost:8000/ai/tts").strip()
 
 def _is_valid_wav(path: Path) -> bool:
     try:
@@ -58,11 +58,16 @@ def make_tts(text: str, out_path: Path, voice: str = ""):
     # fallback: beep para no dejar el audio mudo
     _write_emergency_beep(out_path)
 
+def tts_key(session_id: int, name: str) -> str:
+    """Clave del audio en el almacenamiento (app/core/storage.py)."""
+    return f"tts/sess-{session_id}-{name}.wav"
+
 def tts_url_for(session_id: int, name: str) -> str:
     """
     Si PUBLIC_BACKEND_ORIGIN está seteado (p.ej. http://localhost:8000),
     devolvemos URL absoluta; si no, relativa como siempre.
     """
-    rel = f"/static/tts/sess-{session_id}-{name}.wav"
+    from app.core.storage import get_store
+    rel = get_store().ref(tts_key(session_id, name))
     origin = os.getenv("PUBLIC_BACKEND_ORIGIN", "").rstrip("/")
     return f"{origin}{rel}" if origin else rel
\ No newline at end of file
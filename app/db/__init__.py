@@ -1,9 +1,14 @@
-import os
-from sqlalchemy import create_engine, MetaData
+import os, time
+from sqlalchemy import create_engine, MetaData, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from dotenv import load_dotenv
 from typing import Generator
 
+from app.core.metrics import metrics
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -15,7 +20,88 @@ NAMING_CONVENTION = {
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
     "pk": "pk_%(table_name)s",
 }
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
+# === Pool de conexiones (por proceso: el total es GUNICORN_WORKERS × (size + overflow)) ===
+# DB_POOL_MODE:
+#   queue    → pool propio (QueuePool) con los límites de abajo.
+#   external → hay un pooler de transacciones delante (PgBouncer/pgcat en modo transaction):
+#              sin pool propio (NullPool) y sin prepared statements del lado del servidor,
+#              que no sobreviven a que cada transacción caiga en otra conexión.
+# DB_POOL_PRE_PING: 1 = ping antes de cada checkout (pesimista, un round trip extra);
+#   0 = optimista: se confía en DB_POOL_RECYCLE y en que SQLAlchemy invalida el pool al
+#   detectar una desconexión (falla a lo sumo la request que la encuentra).
+DB_POOL_MODE         = os.getenv("DB_POOL_MODE", "queue").strip().lower()
+DB_POOL_SIZE         = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT      = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE      = int(os.getenv("DB_POOL_RECYCLE", "1800"))   # -1 = nunca
+DB_POOL_PRE_PING     = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_POOL_LIFO         = os.getenv("DB_POOL_LIFO", "1") == "1"        # reusa las calientes; las ociosas expiran
+
+metrics.describe("db_pool_checkout_seconds", "Espera para obtener una conexión del pool",
+                 buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30))
+metrics.describe("db_pool_timeouts_total", "Checkouts que agotaron DB_POOL_TIMEOUT")
+metrics.describe("db_connections_total", "Conexiones nuevas abiertas contra la base")
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout (cola llena = espera larga)."""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            metrics.inc("db_pool_timeouts_total")
+            raise
+        finally:
+            metrics.observe("db_pool_checkout_seconds", time.perf_counter() - t0)
+
+def _engine_kwargs(url: str) -> dict:
+    kwargs: dict = {}
+    if DB_POOL_MODE == "external":
+        kwargs["poolclass"] = NullPool
+        if make_url(url).get_driver_name() == "psycopg":
+            # psycopg 3 prepara sentencias repetidas; psycopg2 nunca usa prepared statements
+            kwargs["connect_args"] = {"prepare_threshold": None}
+        return kwargs
+    kwargs.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_use_lifo=DB_POOL_LIFO,
+    )
+    return kwargs
+
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
+
+# conteo/tiempo de queries por request (ver app/db/query_stats.py)
+from app.db import query_stats  # noqa: E402
+query_stats.install(engine)
+
+@event.listens_for(engine, "connect")
+def _count_connect(dbapi_conn, conn_record):
+    metrics.inc("db_connections_total")
+
+def pool_stats() -> dict:
+    """Estado del pool de este proceso (para /metrics)."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"mode": DB_POOL_MODE, "class": type(pool).__name__}
+    capacity = pool.size() + max(0, DB_POOL_MAX_OVERFLOW)
+    checked_out = pool.checkedout()
+    return {
+        "mode": DB_POOL_MODE,
+        "size": pool.size(),
+        "maxOverflow": DB_POOL_MAX_OVERFLOW,
+        "checkedOut": checked_out,
+        "checkedIn": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "utilization": round(checked_out / capacity, 3) if capacity else None,
+    }
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base(metadata=MetaData(naming_convention=NAMING_CONVENTION))
 
@@ -27,4 +113,4 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
-__all__ = ["Base", "engine", "SessionLocal", "get_db"]
\ No newline at end of file
+__all__ = ["Base", "engine", "SessionLocal", "get_db", "pool_stats"]
\ No newline at end of file
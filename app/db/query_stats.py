@@ -0,0 +1,139 @@
+# app/db/query_stats.py
+"""
+Conteo y tiempo de las sentencias SQL de cada request.
+- Hooks de SQLAlchemy (before/after_cursor_execute) suman en el contador del request
+  actual, que vive en un ContextVar; los endpoints sync corren en el threadpool con una
+  copia del contexto, así que ven el mismo contador. Lo que corre fuera de un request
+  (jobs, scanners) no se cuenta.
+- QueryStatsMiddleware (ASGI puro, no bufferiza el cuerpo ni rompe SSE) abre el contador,
+  agrega `Server-Timing: db;dur=12.3;desc="7 queries"` y al terminar registra el total.
+  Pasado el presupuesto de la ruta (SQL_QUERY_BUDGET / SQL_QUERY_BUDGETS) emite un warning:
+  así un N+1 aparece en los logs antes que en la factura de la base.
+- assert_max_queries(n): para tests y scripts,
+      with assert_max_queries(12):
+          client.post(f"/topics/session/{sid}/finish", headers=H)
+"""
+import os, time, logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import metrics
+
+log = logging.getLogger("sql")
+
+SQL_STATS_ENABLED = os.getenv("SQL_STATS", "1") == "1"
+SQL_QUERY_BUDGET  = int(os.getenv("SQL_QUERY_BUDGET", "30"))
+SQL_LOG_REQUESTS  = os.getenv("SQL_LOG_REQUESTS", "0") == "1"   # 1 = una línea por request (debug)
+
+def _parse_budgets(raw: str) -> dict[str, int]:
+    """Ej.: POST /topics/session/{session_id}/finish=40, GET /badges=5 → {ruta: presupuesto}"""
+    out = {}
+    for part in raw.split(","):
+        route, _, n = part.rpartition("=")
+        if route.strip() and n.strip().isdigit():
+            out[route.strip()] = int(n)
+    return out
+
+SQL_QUERY_BUDGETS = _parse_budgets(os.getenv("SQL_QUERY_BUDGETS", ""))
+
+metrics.describe("http_db_queries", "Sentencias SQL por request, por ruta",
+                 buckets=(1, 2, 5, 10, 20, 30, 50, 100, 200))
+metrics.describe("http_db_seconds", "Tiempo en SQL por request, por ruta",
+                 buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5))
+metrics.describe("http_db_budget_exceeded_total", "Requests que superaron su presupuesto de queries")
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+_current: ContextVar[QueryStats | None] = ContextVar("sql_query_stats", default=None)
+# contadores extra (assert_max_queries), sin importar el contexto
+_watchers: list[QueryStats] = []
+
+# ------------------ Hooks ------------------
+# el inicio va en el contexto de ejecución (uno por sentencia): si la sentencia falla y
+# after_cursor_execute no llega, se descarta con el contexto y no queda nada colgado
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_t0 = time.perf_counter()
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    t0 = getattr(context, "_query_t0", None)
+    elapsed = time.perf_counter() - t0 if t0 is not None else 0.0
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    for w in _watchers:
+        w.count += 1
+        w.seconds += elapsed
+
+def install(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _before):
+        event.listen(engine, "before_cursor_execute", _before)
+        event.listen(engine, "after_cursor_execute", _after)
+
+def current() -> QueryStats | None:
+    return _current.get()
+
+# ------------------ Middleware ------------------
+def _route_name(scope: Scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return f"{scope['method']} {path}" if path else f"{scope['method']} (sin ruta)"
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not SQL_STATS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and stats.count:
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if stats.count:
+                self._report(scope, stats)
+
+    def _report(self, scope: Scope, stats: QueryStats):
+        route = _route_name(scope)
+        metrics.observe("http_db_queries", stats.count, route=route)
+        metrics.observe("http_db_seconds", stats.seconds, route=route)
+        budget = SQL_QUERY_BUDGETS.get(route, SQL_QUERY_BUDGET)
+        if budget and stats.count > budget:
+            metrics.inc("http_db_budget_exceeded_total", route=route)
+            log.warning("%s: %d queries (budget %d), %.1f ms in SQL", route, stats.count, budget, stats.seconds * 1000)
+        elif SQL_LOG_REQUESTS:
+            log.info("%s: %d queries, %.1f ms in SQL", route, stats.count, stats.seconds * 1000)
+
+# ------------------ Tests ------------------
+@contextmanager
+def assert_max_queries(n: int):
+    """Falla (AssertionError) si el bloque ejecuta más de `n` sentencias SQL, en cualquier hilo."""
+    stats = QueryStats()
+    _watchers.append(stats)
+    try:
+        yield stats
+    finally:
+        _watchers.remove(stats)
+    if stats.count > n:
+        raise AssertionError(f"se esperaban como máximo {n} queries y se ejecutaron {stats.count}")
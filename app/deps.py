@@ -1,12 +1,13 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from jose import JWTError
 from app.db import SessionLocal
 from app.models.user import User
-from app.security import decode_access_token
+from app.security import decode_access_token, decode_stream_token, STREAM_TOKEN_RECONNECT_GRACE_SECONDS
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 def get_db():
     db = SessionLocal()
@@ -32,3 +33,37 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if user is None:
         raise cred_exc
     return user
+
+
+def get_current_user_id_for_stream(
+    expl_id: str,
+    token: str | None = Depends(oauth2_scheme_optional),
+    stream_token: str | None = None,
+    last_event_id: str | None = Header(default=None),
+) -> int:
+    """
+    Auth para respuestas largas (SSE) de una explicación.
+    - Cabecera Authorization: el token de acceso de siempre.
+    - ?stream_token=: EventSource no permite cabeceras, así que acepta un token corto
+      y limitado a esta explicación (POST /assistant/explanations/{id}/stream-token).
+      El token de acceso completo nunca va en la URL.
+      La reconexión automática del navegador (trae Last-Event-ID) acepta el token ya vencido
+      por STREAM_TOKEN_RECONNECT_GRACE_SECONDS. Pasado eso responde 401: el cliente, en
+      `error`, pide otro token y abre un EventSource nuevo.
+    Usa su propia sesión y la cierra enseguida para no retener una conexión del pool
+    durante todo el stream.
+    """
+    if not token and stream_token:
+        try:
+            grace = STREAM_TOKEN_RECONNECT_GRACE_SECONDS if last_event_id is not None else 0
+            return decode_stream_token(stream_token, expl_id, grace)
+        except JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token de stream inválido o vencido",
+            )
+    db = SessionLocal()
+    try:
+        return get_current_user(token or "", db).id
+    finally:
+        db.close()
@@ -1,11 +1,11 @@
-import os
+import os, threading
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from fastapi.staticfiles import StaticFiles
 
 from app.db import Base, engine
+from app.db.query_stats import QueryStatsMiddleware
 
 from app.routers import auth as auth_router
 from app.routers import user as user_router
@@ -18,9 +18,14 @@ from app.routers import me as me_router
 from app.routers import topics as topics_router
 from app.routers import tts
 from app.routers import assistant as assistant_router
+from app.routers import metrics as metrics_router
+from app.routers import figures as figures_router
+from app.routers import blobs as blobs_router
+from app.routers import sprites as sprites_router
 
 # <-- /static (dentro de app) ya configurado en settings_static
 from app.core.settings_static import STATIC_DIR, MEDIA_DIR  # app/static
+from app.core.static_files import VariantStaticFiles
 
 load_dotenv()
 if os.getenv("DEV_AUTO_CREATE", "0") == "1":
@@ -43,8 +48,8 @@ PUBLIC_MEDIA_DIR = (REPO_ROOT / "static").resolve()
 (PUBLIC_MEDIA_DIR / "badges").mkdir(parents=True, exist_ok=True)
 
 # Montajes
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")  # app/static → TTS, generados
-app.mount("/media", StaticFiles(directory=str(MEDIA_DIR)), name="media") # static/ (raíz) → covers, avatars, badges
+app.mount("/static", VariantStaticFiles(directory=str(STATIC_DIR), accel_prefix=os.getenv("STATIC_ACCEL_PREFIX", "/_accel/static/")), name="static")  # app/static → TTS, generados
+app.mount("/media", VariantStaticFiles(directory=str(MEDIA_DIR), accel_prefix=os.getenv("MEDIA_ACCEL_PREFIX", "/_accel/media/")), name="media") # static/ (raíz) → covers, avatars, badges
 
 # ==== CORS ====
 origins = os.getenv("CORS_ORIGINS", "")
@@ -58,6 +63,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==== Queries por request (Server-Timing, presupuesto por ruta) ====
+app.add_middleware(QueryStatsMiddleware)
+
 if os.getenv("DEV_AUTO_CREATE", "0") == "1":
     Base.metadata.create_all(bind=engine)
 
@@ -73,6 +81,37 @@ app.include_router(points_router.router)
 app.include_router(topics_router.router)
 app.include_router(tts.router)
 app.include_router(assistant_router.router)
+app.include_router(metrics_router.router)
+app.include_router(figures_router.router)
+app.include_router(blobs_router.router)
+app.include_router(sprites_router.router)
+
+# ==== Trabajos en background ====
+@app.on_event("startup")
+def _resume_background_jobs():
+    # retoma explicaciones del asistente que quedaron 'in_progress' tras un reinicio
+    if os.getenv("ASSISTANT_RESUME_ON_STARTUP", "1") == "1":
+        assistant_router.start_stale_scanner()
+
+@app.on_event("startup")
+def _precompute_figures():
+    # figuras de fracciones/porcentajes compartidas: se generan una vez, fuera del request
+    if os.getenv("FIGURES_PRECOMPUTE", "1") == "1":
+        from app.core.utils_imgs import precompute_figures
+        from app.core.settings_static import CONTENT_DIR
+        threading.Thread(target=precompute_figures, args=(CONTENT_DIR,), name="figures-precompute", daemon=True).start()
+
+@app.on_event("startup")
+def _start_storage_gc():
+    # borra TTS/figuras generadas que ya nadie referencia (ver app/services/storage_gc.py)
+    from app.services import storage_gc
+    if storage_gc.STORAGE_GC_ENABLED:
+        storage_gc.start_gc_loop()
+
+@app.on_event("shutdown")
+def _stop_render_pool():
+    from app.core import render_pool
+    render_pool.shutdown()
 
 @app.get("/health")
 def health():
@@ -0,0 +1,29 @@
+from __future__ import annotations
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db import Base
+
+class AssistantArtifact(Base):
+    """
+    Explicación del asistente compartida entre usuarios.
+    El prompt solo depende del contexto del tema y del estilo, así que el texto
+    y sus assets (imágenes/audios) se generan una vez por clave y variante.
+    """
+    __tablename__ = "assistant_artifacts"
+
+    id             = Column(String(64), primary_key=True)
+    topic_id       = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    style          = Column(String(16), nullable=False)   # "visual" | "auditivo"
+    content_hash   = Column(String(64), nullable=False)   # hash del JSON de contexto
+    prompt_version = Column(String(16), nullable=False)
+    variant        = Column(Integer, nullable=False, default=0)
+    status         = Column(String(16), nullable=False)   # "in_progress" | "completed" | "interrupted"
+    notes          = Column(Text, nullable=True)
+    payload        = Column(JSON, nullable=True)          # { topicTitle, text, paragraphs:[{id,text,imageUrl?,audioUrl?}] }
+    created_at     = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at     = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("topic_id", "style", "content_hash", "prompt_version", "variant",
+                         name="uq_assistant_artifacts_key"),
+    )
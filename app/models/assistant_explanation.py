@@ -15,6 +15,7 @@ class AssistantExplanation(Base):
     status      = Column(String(16), nullable=False)   # "in_progress" | "completed" | "interrupted" | "failed"
     notes       = Column(Text, nullable=True)
     payload     = Column(JSON, nullable=True)          # { paragraphs:[{id,text,imageUrl?,audioUrl?}], topicTitle }
+    artifact_id = Column(String(64), ForeignKey("assistant_artifacts.id"), nullable=True)  # explicación compartida
     created_at  = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at  = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
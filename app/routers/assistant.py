@@ -1,52 +1,181 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_, func
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy import select, and_, func, update
+from sqlalchemy.exc import IntegrityError
 from uuid import uuid4
-import threading, json, os, logging
-from pathlib import Path
+from datetime import datetime, timedelta, timezone
+import asyncio, threading, time, json, os, logging, random, hashlib
 from typing import Literal
+from concurrent.futures import ThreadPoolExecutor
 
-from app.db import get_db
-from app.deps import get_current_user
+from app.db import get_db, SessionLocal
+from app.deps import get_current_user, get_current_user_id_for_stream
+from app.security import create_stream_token, STREAM_TOKEN_EXPIRE_SECONDS
 from app.models.user import User
 from app.models.topic import Topic
 from app.models.assistant_explanation import AssistantExplanation
+from app.models.assistant_artifact import AssistantArtifact
 
 # Helpers existentes
 from app.core.content import resolve_context_path
-from app.ai.gemini import generate_explanation, generate_one_image_png, generate_assistant_explanation, build_visual_image_prompt
-from app.core.settings_static import STATIC_DIR
+from app.ai.gemini import (
+    generate_explanation, generate_one_image_png, generate_assistant_explanation,
+    build_visual_image_prompt, ASSISTANT_PROMPT_VERSION,
+)
+from app.core.storage import get_store
+from app.core.assets import versioned_url
+from app.core.metrics import metrics
+from app.ai.prompts import project_ctx
 from app.core.utils_tts import make_tts, tts_url_for
+from app.services.jobs import JobPool, JobRejected
+from app.services.events import EventBroker
 
 log = logging.getLogger("assistant")
 router = APIRouter(prefix="/assistant", tags=["assistant"])
 
 VakStyle = Literal["visual","auditivo"]
 
+# ---------- Pool de trabajos ----------
+# Tamaño fijo: una ráfaga de peticiones no puede abrir cientos de hilos contra Gemini.
+_jobs = JobPool(
+    "assistant",
+    max_workers=int(os.getenv("ASSISTANT_JOB_WORKERS", "4")),
+    max_queue=int(os.getenv("ASSISTANT_JOB_QUEUE", "32")),
+    per_user=int(os.getenv("ASSISTANT_JOB_PER_USER", "2")),
+)
+# Un registro 'in_progress' sin actualizarse en este tiempo se considera huérfano
+# (worker reiniciado/caído) y se retoma desde el último párrafo guardado.
+# Cada proceso renueva updated_at de lo que tiene en cola o en curso (heartbeat) con un
+# período menor, así un job encolado o lento nunca parece huérfano a otro worker.
+ASSISTANT_STALE_SEC = int(os.getenv("ASSISTANT_STALE_SEC", "600"))
+ASSISTANT_STALE_SCAN_SEC = int(os.getenv("ASSISTANT_STALE_SCAN_SEC", "120"))
+ASSISTANT_HEARTBEAT_SEC = max(1.0, min(ASSISTANT_STALE_SCAN_SEC, ASSISTANT_STALE_SEC / 3))
+# artefactos que generan los jobs de este proceso (también reciben heartbeat)
+_owned_artifacts: set[str] = set()
+
+# Progreso en vivo (SSE): el worker publica cada párrafo listo en este broker
+_events = EventBroker()
+# sin eventos locales en este tiempo, el stream revisa la DB (job en otro worker de gunicorn)
+ASSISTANT_SSE_POLL_SEC = float(os.getenv("ASSISTANT_SSE_POLL_SEC", "3"))
+_TERMINAL_STATUS = ("completed", "interrupted", "failed")
+
+_REJECT_MSG = {
+    "queue_full": "El asistente está ocupado, intenta de nuevo en unos minutos.",
+    "user_limit": "Ya tienes explicaciones generándose, espera a que terminen.",
+}
+
+def _enqueue(db: Session, rec: AssistantExplanation, on_reject_status: str | None = "interrupted",
+             avoid_artifact: str | None = None):
+    """
+    Encola la generación; si el pool la rechaza, responde 429 y deja el registro reanudable
+    con `on_reject_status`, o lo borra si es None (registro recién creado que nunca arrancó:
+    cada reintento con el pool lleno dejaría otro huérfano).
+    """
+    try:
+        _jobs.submit(rec.id, rec.user_id, _worker_generate, rec.id, avoid_artifact)
+    except JobRejected as e:
+        msg = _REJECT_MSG.get(e.reason, "Asistente ocupado.")
+        if on_reject_status is None:
+            db.delete(rec)
+        else:
+            rec.status = on_reject_status
+            rec.notes = msg
+            db.add(rec)
+        db.commit()
+        raise HTTPException(429, msg)
+
+def _heartbeat(db: Session, expl_ids: list[str], artifact_ids: list[str] = ()):
+    """Renueva updated_at de explicaciones/artefactos en curso que este proceso tiene vivos."""
+    if artifact_ids:
+        db.execute(
+            update(AssistantArtifact)
+            .where(AssistantArtifact.id.in_(artifact_ids), AssistantArtifact.status == "in_progress")
+            .values(updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+    if expl_ids or artifact_ids:
+        db.execute(
+            update(AssistantExplanation)
+            .where(
+                AssistantExplanation.id.in_(expl_ids) | AssistantExplanation.artifact_id.in_(artifact_ids),
+                AssistantExplanation.status == "in_progress",
+            )
+            .values(updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+def resume_stale_explanations() -> int:
+    """
+    Renueva el heartbeat de los jobs locales y luego busca explicaciones
+    'in_progress' huérfanas para volver a encolarlas.
+    El claim es un UPDATE condicionado a updated_at, así con varios workers
+    de gunicorn solo uno retoma cada registro.
+    """
+    from app.db import SessionLocal  # evita ciclos
+    db: Session = SessionLocal()
+    resumed = 0
+    try:
+        _heartbeat(db, _jobs.active_keys(), list(_owned_artifacts))
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=ASSISTANT_STALE_SEC)
+        rows = db.execute(
+            select(AssistantExplanation.id, AssistantExplanation.user_id, AssistantExplanation.updated_at)
+            .where(AssistantExplanation.status == "in_progress", AssistantExplanation.updated_at < cutoff)
+            .order_by(AssistantExplanation.updated_at)
+            .limit(_jobs.max_queue or 1)
+        ).all()
+        for expl_id, user_id, seen_at in rows:
+            if _jobs.is_active(expl_id):
+                continue
+            claimed = db.execute(
+                update(AssistantExplanation)
+                .where(AssistantExplanation.id == expl_id, AssistantExplanation.updated_at == seen_at)
+                .values(updated_at=func.now())
+            ).rowcount
+            db.commit()
+            if not claimed:
+                continue
+            try:
+                if _jobs.submit(expl_id, user_id, _worker_generate, expl_id):
+                    resumed += 1
+            except JobRejected:
+                # cola llena: el próximo escaneo lo intentará otra vez
+                break
+        if resumed:
+            log.info("assistant: resumed %s stale explanations", resumed)
+    except Exception as e:
+        log.warning("assistant stale scan failed: %s", e)
+    finally:
+        db.close()
+    return resumed
+
+def start_stale_scanner():
+    """Escaneo al arrancar y luego periódico (hilo daemon único por proceso)."""
+    def _loop():
+        while True:
+            resume_stale_explanations()
+            time.sleep(ASSISTANT_HEARTBEAT_SEC)
+    threading.Thread(target=_loop, name="assistant-stale-scan", daemon=True).start()
+
 # ---------- Utiles de archivo ----------
-TTS_SUBDIR = STATIC_DIR / "tts"
-IMG_SUBDIR = STATIC_DIR / "gen"
+# claves en el almacenamiento (app/core/storage.py): tts/assist-<expl>-<pid>.wav, gen/assist-<expl>-<pid>.png
+def _wav_key_for(expl_id: str, pid: str) -> str:
+    return f"tts/assist-{expl_id}-{pid}.wav"
 
 def _wav_url_for(expl_id: str, pid: str) -> str:
-    # /static/tts/assist-<expl>-<pid>.wav
-    name = f"assist-{expl_id}-{pid}.wav"
-    rel = f"/static/tts/{name}"
+    rel = get_store().ref(_wav_key_for(expl_id, pid))
     origin = os.getenv("PUBLIC_BACKEND_ORIGIN", "").rstrip("/")
     return f"{origin}{rel}" if origin else rel
 
-def _wav_path_for(expl_id: str, pid: str) -> Path:
-    TTS_SUBDIR.mkdir(parents=True, exist_ok=True)
-    return TTS_SUBDIR / f"assist-{expl_id}-{pid}.wav"
+def _png_key_for(expl_id: str, pid: str) -> str:
+    return f"gen/assist-{expl_id}-{pid}.png"
 
 def _png_url_for(expl_id: str, pid: str) -> str:
-    # /static/gen/assist-<expl>-<pid>.png
-    name = f"assist-{expl_id}-{pid}.png"
-    return f"/static/gen/{name}"
-
-def _png_path_for(expl_id: str, pid: str) -> Path:
-    IMG_SUBDIR.mkdir(parents=True, exist_ok=True)
-    return IMG_SUBDIR / f"assist-{expl_id}-{pid}.png"
+    return get_store().ref(_png_key_for(expl_id, pid))
 
 def _split_paragraphs(text: str) -> list[str]:
     raw = (text or "").replace("\r\n", "\n")
@@ -87,6 +216,7 @@ def _abs_url(u: str | None) -> str | None:
         return None
     if u.startswith("http://") or u.startswith("https://"):
         return u
+    u = versioned_url(u)
     origin = os.getenv("PUBLIC_BACKEND_ORIGIN", "").rstrip("/")
     return f"{origin}{u}" if (origin and u.startswith("/")) else u
 
@@ -187,10 +317,18 @@ def start_explanation(body: dict, db: Session = Depends(get_db), me: User = Depe
     )
     db.add(rec); db.commit()
 
-    # dispara generación en background
-    threading.Thread(target=_worker_generate, args=(expl_id,), daemon=True).start()
+    # encola generación en background (rechazada: el registro no queda)
+    _enqueue(db, rec, on_reject_status=None)
 
-    return {"explanationId": expl_id}
+    return {"explanationId": expl_id, "streamToken": create_stream_token(me.id, expl_id)}
+
+@router.post("/explanations/{expl_id}/stream-token")
+def stream_token(expl_id: str, db: Session = Depends(get_db), me: User = Depends(get_current_user)):
+    """Token corto para abrir /events con EventSource (?stream_token=), solo para esta explicación."""
+    rec = db.get(AssistantExplanation, expl_id)
+    if not rec or rec.user_id != me.id:
+        raise HTTPException(404)
+    return {"streamToken": create_stream_token(me.id, expl_id), "expiresIn": STREAM_TOKEN_EXPIRE_SECONDS}
 
 @router.get("/explanations/{expl_id}")
 def get_explanation(expl_id: str, db: Session = Depends(get_db), me: User = Depends(get_current_user)):
@@ -223,6 +361,125 @@ def get_explanation(expl_id: str, db: Session = Depends(get_db), me: User = Depe
         "audioUrls": audio_urls,
     }
 
+def _para_out(p: dict) -> dict:
+    out = dict(p)
+    if "imageUrl" in out:
+        out["imageUrl"] = _abs_url(out.get("imageUrl"))
+    if "audioUrl" in out:
+        out["audioUrl"] = _abs_url(out.get("audioUrl"))
+    return out
+
+def _sse(event: str, data: dict, event_id: int | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _load_snapshot(expl_id: str, user_id: int) -> dict | None:
+    db: Session = SessionLocal()
+    try:
+        rec = db.get(AssistantExplanation, expl_id)
+        if not rec or rec.user_id != user_id:
+            return None
+        payload = rec.payload or {}
+        return {
+            "id": rec.id,
+            "topicId": rec.topic_id,
+            "topicTitle": payload.get("topicTitle"),
+            "grade": rec.grade,
+            "style": rec.style,
+            "status": rec.status,
+            "notes": rec.notes,
+            "paragraphs": [_para_out(p) for p in (payload.get("paragraphs") or [])],
+        }
+    finally:
+        db.close()
+
+@router.get("/explanations/{expl_id}/events")
+async def explanation_events(
+    expl_id: str,
+    request: Request,
+    user_id: int = Depends(get_current_user_id_for_stream),
+):
+    """
+    Server-Sent Events con el progreso de la explicación:
+      event: meta       → datos generales + status  (id SSE = último índice ya recibido)
+      event: paragraph  → {index, id, text, imageUrl?, audioUrl?}  (id SSE = índice)
+      event: status     → {status, notes}  (terminal: cierra el stream)
+    Reanuda desde Last-Event-ID si el navegador reconecta.
+    """
+    snap = await run_in_threadpool(_load_snapshot, expl_id, user_id)
+    if snap is None:
+        raise HTTPException(404)
+    try:
+        start = int(request.headers.get("last-event-id", "")) + 1
+    except ValueError:
+        start = 0
+
+    async def _stream():
+        q, history = _events.subscribe(expl_id)
+        try:
+            paras: list[dict] = list(snap["paragraphs"])
+            state = {"status": snap["status"], "notes": snap["notes"]}
+            sent = max(0, start)
+
+            def _apply(ev: dict) -> bool:
+                """Aplica un evento del broker; False si hay un hueco (recargar de DB)."""
+                if ev.get("type") == "paragraph":
+                    idx = int(ev.get("index", -1))
+                    if idx == len(paras):
+                        paras.append(_para_out(ev["paragraph"]))
+                    elif idx > len(paras):
+                        return False
+                elif ev.get("type") == "status":
+                    state["status"] = ev.get("status")
+                    state["notes"] = ev.get("notes")
+                return True
+
+            def _apply_snapshot(s2: dict):
+                paras.extend(s2["paragraphs"][len(paras):])
+                state["status"], state["notes"] = s2["status"], s2["notes"]
+
+            for ev in history:
+                _apply(ev)
+
+            meta = {k: snap[k] for k in ("id", "topicId", "topicTitle", "grade", "style")}
+            # con id desde el primer evento, toda reconexión trae Last-Event-ID (auth del token de stream)
+            yield _sse("meta", {**meta, "status": state["status"]}, event_id=sent - 1)
+
+            while True:
+                while sent < len(paras):
+                    yield _sse("paragraph", {"index": sent, **paras[sent]}, event_id=sent)
+                    sent += 1
+                if state["status"] in _TERMINAL_STATUS:
+                    yield _sse("status", dict(state))
+                    return
+
+                try:
+                    ev = await asyncio.wait_for(q.get(), timeout=ASSISTANT_SSE_POLL_SEC)
+                except asyncio.TimeoutError:
+                    ev = None
+
+                if ev is not None and _apply(ev):
+                    continue
+                if ev is None and _jobs.is_active(expl_id):
+                    # el job corre en este proceso: basta con mantener viva la conexión
+                    yield ": ping\n\n"
+                    continue
+                # fallback DB: job en otro worker, hueco en los eventos o registro huérfano
+                s2 = await run_in_threadpool(_load_snapshot, expl_id, user_id)
+                if s2 is None:
+                    return
+                _apply_snapshot(s2)
+                if ev is None:
+                    yield ": ping\n\n"
+        finally:
+            _events.unsubscribe(expl_id, q)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/explanations/{expl_id}/resume")
 def resume_explanation(expl_id: str, db: Session = Depends(get_db), me: User = Depends(get_current_user)):
     rec = db.get(AssistantExplanation, expl_id)
@@ -230,10 +487,11 @@ def resume_explanation(expl_id: str, db: Session = Depends(get_db), me: User = D
         raise HTTPException(404)
     if rec.status not in ("interrupted","failed"):
         return {"ok": True}
+    prev_status = rec.status
     rec.status = "in_progress"
     rec.notes = None
     db.add(rec); db.commit()
-    threading.Thread(target=_worker_generate, args=(expl_id,), daemon=True).start()
+    _enqueue(db, rec, on_reject_status=prev_status)
     return {"ok": True}
 
 @router.post("/explanations/{expl_id}/regenerate")
@@ -241,126 +499,342 @@ def regenerate_explanation(expl_id: str, db: Session = Depends(get_db), me: User
     rec = db.get(AssistantExplanation, expl_id)
     if not rec or rec.user_id != me.id:
         raise HTTPException(404)
+    if _jobs.is_active(expl_id):
+        raise HTTPException(409, "La explicación todavía se está generando.")
 
+    # se suelta del artefacto actual y pide otra variante (o una nueva si faltan para llegar a K)
+    prev_artifact = rec.artifact_id
+    rec.artifact_id = None
     rec.status = "in_progress"
     rec.payload = {"topicTitle": (rec.payload or {}).get("topicTitle"), "paragraphs": []}
     db.add(rec)
     db.commit()
 
-    threading.Thread(target=_worker_generate, args=(expl_id,), daemon=True).start()
+    _enqueue(db, rec, avoid_artifact=prev_artifact)
 
     return {"ok": True}
 
+# ---------- Assets por párrafo ----------
+# cuántos párrafos generan imagen/audio a la vez dentro de UNA explicación
+ASSISTANT_ASSET_FANOUT = int(os.getenv("ASSISTANT_ASSET_FANOUT", "4"))
+# intervalo mínimo entre commits del payload mientras se generan párrafos
+ASSISTANT_COMMIT_EVERY_SEC = float(os.getenv("ASSISTANT_COMMIT_EVERY_SEC", "3"))
+
+def _build_paragraph(asset_key: str, style: str, i: int, ptxt: str) -> dict:
+    """Genera el asset (imagen o audio) de un párrafo. Nunca lanza: sin asset, solo texto."""
+    pid = f"p{i+1}"
+    row = {"id": pid, "text": ptxt}
+
+    #if style == "visual":
+    #    try:
+    #        # Prompt que evita texto largo, permite título corto y números/símbolos
+    #        img_prompt = build_visual_image_prompt(ctx, ptxt, allow_short_title=True)
+    #        png = generate_one_image_png(img_prompt)
+    #        if png:
+    #            out = _png_path_for(asset_key, pid)
+    #            out.write_bytes(png)
+    #            row["imageUrl"] = _png_url_for(asset_key, pid)
+    #    except Exception as e:
+    #        log.warning("visual img gen fail: %s", e)
+
+    if style == "visual":
+        try:
+            png = generate_one_image_png(_simple_visual_prompt(ptxt[:220]), site="assistant_paragraph")
+            if png:
+                row["imageUrl"] = get_store().put_bytes(_png_key_for(asset_key, pid), png)
+        except Exception as e:
+            log.warning("visual img gen fail (p%s): %s", pid, e)
+
+    else:  # auditivo
+        try:
+            wav_key = _wav_key_for(asset_key, pid)
+            with get_store().writer(wav_key) as wav_path:
+                make_tts(ptxt, wav_path, voice=os.getenv("TTS_VOICE","es-ES-Neural2-A"))
+            row["audioUrl"] = _wav_url_for(asset_key, pid)
+        except Exception as e:
+            log.warning("tts per-paragraph fail (p%s): %s", pid, e)
+
+    return row
+
+# ---------- Artefactos compartidos ----------
+# El prompt solo depende del contexto del tema y del estilo: la explicación y sus
+# assets se generan una vez por (tema, estilo, hash de contenido, versión de prompt)
+# y se reutilizan entre usuarios. Con K>1 se rota entre K variantes; nunca se crean más
+# de K (con K=1, "regenerar" devuelve la misma explicación compartida, o la retoma si quedó
+# interrumpida).
+ASSISTANT_SHARED_VARIANTS = max(1, int(os.getenv("ASSISTANT_SHARED_VARIANTS", "1")))
+
+def _load_ctx(topic: Topic) -> dict:
+    # Carga contexto (si existe JSON contextual de tu tema)
+    ctx_path = resolve_context_path(topic.grade, topic.slug)
+    if ctx_path.exists():
+        try:
+            return json.loads(ctx_path.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+    return {}
+
+def _content_hash(ctx: dict) -> str:
+    # solo los campos que entran al prompt: tocar exercise_bank no invalida la explicación
+    raw = json.dumps(project_ctx(ctx, "assistant"), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+def _as_utc(dt: datetime | None) -> datetime | None:
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+def _rec_payload(art: AssistantArtifact, topic_title: str | None = None) -> dict:
+    p = art.payload or {}
+    return {"topicTitle": p.get("topicTitle") or topic_title, "paragraphs": list(p.get("paragraphs") or [])}
+
+def _attached_ids(db: Session, artifact_id: str) -> list[str]:
+    return [eid for (eid,) in db.execute(
+        select(AssistantExplanation.id).where(
+            AssistantExplanation.artifact_id == artifact_id,
+            AssistantExplanation.status == "in_progress",
+        )
+    ).all()]
+
+def _claim_artifact(db: Session, art: AssistantArtifact) -> bool:
+    """
+    Toma la generación de un artefacto interrumpido o huérfano (sin avances en
+    ASSISTANT_STALE_SEC). UPDATE condicionado: solo un job gana el claim.
+    """
+    if art.status == "completed":
+        return False
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=ASSISTANT_STALE_SEC)
+    if art.status == "in_progress" and _as_utc(art.updated_at) and _as_utc(art.updated_at) >= cutoff:
+        return False
+    claimed = db.execute(
+        update(AssistantArtifact)
+        .where(AssistantArtifact.id == art.id, AssistantArtifact.updated_at == art.updated_at)
+        .values(status="in_progress", notes=None, updated_at=func.now())
+    ).rowcount
+    db.commit()
+    db.refresh(art)
+    return bool(claimed)
+
+def _new_artifact(db: Session, topic: Topic, style: str, chash: str, variant: int) -> AssistantArtifact | None:
+    art = AssistantArtifact(
+        id=uuid4().hex[:16],
+        topic_id=topic.id,
+        style=style,
+        content_hash=chash,
+        prompt_version=ASSISTANT_PROMPT_VERSION,
+        variant=variant,
+        status="in_progress",
+        payload={"topicTitle": topic.title, "paragraphs": []},
+    )
+    db.add(art)
+    try:
+        db.commit()
+        return art
+    except IntegrityError:
+        # otro job creó esa misma variante a la vez
+        db.rollback()
+        return None
+
+def _attach_artifact(db: Session, rec: AssistantExplanation, topic: Topic, ctx: dict,
+                     avoid_id: str | None = None) -> tuple[AssistantArtifact, bool]:
+    """
+    Asocia `rec` a un artefacto compartido y copia lo que ya tenga.
+    Devuelve (artefacto, owner): owner=True si este job debe generarlo
+    (nuevo, interrumpido u huérfano); False si ya está completo o lo genera otro job.
+    """
+    art: AssistantArtifact | None = db.get(AssistantArtifact, rec.artifact_id) if rec.artifact_id else None
+    owner = False
+    if art is not None:
+        owner = _claim_artifact(db, art)
+    else:
+        chash = _content_hash(ctx)
+        for _ in range(3):
+            rows = db.execute(
+                select(AssistantArtifact).where(
+                    AssistantArtifact.topic_id == topic.id,
+                    AssistantArtifact.style == rec.style,
+                    AssistantArtifact.content_hash == chash,
+                    AssistantArtifact.prompt_version == ASSISTANT_PROMPT_VERSION,
+                )
+            ).scalars().all()
+            if len(rows) < ASSISTANT_SHARED_VARIANTS:
+                # faltan variantes: crea una nueva
+                art = _new_artifact(db, topic, rec.style, chash, max((a.variant for a in rows), default=-1) + 1)
+                owner = art is not None
+            else:
+                # cupo de K completo: otra variante si se pidió regenerar y la hay; si no, la misma
+                pool = [a for a in rows if a.id != avoid_id] or rows
+                art = random.choice([a for a in pool if a.status == "completed"] or pool)
+                owner = _claim_artifact(db, art)
+            if art is not None:
+                break
+        if art is None:
+            raise RuntimeError("No se pudo asignar un artefacto compartido")
+
+    rec.artifact_id = art.id
+    rec.payload = _rec_payload(art, topic.title)
+    flag_modified(rec, "payload")
+    if art.status == "completed":
+        rec.status = "completed"
+        rec.notes = None
+    db.add(rec); db.commit()
+    return art, owner
+
+def _save_artifact(db: Session, art: AssistantArtifact, payload: dict,
+                   status: str = "in_progress", notes: str | None = None):
+    """Guarda el artefacto y replica su prefijo en todas las explicaciones asociadas."""
+    # JSON no detecta mutaciones in-place: marcamos la columna explícitamente
+    art.payload = payload
+    flag_modified(art, "payload")
+    art.status = status
+    art.notes = notes
+    db.add(art)
+    targets = AssistantExplanation.status != "completed" if status == "completed" \
+        else AssistantExplanation.status == "in_progress"
+    db.execute(
+        update(AssistantExplanation)
+        .where(AssistantExplanation.artifact_id == art.id, targets)
+        .values(status=status, notes=notes, payload=_rec_payload(art))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+def _artifact_text(db: Session, art: AssistantArtifact, topic: Topic, ctx: dict) -> str:
+    # reintento: mismo texto → mismos párrafos que los ya guardados
+    saved = (art.payload or {}).get("text")
+    if saved:
+        return saved
+
+    # Texto base con IA (si no existe ya en otro estilo)
+    if art.style == "auditivo":
+        # intenta reciclar el texto visual compartido (preferentemente de la misma variante)
+        prev_visual = db.execute(
+            select(AssistantArtifact)
+            .where(and_(
+                AssistantArtifact.topic_id == topic.id,
+                AssistantArtifact.style == "visual",
+                AssistantArtifact.content_hash == art.content_hash,
+                AssistantArtifact.prompt_version == art.prompt_version,
+                AssistantArtifact.status == "completed"
+            ))
+            .order_by(func.abs(AssistantArtifact.variant - art.variant))
+            .limit(1)
+        ).scalars().first()
+        if prev_visual and (prev_visual.payload or {}).get("paragraphs"):
+            return "\n\n".join(p.get("text","") for p in prev_visual.payload["paragraphs"])
+
+    try:
+        data = generate_assistant_explanation(ctx, art.style, variant=art.variant)
+        # une párrafos para el flujo de división
+        text = "\n\n".join([p.get("text","") for p in (data.get("paragraphs") or [])]) or ""
+    except Exception as e:
+        log.warning("assistant long explanation failed, fallback to short: %s", e)
+        metrics.inc("ai_fallbacks_total", site="assistant", reason=type(e).__name__)
+        text = ""
+    return text or generate_explanation(ctx) or (topic.title + ": explicación.")
+
+def _generate_artifact(db: Session, art: AssistantArtifact, topic: Topic, ctx: dict):
+    """Genera (o continúa) el artefacto; cada avance llega a todas las explicaciones asociadas."""
+    payload = dict(art.payload or {})
+    payload["topicTitle"] = payload.get("topicTitle") or topic.title
+    payload["paragraphs"] = list(payload.get("paragraphs") or [])
+    if not payload.get("text"):
+        payload["text"] = _artifact_text(db, art, topic, ctx)
+        _save_artifact(db, art, payload)
+
+    paragraphs_txt = _split_paragraphs(payload["text"])
+    # Si ya había párrafos (reintento), continúa desde el siguiente vacío
+    idx_start = len(payload["paragraphs"])
+    attached = _attached_ids(db, art.id)
+
+    # Assets en paralelo (fan-out acotado) pero publicados EN ORDEN:
+    # el cliente siempre ve un prefijo contiguo de párrafos.
+    todo = list(enumerate(paragraphs_txt[idx_start:], start=idx_start))
+    if todo:
+        fanout = max(1, min(ASSISTANT_ASSET_FANOUT, len(todo)))
+        last_commit = 0.0
+        pending = 0  # párrafos publicados por el broker pero aún no guardados
+        with ThreadPoolExecutor(max_workers=fanout, thread_name_prefix=f"assist-{art.id}") as pool:
+            futures = [pool.submit(_build_paragraph, art.id, art.style, i, ptxt) for i, ptxt in todo]
+            for n, fut in enumerate(futures):
+                # commits coalescidos: el primero enseguida, luego cada N segundos. Si el siguiente
+                # párrafo tarda, lo ya publicado se guarda al vencer el intervalo (pollers, SSE de
+                # otro worker y explicaciones asociadas leen la DB). Cada commit renueva updated_at.
+                while True:
+                    wait = None if not pending else max(0.0, ASSISTANT_COMMIT_EVERY_SEC - (time.monotonic() - last_commit))
+                    try:
+                        row = fut.result(timeout=wait)
+                        break
+                    except TimeoutError:
+                        _save_artifact(db, art, payload)
+                        attached = _attached_ids(db, art.id)
+                        last_commit, pending = time.monotonic(), 0
+                payload["paragraphs"].append(row)
+                pending += 1
+                ev = {"type": "paragraph", "index": len(payload["paragraphs"]) - 1, "paragraph": row}
+                for eid in attached:
+                    _events.publish(eid, ev)
+                is_last = (n == len(futures) - 1)
+                if not is_last and (n == 0 or time.monotonic() - last_commit >= ASSISTANT_COMMIT_EVERY_SEC):
+                    _save_artifact(db, art, payload)
+                    attached = _attached_ids(db, art.id)
+                    last_commit, pending = time.monotonic(), 0
+
+    attached = _attached_ids(db, art.id)
+    _save_artifact(db, art, payload, status="completed")
+    for eid in attached:
+        _events.publish(eid, {"type": "status", "status": "completed", "notes": None}, final=True)
+
 # ---------- Worker principal ----------
 
-def _worker_generate(expl_id: str):
+def _worker_generate(expl_id: str, avoid_artifact: str | None = None):
     """Genera la explicación (visual o auditivo) en background."""
     from app.db import SessionLocal  # evita ciclos
     db: Session = SessionLocal()
+    art: AssistantArtifact | None = None
+    owner = False
     try:
         rec: AssistantExplanation | None = db.get(AssistantExplanation, expl_id)
         if not rec:
             return
-        user_id = rec.user_id
+        # heartbeat al arrancar: el tiempo en cola no cuenta como inactividad
+        _heartbeat(db, [expl_id])
+        _events.reset(expl_id)
         topic: Topic = db.get(Topic, rec.topic_id)
+        ctx = _load_ctx(topic)
 
-        # Carga contexto (si existe JSON contextual de tu tema)
-        ctx_path = resolve_context_path(topic.grade, topic.slug)
-        ctx = {}
-        if ctx_path.exists():
-            try:
-                ctx = json.loads(ctx_path.read_text(encoding="utf-8"))
-            except Exception:
-                ctx = {}
-
-        # Texto base con IA (si no existe ya en otro estilo)
-        text = ""
-        if rec.style == "auditivo":
-            # intenta reciclar el texto visual previo (si completed)
-            prev_visual = db.execute(
-                select(AssistantExplanation)
-                .where(and_(
-                    AssistantExplanation.user_id == user_id,
-                    AssistantExplanation.topic_id == topic.id,
-                    AssistantExplanation.style == "visual",
-                    AssistantExplanation.status == "completed"
-                ))
-                .order_by(AssistantExplanation.created_at.desc())
-                .limit(1)
-            ).scalars().first()
-            if prev_visual and (prev_visual.payload or {}).get("paragraphs"):
-                text = "\n\n".join(p.get("text","") for p in prev_visual.payload["paragraphs"])
-
-        if not text:
-            try:
-                data = generate_assistant_explanation(ctx, rec.style)
-                # une párrafos para el flujo de división
-                text = "\n\n".join([p.get("text","") for p in (data.get("paragraphs") or [])]) or ""
-            except Exception as e:
-                log.warning("assistant long explanation failed, fallback to short: %s", e)
-                text = generate_explanation(ctx) or (topic.title + ": explicación.")
-
-        paragraphs_txt = _split_paragraphs(text)
-        payload = rec.payload or {"topicTitle": topic.title}
-        payload["paragraphs"] = payload.get("paragraphs") or []
-
-        # Si ya había párrafos (reintento), continúa desde el siguiente vacío
-        existing_ids = {p.get("id") for p in payload["paragraphs"]}
-        idx_start = len(existing_ids) if existing_ids else 0
-
-        for i, ptxt in enumerate(paragraphs_txt[idx_start:], start=idx_start):
-            pid = f"p{i+1}"
-            row = {"id": pid, "text": ptxt}
-            
-            #if rec.style == "visual":
-            #    try:
-            #        # Prompt que evita texto largo, permite título corto y números/símbolos
-            #        img_prompt = build_visual_image_prompt(ctx, ptxt, allow_short_title=True)
-            #        png = generate_one_image_png(img_prompt)
-            #        if png:
-            #            out = _png_path_for(expl_id, pid)
-            #            out.write_bytes(png)
-            #            row["imageUrl"] = _png_url_for(expl_id, pid)
-            #    except Exception as e:
-            #        log.warning("visual img gen fail: %s", e)
-        
-            if rec.style == "visual":
-                try:
-                    png = generate_one_image_png(_simple_visual_prompt(ptxt[:220]))
-                    if png:
-                        out = _png_path_for(expl_id, pid)
-                        out.write_bytes(png)
-                        row["imageUrl"] = _png_url_for(expl_id, pid)
-                except Exception as e:
-                    log.warning("visual img gen fail (p%s): %s", pid, e)
-        
-            else:  # auditivo
-                try:
-                    wav_path = _wav_path_for(expl_id, pid)
-                    make_tts(ptxt, wav_path, voice=os.getenv("TTS_VOICE","es-ES-Neural2-A"))
-                    if wav_path.exists():
-                        row["audioUrl"] = _wav_url_for(expl_id, pid)
-                except Exception as e:
-                    log.warning("tts per-paragraph fail (p%s): %s", pid, e)
-        
-            payload["paragraphs"].append(row)
-            rec.payload = payload
-            db.add(rec); db.commit()
+        art, owner = _attach_artifact(db, rec, topic, ctx, avoid_id=avoid_artifact)
+        if owner:
+            _owned_artifacts.add(art.id)
+            _generate_artifact(db, art, topic, ctx)
+            return
 
-        rec.status = "completed"
-        rec.notes = None
-        rec.payload = payload
-        db.add(rec); db.commit()
+        # Artefacto completo → copia instantánea. En curso → el job que lo genera
+        # irá actualizando también este registro.
+        for i, p in enumerate((rec.payload or {}).get("paragraphs") or []):
+            _events.publish(expl_id, {"type": "paragraph", "index": i, "paragraph": p})
+        if rec.status == "completed":
+            _events.publish(expl_id, {"type": "status", "status": "completed", "notes": None}, final=True)
 
     except Exception as e:
         log.exception("assistant worker failed: %s", e)
         try:
-            rec = db.get(AssistantExplanation, expl_id)
-            if rec:
-                rec.status = "interrupted"
-                rec.notes = str(e)
-                db.add(rec); db.commit()
+            db.rollback()
+            if art is not None and owner:
+                attached = _attached_ids(db, art.id)
+                _save_artifact(db, art, dict(art.payload or {}), status="interrupted", notes=str(e))
+            else:
+                attached = [expl_id]
+                rec = db.get(AssistantExplanation, expl_id)
+                if rec:
+                    rec.status = "interrupted"
+                    rec.notes = str(e)
+                    db.add(rec); db.commit()
         except Exception:
-            pass
+            attached = [expl_id]
+        for eid in attached:
+            _events.publish(eid, {"type": "status", "status": "interrupted", "notes": str(e)}, final=True)
     finally:
+        if art is not None and owner:
+            _owned_artifacts.discard(art.id)
         db.close()
@@ -6,6 +6,8 @@ from app.models.user import User
 from app.models.badge import Badge
 from app.models.user_badge import UserBadge
 from app.schemas.badge import BadgeOut
+from app.core.assets import versioned_url
+from app.core import sprites
 from app.deps import get_current_user  # ajusta a tu proyecto
 
 router = APIRouter(prefix="/badges", tags=["badges"])
@@ -17,14 +19,14 @@ def _norm_media_url(raw: str | None) -> str | None:
     if u.startswith("http://") or u.startswith("https://"):
         return u
     if u.startswith("/media/"):
-        return u
+        return versioned_url(u)
     if u.startswith("/static/"):
         # convertir viejo a nuevo
-        return "/media/" + u.lstrip("/static/").lstrip("/")
+        return versioned_url("/media/" + u.lstrip("/static/").lstrip("/"))
     if u.startswith(("badges/", "avatars/", "covers/")):
-        return "/media/" + u
+        return versioned_url("/media/" + u)
     # fallback
-    return "/media/" + u.lstrip("/")
+    return versioned_url("/media/" + u.lstrip("/"))
 
 @router.get("", response_model=list[BadgeOut])
 def list_badges(db: Session = Depends(get_db), me: User = Depends(get_current_user)):
@@ -68,10 +70,13 @@ def list_badges(db: Session = Depends(get_db), me: User = Depends(get_current_us
     )
 
     rows = db.execute(q).mappings().all()
+    refs = sprites.sprite_refs("badges")
     out = []
     for r in rows:
         r = dict(r)
         r["rarityPct"] = round(float(r["rarityPct"] or 0.0), 2)
+        r["imageUrl"] = _norm_media_url(r["imageUrl"]) or r["imageUrl"]
+        r["sprite"] = sprites.lookup(refs, r["imageUrl"])
         out.append(r)
     return out
 
@@ -86,7 +91,9 @@ def get_badge(badge_id: int, db: Session = Depends(get_db), me: User = Depends(g
     owned = db.execute(
         select(func.count()).where(UserBadge.user_id == me.id, UserBadge.badge_id == badge_id)
     ).scalar_one() > 0
+    image_url = _norm_media_url(b.image_url)
     return {
         "id": b.id, "slug": b.slug, "title": b.title, "description": b.description,
-        "imageUrl": _norm_media_url(b.image_url), "rarityPct": rarity, "owned": owned
+        "imageUrl": image_url, "rarityPct": rarity, "owned": owned,
+        "sprite": sprites.lookup(sprites.sprite_refs("badges"), image_url),
     }
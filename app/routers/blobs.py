@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import RedirectResponse
+
+from app.core.storage import StorageError, get_store
+
+router = APIRouter(prefix="/blobs", tags=["blobs"])
+
+@router.get("/{key:path}")
+def get_blob(key: str):
+    """
+    Refs guardadas en BD con STORAGE_BACKEND=s3 (/blobs/gen/frac-3-5.png):
+    redirige a una URL firmada vigente del bucket.
+    """
+    store = get_store()
+    try:
+        url = store.signed_url(key)
+    except StorageError:
+        raise HTTPException(404, "Archivo no encontrado")
+    # la firma vence: el cliente no debe cachear la redirección más que su vida útil
+    return RedirectResponse(url, status_code=307, headers={"Cache-Control": "private, max-age=300"})
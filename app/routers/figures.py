@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response
+
+from app.core.figures import spec_from_name, render_svg, render_png
+from app.core.storage import get_store
+from app.core.utils_imgs import generic_figure_url
+
+router = APIRouter(prefix="/figures", tags=["figures"])
+
+# el nombre fija el contenido: se puede cachear para siempre
+_CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable", "Vary": "Accept"}
+
+_MEDIA = {"json": "application/json", "svg": "image/svg+xml", "png": "image/png"}
+# a igual calidad: SVG (más liviano) > PNG > JSON; comodines caen en PNG
+_PREFERENCE = ("svg", "png", "json")
+
+def _negotiate(accept: str | None) -> str:
+    best, best_q = "png", 0.0
+    for part in (accept or "").split(","):
+        media, _, params = part.strip().partition(";")
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        media = media.strip().lower()
+        fmt = next((f for f, m in _MEDIA.items() if m == media), None)
+        if fmt is None:
+            continue  # image/*, */* → respaldo PNG
+        if q > best_q or (q == best_q and _PREFERENCE.index(fmt) < _PREFERENCE.index(best)):
+            best, best_q = fmt, q
+    return best
+
+@router.get("/{name}")
+def get_figure(
+    name: str,
+    accept: str | None = Header(default=None),
+    format: str | None = Query(default=None, pattern="^(svg|png|json)$"),
+):
+    """
+    Figura por nombre (frac-3-5, pct-40). Formato por extensión (.svg/.png/.json),
+    ?format= o cabecera Accept; PNG si el cliente no pide otra cosa.
+    """
+    base, dot, ext = name.rpartition(".")
+    if not dot:
+        base, ext = name, ""
+    spec = spec_from_name(base)
+    if spec is None or (ext and ext not in _MEDIA):
+        raise HTTPException(404, "Figura no encontrada")
+
+    fmt = format or ext or _negotiate(accept)
+    if fmt == "json":
+        return JSONResponse(spec, headers=_CACHE_HEADERS)
+    if fmt == "svg":
+        return Response(render_svg(spec), media_type="image/svg+xml", headers=_CACHE_HEADERS)
+    store = get_store()
+    key = render_png(spec)
+    if key is None:
+        # aún sin renderizar: la genérica, sin caché, para que el próximo pedido traiga la real
+        return RedirectResponse(generic_figure_url(), status_code=307,
+                                headers={"Cache-Control": "no-store", "Retry-After": "5"})
+    path = store.local_path(key)
+    if path is None:
+        # almacenamiento remoto: el cliente descarga directo del bucket
+        return RedirectResponse(store.signed_url(key), status_code=307, headers={"Vary": "Accept"})
+    return FileResponse(path, media_type="image/png", headers=_CACHE_HEADERS)
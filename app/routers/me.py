@@ -6,6 +6,7 @@ from app.domain.badges.service import on_first_login_done
 from sqlalchemy import select, func
 from app.models.badge import Badge
 from app.models.user_badge import UserBadge
+from app.core.assets import versioned_url
 
 router = APIRouter(prefix="/users/me", tags=["me"])
 
@@ -40,7 +41,7 @@ def mark_first_login_done(
                 "slug": b.slug,
                 "title": b.title,
                 "description": b.description,
-                "imageUrl": b.image_url,
+                "imageUrl": versioned_url(b.image_url),
                 "rarityPct": rarity,
                 "owned": owned,
             })
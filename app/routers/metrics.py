@@ -0,0 +1,69 @@
+import os, secrets
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import PlainTextResponse
+
+from app.ai import genai_client, ratelimit
+from app.ai.cache import response_cache
+from app.core.metrics import metrics
+from app.core import render_pool
+from app.db import pool_stats
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+# Si está definido, hay que mandar "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip()
+
+def _check_token(authorization: str | None):
+    if not METRICS_TOKEN:
+        return
+    token = (authorization or "").removeprefix("Bearer ").strip()
+    if not secrets.compare_digest(token, METRICS_TOKEN):
+        raise HTTPException(401, "Token de métricas inválido")
+
+def _refresh_gauges(client: dict, cache: dict):
+    """Vuelca al registro el estado que vive en otros módulos (para el formato Prometheus)."""
+    metrics.set_gauge("ai_inflight", client["inflight"])
+    metrics.set_gauge("ai_breaker_open", 1 if client["breaker"]["state"] != "closed" else 0)
+    metrics.set_gauge("ai_cache_lookups", cache["hitsMemory"], result="memory")
+    metrics.set_gauge("ai_cache_lookups", cache["hitsDisk"], result="disk")
+    metrics.set_gauge("ai_cache_lookups", cache["misses"], result="miss")
+    metrics.set_gauge("ai_cache_memory_items", cache["memoryItems"])
+    metrics.set_gauge("ai_cache_memory_bytes", cache["memoryBytes"])
+    sf = ratelimit.single_flight.stats()
+    metrics.set_gauge("ai_single_flight_shared", sf["shared"])
+    metrics.set_gauge("figure_renders_pending", render_pool.pending())
+    db = pool_stats()
+    for key, name in (("checkedOut", "db_pool_checked_out"), ("size", "db_pool_size"),
+                      ("overflow", "db_pool_overflow"), ("utilization", "db_pool_utilization")):
+        if db.get(key) is not None:
+            metrics.set_gauge(name, db[key])
+
+@router.get("")
+def get_metrics(
+    authorization: str | None = Header(default=None),
+    accept: str | None = Header(default=None),
+    format: str | None = Query(default=None, pattern="^(json|prometheus)$"),
+):
+    """
+    Estado del cliente de IA, caché y registro de métricas.
+    JSON por defecto; texto Prometheus con ?format=prometheus o Accept: text/plain.
+    """
+    _check_token(authorization)
+    client = genai_client.get_client().stats()
+    cache = response_cache.stats()
+    _refresh_gauges(client, cache)
+
+    wants_text = format == "prometheus" or (format is None and "text/plain" in (accept or ""))
+    if wants_text:
+        return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    return {
+        "ai": {
+            "client": client,
+            "cache": cache,
+            "singleFlight": ratelimit.single_flight.stats(),
+            "rateLimit": ratelimit.stats(),
+        },
+        "db": pool_stats(),
+        "metrics": metrics.snapshot(),
+    }
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from app.core import sprites
+
+router = APIRouter(prefix="/sprites", tags=["sprites"])
+
+@router.get("/{group}")
+async def get_sprite_map(group: str):
+    """
+    Mapa del atlas (badges | avatars): URL versionada de la imagen y coordenadas por URL original.
+    El cliente baja una sola imagen y recorta con background-position: -x -y.
+    """
+    data = await run_in_threadpool(sprites.public_manifest, group)  # el primer llamado arma el atlas
+    if data is None:
+        raise HTTPException(404, "Atlas no encontrado")
+    # el mapa cambia si cambian las imágenes: se revalida, la imagen (con ?v=) es inmutable
+    return JSONResponse(data, headers={"Cache-Control": "no-cache"})
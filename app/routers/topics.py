@@ -33,14 +33,18 @@ from app.core.settings_static import (
 )
 from app.core.utils_imgs import (
     make_explanation_figure_png,
+    is_generic_figure,
     decorate_visuals_for_items,
+    refresh_item_figures,
     ensure_fraction_png,
     save_png_return_url,
     pick_visual_expl_image_from_ctx
 )
 from app.core.utils_text import neutralize_audio_words
-from app.core.utils_tts import make_tts, tts_url_for
+from app.core.utils_tts import make_tts, tts_key, tts_url_for
+from app.core.storage import get_store
 from app.core.content import resolve_context_path
+from app.core.assets import versioned_url, versioned_items
 
 # === HELPERS DE FRACCIONES (MOVIDOS DEL ROUTER) ===
 # Se importan tal cual para no romper firmas ni comportamiento.
@@ -79,13 +83,13 @@ def _norm_media_url(raw: str | None) -> str | None:
     if u.startswith("http://") or u.startswith("https://"):
         return u
     if u.startswith("/media/"):
-        return u
+        return versioned_url(u)
     if u.startswith("/covers/") or u.startswith("/avatars/") or u.startswith("/badges/"):
-        return f"/media{u}"
+        return versioned_url(f"/media{u}")
     if u.startswith("covers/") or u.startswith("avatars/") or u.startswith("badges/"):
-        return f"/media/{u}"
+        return versioned_url(f"/media/{u}")
     # último recurso
-    return f"/media/{u.lstrip('/')}"
+    return versioned_url(f"/media/{u.lstrip('/')}")
 
 def _resolve_or_generate_visual_image(db: Session, ut: UserTopic, ctx: dict, topic_slug: str) -> str | None:
     try:
@@ -95,7 +99,7 @@ def _resolve_or_generate_visual_image(db: Session, ut: UserTopic, ctx: dict, top
         prompts = (ctx.get("visual_assets") or {}).get("image_prompts") or []
         if prompts:
             prompt = prompts[0]  # ← vuelve a tu prompt del JSON
-            png = generate_one_image_png(prompt)
+            png = generate_one_image_png(prompt, site="topic_visual")
             if png:
                 url = save_png_return_url(topic_slug, png)
                 ut.cached_visual_image_url = url
@@ -105,6 +109,22 @@ def _resolve_or_generate_visual_image(db: Session, ut: UserTopic, ctx: dict, top
         log.warning("visual image resolve/gen failed: %s", e)
     return None
 
+def _explanation_figure(ut: UserTopic, t: Topic, user_id: int, base: str) -> str | None:
+    """
+    Figura de explicación del estilo visual. Solo se guarda en ut la URL de una figura
+    ya renderizada; mientras tanto se sirve la genérica y se reintenta en la próxima lectura.
+    """
+    if ut.cached_visual_image_url:
+        return ut.cached_visual_image_url
+    try:
+        url = make_explanation_figure_png(t.slug, t.id, user_id, base)
+    except Exception as e:
+        log.warning("visual expl generation failed: %s", e)
+        return None
+    if not is_generic_figure(url):
+        ut.cached_visual_image_url = url
+    return url
+
 def _pick_visual_expl_image(ctx: dict) -> str | None:
     """
     Intenta tomar una imagen ya existente declarada en el JSON.
@@ -148,6 +168,8 @@ def _open_session_core(
         .order_by(TopicSession.id.desc())
     ).scalars().first()
 
+    expl_image_url = None  # figura de explicación (o la genérica mientras se renderiza)
+
     need_new = (
         force_new
         or (not last)
@@ -218,14 +240,8 @@ def _open_session_core(
             explanation = payload.get("explanation")
 
             # Imagen/visual (si aplica al estilo)
-            try:
-                if style == "visual":
-                    from app.core.utils_imgs import make_explanation_figure_png
-                    if not ut.cached_visual_image_url:  # ← importante: no regenerar si ya existe
-                        base = explanation or (ctx.get("summary") or t.title)
-                        ut.cached_visual_image_url = make_explanation_figure_png(t.slug, t.id, me.id, base)
-            except Exception as e:
-                log.warning("visual expl generation failed: %s", e)
+            if style == "visual":
+                expl_image_url = _explanation_figure(ut, t, me.id, explanation or (ctx.get("summary") or t.title))
 
             # Normaliza a 10
             items = (items[:10] if len(items) > 10 else items)
@@ -256,6 +272,15 @@ def _open_session_core(
         else:
             explanation = last.explanation or (ut.cached_explanation or None)
 
+            # figuras que quedaron como genérica (render en curso) → la real, si ya está
+            if style == "visual":
+                expl_image_url = _explanation_figure(ut, t, me.id, explanation or (ctx.get("summary") or t.title))
+                refreshed = refresh_item_figures(last.items)
+                if refreshed is not None:
+                    last.items = refreshed
+                if db.is_modified(ut) or refreshed is not None:
+                    db.add(ut); db.add(last); db.commit(); db.refresh(last)
+
         # Reparación ligera en reuso (por si quedaron MCQ raras)
         try:
             engine = get_engine_for_slug(t.grade, t.slug)
@@ -277,17 +302,19 @@ def _open_session_core(
             if ut.cached_expl_audio_url:
                 explanation_audio_url = ut.cached_expl_audio_url
             else:
-                exp_path = (TTS_DIR / f"sess-{last.id}-explanation.wav")
-                if not exp_path.exists():
+                store = get_store()
+                exp_key = tts_key(last.id, "explanation")
+                if not store.exists(exp_key):
                     voice_env = os.getenv("TTS_VOICE", "").strip()
                     fallback_voices = [v for v in [voice_env, "es-ES-Standard-A", "es-US-Standard-A", "es-ES-Neural2-A"] if v]
                     for v in fallback_voices:
                         try:
-                            make_tts(last.explanation or explanation or "", exp_path, voice=v)
+                            with store.writer(exp_key) as exp_path:
+                                make_tts(last.explanation or explanation or "", exp_path, voice=v)
                             break
                         except Exception as e:
                             log.warning("tts voice failed (%s): %s", v, e)
-                if exp_path.exists():
+                if store.exists(exp_key):
                     explanation_audio_url = tts_url_for(last.id, "explanation")
                     ut.cached_expl_audio_url = explanation_audio_url
                     db.add(ut); db.commit()
@@ -301,10 +328,10 @@ def _open_session_core(
         "title": t.title,
         "style": last.style_used,
         "explanation": explanation or last.explanation,
-        "explanationAudioUrl": explanation_audio_url if style == "auditivo" else None,
-        "explanationImageUrl": (ut.cached_visual_image_url or None) if style == "visual" else None,
+        "explanationAudioUrl": versioned_url(explanation_audio_url) if style == "auditivo" else None,
+        "explanationImageUrl": versioned_url(expl_image_url) if style == "visual" else None,
         "currentIndex": last.current_index,
-        "items": last.items,
+        "items": versioned_items(last.items),
         "progressInSession": progress_in_session,
     }
 
@@ -605,7 +632,7 @@ def finish(session_id: int, body: dict | None = None, db: Session = Depends(get_
                     "id": b.id,
                     "slug": b.slug,
                     "title": b.title,
-                    "imageUrl": b.image_url,
+                    "imageUrl": versioned_url(b.image_url),
                     "rarityPct": rarity,
                     "owned": True
                 })
@@ -637,7 +664,7 @@ def finish(session_id: int, body: dict | None = None, db: Session = Depends(get_
                     "id": b.id,
                     "slug": b.slug,
                     "title": b.title,
-                    "imageUrl": b.image_url,
+                    "imageUrl": versioned_url(b.image_url),
                     "rarityPct": rarity,
                     "owned": True
                 })
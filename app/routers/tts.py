@@ -2,7 +2,12 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from google.cloud import texttospeech
-import io, wave, os
+from app.ai.tts import tts_client
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import io, wave, os, re, struct, logging
+
+log = logging.getLogger("tts")
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
@@ -20,40 +25,96 @@ def _lang_from_name(voice_name: str, fallback: str = "es-ES") -> str:
         return f"{parts[0]}-{parts[1]}"
     return fallback
 
-@router.post("/tts")
-def tts(body: dict):
-    text = (body.get("text") or "").strip()
-    req_voice = (body.get("voice") or "").strip()
-    if not text:
-        raise HTTPException(status_code=400, detail="text requerido")
+# ==== Streaming por oraciones ====
+TTS_SAMPLE_RATE = 24000
+# cuántas oraciones se sintetizan en paralelo por delante de la que se está enviando
+TTS_STREAM_AHEAD = int(os.getenv("TTS_STREAM_AHEAD", "3"))
+# pool compartido por todas las peticiones en streaming (acota hilos contra GC TTS)
+_stream_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TTS_STREAM_WORKERS", "8")),
+    thread_name_prefix="tts-stream",
+)
+
+_SENT_END_RE = re.compile(r"(?<=[.!?…;:])\s+")
+
+def _split_sentences(text: str, first_max: int = 120, max_chars: int = 280) -> list[str]:
+    """
+    Divide el texto en oraciones para sintetizar por partes.
+    - Une fragmentos muy cortos para no pagar una llamada por cada "Sí."
+    - El primer trozo es más corto para que el audio empiece cuanto antes.
+    """
+    raw = [s.strip() for s in _SENT_END_RE.split((text or "").replace("\n", " ")) if s.strip()]
+    out: list[str] = []
+    cur = ""
+    for sent in raw:
+        limit = first_max if not out else max_chars
+        if cur and len(cur) + 1 + len(sent) > limit:
+            out.append(cur)
+            cur = sent
+        else:
+            cur = f"{cur} {sent}".strip()
+        # oraciones gigantes sin puntuación: corte blando por comas/espacios
+        while len(cur) > max_chars:
+            cut = max(cur.rfind(", ", 0, max_chars), cur.rfind(" ", 0, max_chars))
+            cut = cut if cut > 0 else max_chars
+            out.append(cur[:cut].strip())
+            cur = cur[cut:].lstrip(", ").strip()
+    if cur:
+        out.append(cur)
+    return out
 
+def _strip_wav_header(audio: bytes) -> bytes:
+    """GC TTS devuelve LINEAR16 con cabecera RIFF; nos quedamos solo con el PCM."""
+    if len(audio) < 12 or audio[:4] != b"RIFF" or audio[8:12] != b"WAVE":
+        return audio
+    pos = 12
+    while pos + 8 <= len(audio):
+        chunk_id = audio[pos:pos+4]
+        size = struct.unpack("<I", audio[pos+4:pos+8])[0]
+        if chunk_id == b"data":
+            return audio[pos+8:pos+8+size]
+        pos += 8 + size + (size & 1)
+    return audio[44:]
+
+def _wav_stream_header(sr: int = TTS_SAMPLE_RATE) -> bytes:
+    """Cabecera WAV (mono s16le) con tamaños 'desconocidos' para streaming."""
+    unknown = 0xFFFFFFFF
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sr, sr * 2, 2, 16)
+        + b"data" + struct.pack("<I", unknown)
+    )
+
+def _resolve_voice(req_voice: str) -> tuple[str, str]:
+    """Devuelve (voice_name, default_voice) según alias / nombre real / env."""
     # Voz por defecto (puedes cambiarla por env var TTS_VOICE si prefieres)
     default_voice = os.getenv("TTS_VOICE", "es-ES-Neural2-A")
 
     # Normaliza voz solicitada
     voice_key = req_voice.lower()
     if voice_key in VOICE_ALIASES:
-        language_code, voice_name = VOICE_ALIASES[voice_key]
+        _, voice_name = VOICE_ALIASES[voice_key]
     elif req_voice:
         # El usuario pasó un nombre de voz “real” de GC TTS
         voice_name = req_voice
-        language_code = _lang_from_name(voice_name, "es-ES")
     else:
         voice_name = default_voice
-        language_code = _lang_from_name(voice_name, "es-ES")
+    return voice_name, default_voice
 
-    # Intenta sintetizar
+def _make_client() -> texttospeech.TextToSpeechClient:
     try:
-        client = texttospeech.TextToSpeechClient()
+        return tts_client()
     except Exception as e:
         # Problema de credenciales (ADC)
         raise HTTPException(status_code=503, detail=f"TTS no disponible: {e}")
 
+def _synthesize_pcm(client, text: str, voice_name: str, default_voice: str) -> bytes:
+    """Sintetiza `text` y devuelve PCM 24kHz mono s16le (sin cabecera)."""
     synthesis_input = texttospeech.SynthesisInput(text=text)
     voice = texttospeech.VoiceSelectionParams(language_code="es-ES", name=voice_name)
     audio_config = texttospeech.AudioConfig(
         audio_encoding=texttospeech.AudioEncoding.LINEAR16,
-        sample_rate_hertz=24000,
+        sample_rate_hertz=TTS_SAMPLE_RATE,
     )
 
     try:
@@ -71,13 +132,83 @@ def tts(body: dict):
             import traceback
             traceback.print_exc()
             raise HTTPException(status_code=502, detail=f"TTS error: {e}")
+    return _strip_wav_header(res.audio_content)
+
+def _stream_wav(client, sentences: list[str], first_pcm: bytes, voice_name: str, default_voice: str):
+    """
+    Generador: cabecera WAV + PCM de cada oración en orden.
+    Mantiene hasta TTS_STREAM_AHEAD oraciones sintetizándose en paralelo.
+    """
+    pending: deque = deque()
+    rest = iter(sentences)
+
+    def _fill():
+        while len(pending) < max(1, TTS_STREAM_AHEAD):
+            nxt = next(rest, None)
+            if nxt is None:
+                return
+            pending.append(_stream_pool.submit(_synthesize_pcm, client, nxt, voice_name, default_voice))
+
+    try:
+        _fill()
+        yield _wav_stream_header() + first_pcm
+        while pending:
+            fut = pending.popleft()
+            _fill()
+            try:
+                yield fut.result()
+            except Exception as e:
+                # una oración fallida no corta el audio completo
+                log.warning("[tts] stream chunk failed: %s", getattr(e, "detail", e))
+    finally:
+        # cliente desconectado o fin: no sigas sintetizando lo que nadie escuchará
+        for fut in pending:
+            fut.cancel()
+
+def _tts_streaming(text: str, req_voice: str) -> StreamingResponse:
+    voice_name, default_voice = _resolve_voice(req_voice)
+    client = _make_client()
+    sentences = _split_sentences(text) or [text]
+    # la primera oración se sintetiza antes de responder: así los errores
+    # de credenciales/voz siguen llegando como 502/503 y no como audio vacío
+    first_pcm = _synthesize_pcm(client, sentences[0], voice_name, default_voice)
+    return StreamingResponse(
+        _stream_wav(client, sentences[1:], first_pcm, voice_name, default_voice),
+        media_type="audio/wav",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/tts/stream")
+def tts_stream(text: str, voice: str = ""):
+    """Variante GET para usar directamente como `src` de un <audio>."""
+    text = (text or "").strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="text requerido")
+    return _tts_streaming(text, (voice or "").strip())
+
+@router.post("/tts")
+def tts(body: dict, stream: bool = False):
+    text = (body.get("text") or "").strip()
+    req_voice = (body.get("voice") or "").strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="text requerido")
+
+    # Modo streaming: {"stream": true} en el body o ?stream=1
+    if stream or bool(body.get("stream")):
+        return _tts_streaming(text, req_voice)
+
+    voice_name, default_voice = _resolve_voice(req_voice)
+
+    # Intenta sintetizar
+    client = _make_client()
+    pcm = _synthesize_pcm(client, text, voice_name, default_voice)
 
     # Empaqueta PCM en WAV 24kHz mono s16le
     buf = io.BytesIO()
     with wave.open(buf, "wb") as wf:
         wf.setnchannels(1)
         wf.setsampwidth(2)
-        wf.setframerate(24000)
-        wf.writeframes(res.audio_content)
+        wf.setframerate(TTS_SAMPLE_RATE)
+        wf.writeframes(pcm)
     buf.seek(0)
-    return StreamingResponse(buf, media_type="audio/wav")
\ No newline at end of file
+    return StreamingResponse(buf, media_type="audio/wav")
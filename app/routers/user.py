@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from app.deps import get_db, get_current_user
 from app.models.user import User as UserModel
 from app.schemas.user import UserOut, UserUpdate, AliasIn
 from datetime import datetime
-import shutil
-import os
-from app.core.settings_static import MEDIA_DIR
+from starlette.concurrency import run_in_threadpool
+from app.core import sprites
+from app.core.metrics import metrics
+from app.core.storage import get_store
+from app.services import avatars
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -15,7 +17,7 @@ def _norm_media_url(u: str | None) -> str | None:
     s = u.strip()
     if s.startswith("http://") or s.startswith("https://"):
         return s
-    if s.startswith("/media/") or s.startswith("/static/"):
+    if s.startswith("/media/") or s.startswith("/static/") or s.startswith("/blobs/"):
         return s
     # fallback: asume que es relativo dentro de media
     return "/media/" + s.lstrip("/")
@@ -69,31 +71,38 @@ def set_alias(payload: AliasIn,
     db.refresh(current_user)
     return current_user
 
-@router.post("/me/avatar", response_model=UserOut)
-def upload_avatar(
-    file: UploadFile = File(...),
+# el cuerpo se lee a mano (stream con tope), así que el campo se documenta aparte
+_AVATAR_FORM = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"],
+    "properties": {"file": {"type": "string", "format": "binary"}},
+}}}}}
+
+@router.post("/me/avatar", response_model=UserOut, openapi_extra=_AVATAR_FORM)
+async def upload_avatar(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_user)
 ):
-    if file.content_type not in ("image/png", "image/jpeg", "image/jpg", "image/webp"):
-        raise HTTPException(status_code=415, detail="Formato no soportado")
-
-    # Nombre seguro
-    ext = os.path.splitext(file.filename)[1].lower() or ".png"
-    fname = f"user_{current_user.id}_{int(datetime.utcnow().timestamp())}{ext}"
-
-    avatars_dir = (MEDIA_DIR / "avatars")
-    avatars_dir.mkdir(parents=True, exist_ok=True)
-    dest = avatars_dir / fname
-
-    with open(dest, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Guarda SIEMPRE una ruta relativa al backend (/media/...)
-    current_user.avatar_url = f"/media/avatars/{fname}"
-    db.add(current_user); db.commit(); db.refresh(current_user)
+    try:
+        data = await avatars.read_upload(request)
+        # Nombre seguro: la extensión sale del formato real, no del nombre del cliente
+        stamp = int(datetime.utcnow().timestamp())
+        key = await run_in_threadpool(avatars.store_original, current_user.id, data, stamp)
+    except avatars.AvatarError as e:
+        metrics.inc("avatar_uploads_total", outcome=e.reason)
+        raise HTTPException(status_code=e.status, detail=e.detail)
+
+    # Guarda SIEMPRE una ruta relativa al backend (/media/... o /blobs/...);
+    # el worker la cambia por la miniatura cuando esté lista
+    current_user.avatar_url = get_store().ref(key)
+    await run_in_threadpool(_commit_user, db, current_user)
+    await run_in_threadpool(avatars.enqueue_thumbnails, current_user.id, key, data)
+    metrics.inc("avatar_uploads_total", outcome="ok")
     return current_user
 
+def _commit_user(db: Session, user: UserModel):
+    db.add(user); db.commit(); db.refresh(user)
+
 @router.post("/me/avatar/select", response_model=UserOut)
 def select_avatar(
     body: dict,
@@ -135,7 +144,11 @@ def select_avatar(
     return current_user
 
 @router.get("/avatars")
-def get_available_avatars(current_user: UserModel = Depends(get_current_user)):
+def get_available_avatars(sprite: bool = False, current_user: UserModel = Depends(get_current_user)):
+    """
+    Avatares de stock disponibles. Con ?sprite=1 cada uno trae además su recorte en el
+    atlas (una sola descarga para toda la grilla): [{"url", "sprite": {...}}].
+    """
 
     base = [
         "/media/avatars/avatar1.png",
@@ -155,4 +168,7 @@ def get_available_avatars(current_user: UserModel = Depends(get_current_user)):
 
     extra = special_avatars.get(current_user.email, [])
 
-    return base + extra
\ No newline at end of file
+    if not sprite:
+        return base + extra
+    refs = sprites.sprite_refs("avatars")
+    return [{"url": u, "sprite": sprites.lookup(refs, u)} for u in base + extra]
\ No newline at end of file
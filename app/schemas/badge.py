@@ -1,4 +1,13 @@
 from pydantic import BaseModel
+from typing import Optional
+
+class SpriteRef(BaseModel):
+    """Recorte dentro del atlas de sprites (ver app/core/sprites.py)."""
+    atlas: str
+    x: int
+    y: int
+    w: int
+    h: int
 
 class BadgeOut(BaseModel):
     id: int
@@ -8,6 +17,7 @@ class BadgeOut(BaseModel):
     imageUrl: str
     rarityPct: float
     owned: bool
+    sprite: Optional[SpriteRef] = None
 
     class Config:
         from_attributes = True  # pydantic v2
@@ -1,8 +1,15 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional
 
+from app.core.assets import versioned_url
+
 class RankingRow(BaseModel):
     rank: int
     alias: str
     points: int
     avatar_url: Optional[str] = None
+
+    @field_validator("avatar_url")
+    @classmethod
+    def _version_avatar(cls, v: Optional[str]) -> Optional[str]:
+        return versioned_url(v)
@@ -2,6 +2,8 @@ from pydantic import BaseModel, EmailStr, ConfigDict, field_validator
 from typing import Optional, Literal, List
 from datetime import datetime
 
+from app.core.assets import versioned_url
+
 class VakScores(BaseModel):
     visual: int
     auditivo: int
@@ -37,6 +39,12 @@ class UserOut(BaseModel):
     badges: Optional[List[str]] = None
     # IMPORTANTE para devolver ORM:
     model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("avatar_url")
+    @classmethod
+    def _version_avatar(cls, v: Optional[str]) -> Optional[str]:
+        # ?v=<hash> para que el cliente pueda cachearlo sin revalidar
+        return versioned_url(v)
     
 class UserUpdate(BaseModel):
     name: Optional[str] = None
@@ -9,6 +9,12 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "change-me")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+# Token de stream (SSE): solo abre el stream de UNA explicación y dura poco, porque viaja
+# en la URL (EventSource no manda cabeceras) y termina en logs de proxy e historial.
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "300"))
+# la reconexión automática de EventSource reusa la misma URL: con Last-Event-ID se acepta el
+# token ya vencido durante este margen (cubre la generación más larga)
+STREAM_TOKEN_RECONNECT_GRACE_SECONDS = int(os.getenv("STREAM_TOKEN_RECONNECT_GRACE_SECONDS", "1800"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -26,3 +32,22 @@ def create_access_token(subject: str, expires_delta: timedelta | None = None) ->
 
 def decode_access_token(token: str) -> dict:
     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+def create_stream_token(user_id: int, expl_id: str) -> str:
+    # sin "sub": no sirve como token de acceso en get_current_user
+    expire = datetime.now(tz=timezone.utc) + timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    to_encode = {"scope": "stream", "uid": user_id, "eid": expl_id, "exp": expire}
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_stream_token(token: str, expl_id: str, grace: int = 0) -> int:
+    """
+    user_id del token si es de stream, corresponde a `expl_id` y no venció hace más de
+    `grace` segundos; si no, JWTError.
+    """
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    if payload.get("scope") != "stream" or payload.get("eid") != expl_id or not isinstance(payload.get("uid"), int):
+        raise JWTError("token de stream inválido")
+    exp = payload.get("exp")
+    if not isinstance(exp, (int, float)) or datetime.now(tz=timezone.utc).timestamp() > exp + grace:
+        raise JWTError("token de stream vencido")
+    return payload["uid"]
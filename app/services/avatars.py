@@ -0,0 +1,188 @@
+# app/services/avatars.py
+"""
+Avatares subidos por los usuarios.
+- La subida se lee como stream con tope AVATAR_MAX_BYTES (413 al pasarse, sin terminar
+  de recibir el cuerpo) y se valida con Pillow antes de publicarla: formato PNG/JPEG/WebP,
+  dimensiones y píxeles máximos (sin bombas de descompresión).
+- Se conserva el original (avatars/user_7_1700000000.png) y un worker genera miniaturas
+  cuadradas en PNG y WebP por tamaño: avatars/user_7_1700000000.s128.png / .s128.webp
+- Al terminar, avatar_url pasa del original a la miniatura de AVATAR_URL_SIZE, solo si
+  el usuario no cambió de avatar mientras tanto. El ranking muestra 100 avatares: de fotos
+  de varios MB a unos pocos KB cada uno.
+- Un job por usuario: una subida nueva reemplaza a la que seguía en cola (solo importa la
+  última). Con la cola llena, las miniaturas se generan en el mismo request.
+"""
+import io, os, time, logging, threading
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import update
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import Request
+
+from app.core.metrics import metrics
+from app.core.storage import get_store
+from app.services.jobs import JobPool, JobRejected
+
+log = logging.getLogger("avatars")
+
+AVATAR_MAX_BYTES  = int(os.getenv("AVATAR_MAX_BYTES", str(5 * 1024 * 1024)))
+AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", str(40_000_000)))
+AVATAR_MIN_SIDE   = int(os.getenv("AVATAR_MIN_SIDE", "32"))
+AVATAR_SIZES      = tuple(sorted({
+    int(x) for x in os.getenv("AVATAR_SIZES", "64,128,256").split(",") if x.strip().isdigit()
+}))
+AVATAR_URL_SIZE   = int(os.getenv("AVATAR_URL_SIZE", "128"))
+AVATAR_WEBP_QUALITY = int(os.getenv("AVATAR_WEBP_QUALITY", "82"))
+
+# margen para las cabeceras multipart y el campo del nombre de archivo
+_MULTIPART_SLACK = 16 * 1024
+_FORMATS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+
+metrics.describe("avatar_uploads_total", "Subidas de avatar por resultado (ok, too_large, invalid, ...)")
+metrics.describe("avatar_thumbnails_seconds", "Tiempo de generar las miniaturas de un avatar",
+                 buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5))
+
+_jobs = JobPool(
+    "avatars",
+    max_workers=int(os.getenv("AVATAR_JOB_WORKERS", "2")),
+    max_queue=int(os.getenv("AVATAR_JOB_QUEUE", "16")),
+    per_user=1,
+)
+# user_id → (clave, bytes) de la última subida sin procesar; _active: usuarios con job en curso
+_pending: dict[int, tuple[str, bytes]] = {}
+_active: set[int] = set()
+_pending_lock = threading.Lock()
+
+class AvatarError(Exception):
+    """Subida rechazada; `status` es el código HTTP a devolver."""
+    def __init__(self, status: int, detail: str, reason: str):
+        super().__init__(detail)
+        self.status, self.detail, self.reason = status, detail, reason
+
+# ------------------ Recepción ------------------
+async def read_upload(request: Request, field: str = "file") -> bytes:
+    """Lee el archivo `field` del multipart cortando apenas el cuerpo supera el tope."""
+    limit = AVATAR_MAX_BYTES + _MULTIPART_SLACK
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise AvatarError(413, "La imagen supera el tamaño máximo", "too_large")
+
+    async def limited():
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > limit:
+                raise AvatarError(413, "La imagen supera el tamaño máximo", "too_large")
+            yield chunk
+
+    try:
+        form = await MultiPartParser(request.headers, limited(), max_files=1, max_fields=4).parse()
+    except MultiPartException:
+        raise AvatarError(400, "Formulario inválido", "malformed")
+    upload = form.get(field)
+    if upload is None or isinstance(upload, str):
+        raise AvatarError(400, "Falta el archivo", "missing")
+    try:
+        data = await upload.read()
+    finally:
+        await upload.close()
+    if len(data) > AVATAR_MAX_BYTES:
+        raise AvatarError(413, "La imagen supera el tamaño máximo", "too_large")
+    return data
+
+def validate(data: bytes) -> str:
+    """Comprueba que `data` sea una imagen aceptable; devuelve la extensión a usar."""
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            fmt = im.format
+            w, h = im.size
+            if fmt not in _FORMATS:
+                raise AvatarError(415, "Formato no soportado", "format")
+            if w * h > AVATAR_MAX_PIXELS or min(w, h) < AVATAR_MIN_SIDE:
+                raise AvatarError(400, "Dimensiones de imagen no válidas", "dimensions")
+            im.verify()
+    except AvatarError:
+        raise
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        raise AvatarError(415, "El archivo no es una imagen válida", "invalid")
+    return _FORMATS[fmt]
+
+def store_original(user_id: int, data: bytes, stamp: int) -> str:
+    """Valida y publica el original. Devuelve su clave (avatars/user_<id>_<ts><ext>)."""
+    ext = validate(data)
+    key = f"avatars/user_{user_id}_{stamp}{ext}"
+    get_store().put_bytes(key, data)
+    return key
+
+# ------------------ Miniaturas ------------------
+def thumb_key(key: str, size: int, fmt: str) -> str:
+    stem = key.rsplit(".", 1)[0]
+    return f"{stem}.s{size}.{fmt}"
+
+def _square(im: Image.Image, size: int) -> Image.Image:
+    side = min(size, im.width, im.height)  # no se agranda una imagen chica
+    return ImageOps.fit(im, (side, side), Image.Resampling.LANCZOS)
+
+def make_thumbnails(user_id: int, key: str, data: bytes):
+    from app.db import SessionLocal
+    from app.models.user import User
+
+    t0 = time.perf_counter()
+    store = get_store()
+    with Image.open(io.BytesIO(data)) as src:
+        im = ImageOps.exif_transpose(src)  # fotos del celular vienen rotadas por EXIF
+        im = im.convert("RGBA" if im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info else "RGB")
+    for size in AVATAR_SIZES:
+        th = _square(im, size)
+        with store.writer(thumb_key(key, size, "png")) as tmp:
+            th.save(tmp, format="PNG", optimize=True)
+        with store.writer(thumb_key(key, size, "webp")) as tmp:
+            th.save(tmp, format="WEBP", quality=AVATAR_WEBP_QUALITY, method=4)
+    metrics.observe("avatar_thumbnails_seconds", time.perf_counter() - t0)
+
+    size = min(AVATAR_SIZES, key=lambda s: abs(s - AVATAR_URL_SIZE))
+    with SessionLocal() as db:
+        db.execute(
+            update(User)
+            .where(User.id == user_id, User.avatar_url == store.ref(key))
+            .values(avatar_url=store.ref(thumb_key(key, size, "png")))
+        )
+        db.commit()
+
+def _thumbnails_worker(user_id: int):
+    """Procesa la última subida del usuario; si llegó otra mientras tanto, sigue con esa."""
+    while True:
+        with _pending_lock:
+            item = _pending.pop(user_id, None)
+            if item is None:
+                _active.discard(user_id)
+                return
+        try:
+            make_thumbnails(user_id, *item)
+        except Exception as e:
+            log.exception("avatar thumbnails failed (%s): %s", item[0], e)
+
+def enqueue_thumbnails(user_id: int, key: str, data: bytes) -> bool:
+    """
+    Encola las miniaturas (reemplaza a una subida anterior del usuario aún en cola).
+    Sin lugar en la cola las genera aquí mismo: llamar fuera del event loop.
+    """
+    if not AVATAR_SIZES:
+        return False
+    with _pending_lock:
+        _pending[user_id] = (key, data)
+        if user_id in _active:
+            return True  # el job en curso la toma al terminar la anterior
+        try:
+            _jobs.submit(f"user-{user_id}", user_id, _thumbnails_worker, user_id)
+            _active.add(user_id)
+            return True
+        except JobRejected as e:
+            del _pending[user_id]
+            reason = e.reason
+    log.warning("avatar thumbnails not queued (%s): %s, generating inline", key, reason)
+    try:
+        make_thumbnails(user_id, key, data)
+    except Exception as e:
+        log.exception("avatar thumbnails failed (%s): %s", key, e)
+    return False
@@ -0,0 +1,63 @@
+import asyncio, threading, time
+from typing import Any
+
+class EventBroker:
+    """
+    Pub/sub en proceso por canal (p.ej. id de explicación).
+    - publish() se puede llamar desde cualquier hilo (workers en background).
+    - subscribe() se llama desde el event loop (endpoints async / SSE).
+    Guarda el historial del canal mientras está vivo, para que un suscriptor
+    tardío reciba también lo publicado antes de conectarse.
+    """
+
+    def __init__(self, history_ttl_sec: float = 120.0):
+        self._lock = threading.Lock()
+        self._subs: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._history: dict[str, list[dict]] = {}
+        self._closed_at: dict[str, float] = {}
+        self._ttl = history_ttl_sec
+
+    def reset(self, channel: str):
+        """Olvida el historial (p.ej. al regenerar desde cero)."""
+        with self._lock:
+            self._history.pop(channel, None)
+            self._closed_at.pop(channel, None)
+
+    def publish(self, channel: str, event: dict[str, Any], final: bool = False):
+        with self._lock:
+            self._gc()
+            self._history.setdefault(channel, []).append(event)
+            if final:
+                self._closed_at[channel] = time.monotonic()
+            subs = list(self._subs.get(channel, ()))
+        for loop, q in subs:
+            try:
+                loop.call_soon_threadsafe(q.put_nowait, event)
+            except RuntimeError:
+                # loop cerrado: el suscriptor ya no existe
+                pass
+
+    def subscribe(self, channel: str) -> tuple[asyncio.Queue, list[dict]]:
+        """Devuelve (cola de eventos nuevos, historial previo) de forma atómica."""
+        q: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subs.setdefault(channel, set()).add((loop, q))
+            history = list(self._history.get(channel, ()))
+        return q, history
+
+    def unsubscribe(self, channel: str, q: asyncio.Queue):
+        with self._lock:
+            subs = self._subs.get(channel)
+            if not subs:
+                return
+            for entry in [e for e in subs if e[1] is q]:
+                subs.discard(entry)
+            if not subs:
+                del self._subs[channel]
+
+    def _gc(self):
+        now = time.monotonic()
+        for ch in [c for c, ts in self._closed_at.items() if now - ts > self._ttl]:
+            self._closed_at.pop(ch, None)
+            self._history.pop(ch, None)
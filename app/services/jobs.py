@@ -0,0 +1,94 @@
+import threading, logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+log = logging.getLogger("jobs")
+
+class JobRejected(Exception):
+    """El pool no admite el trabajo (cola llena o límite por usuario)."""
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class JobPool:
+    """
+    Ejecutor de tamaño fijo para trabajos en background.
+    - max_workers: hilos que ejecutan a la vez.
+    - max_queue:   trabajos en espera además de los que se están ejecutando.
+    - per_user:    trabajos (en cola + ejecutando) permitidos por usuario.
+    Un mismo `key` no se encola dos veces mientras siga vivo.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, per_user: int):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.per_user = max(1, int(per_user))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._keys: set[str] = set()
+        self._by_user: Counter = Counter()
+        self._running = 0
+
+    def submit(self, key: str, user_id: int | None, fn: Callable[..., Any], *args) -> bool:
+        """
+        Encola fn(*args). Devuelve False si `key` ya está en cola/ejecución.
+        Lanza JobRejected si se supera la profundidad de cola o el límite del usuario.
+        """
+        with self._lock:
+            if key in self._keys:
+                return False
+            if len(self._keys) >= self.max_workers + self.max_queue:
+                raise JobRejected("queue_full")
+            if user_id is not None and self._by_user[user_id] >= self.per_user:
+                raise JobRejected("user_limit")
+            self._keys.add(key)
+            if user_id is not None:
+                self._by_user[user_id] += 1
+        try:
+            self._executor.submit(self._run, key, user_id, fn, args)
+        except Exception:
+            self._release(key, user_id)
+            raise
+        return True
+
+    def _run(self, key: str, user_id: int | None, fn: Callable[..., Any], args: tuple):
+        with self._lock:
+            self._running += 1
+        try:
+            fn(*args)
+        except Exception as e:
+            # el trabajo ya debería manejar sus errores; esto evita perder el hilo en silencio
+            log.exception("[%s] job %s failed: %s", self.name, key, e)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._release(key, user_id)
+
+    def _release(self, key: str, user_id: int | None):
+        with self._lock:
+            self._keys.discard(key)
+            if user_id is not None:
+                self._by_user[user_id] -= 1
+                if self._by_user[user_id] <= 0:
+                    del self._by_user[user_id]
+
+    def is_active(self, key: str) -> bool:
+        with self._lock:
+            return key in self._keys
+
+    def active_keys(self) -> list[str]:
+        """Claves en cola o en ejecución en este proceso."""
+        with self._lock:
+            return list(self._keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queued": len(self._keys) - self._running,
+                "maxQueue": self.max_queue,
+                "perUser": self.per_user,
+            }
@@ -0,0 +1,260 @@
+# app/services/storage_gc.py
+"""
+Recolección de basura de archivos generados (app/static/tts, gen, generated).
+1) Conjunto vivo: URLs referenciadas desde user_topics (cached_*), topic_sessions.items
+   y el payload de assistant_explanations / assistant_artifacts (imageUrl / audioUrl).
+2) Se borran los no referenciados con más de STORAGE_GC_GRACE_SEC de antigüedad; el
+   margen cubre archivos recién escritos cuya fila todavía no se guardó.
+3) Si el total supera STORAGE_GC_QUOTA_MB se desaloja por último uso (LRU): primero lo
+   no referenciado (respetando el margen), después lo que solo cachea user_topics (se
+   limpia la columna y se regenera en la próxima apertura). Lo que referencian sesiones
+   o explicaciones del asistente no se toca.
+Las figuras compartidas (frac-*, pct-*, expl-*, figure-generic) son un conjunto acotado
+que se precalcula al arrancar: no se borran. Las variantes (_v/) siguen a su original.
+Un lock de archivo evita que dos workers recolecten a la vez.
+Solo aplica al almacenamiento local (con shards, rglob los recorre igual); con S3 la
+expiración se delega a las reglas de ciclo de vida del bucket.
+"""
+import os, re, time, logging, threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    import fcntl  # solo POSIX
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core import assets, image_variants
+from app.core.metrics import metrics
+from app.core.storage import LocalStore, get_store
+from app.core.settings_static import TTS_DIR, GEN_DIR, STATIC_GENERATED_DIR, REPO_ROOT
+from app.models.user_topic import UserTopic
+from app.models.topic_session import TopicSession
+from app.models.assistant_explanation import AssistantExplanation
+from app.models.assistant_artifact import AssistantArtifact
+
+log = logging.getLogger("storage_gc")
+
+STORAGE_GC_ENABLED      = os.getenv("STORAGE_GC", "1") == "1"
+STORAGE_GC_INTERVAL_SEC = int(os.getenv("STORAGE_GC_INTERVAL_SEC", str(6 * 3600)))
+STORAGE_GC_GRACE_SEC    = int(os.getenv("STORAGE_GC_GRACE_SEC", str(24 * 3600)))
+STORAGE_GC_QUOTA_MB     = int(os.getenv("STORAGE_GC_QUOTA_MB", "2048"))
+STORAGE_GC_LOCK         = Path(os.getenv("STORAGE_GC_LOCK", REPO_ROOT / ".cache" / "storage-gc.lock")).resolve()
+
+GC_DIRS = (TTS_DIR, GEN_DIR, STATIC_GENERATED_DIR)
+
+_SHARED_RE = re.compile(r"^(?:frac-\d+-\d+|pct-\d+|expl-[a-z0-9-]+-(?:frac|pct)(?:-\d+)+|figure-generic)\.png$")
+_URL_KEYS = ("imageUrl", "audioUrl")
+
+metrics.describe("storage_gc_deleted_total", "Archivos generados borrados por el GC, por motivo")
+metrics.describe("storage_gc_bytes", "Bytes en los directorios de archivos generados tras el último GC")
+
+@dataclass
+class _File:
+    path: Path
+    size: int
+    mtime: float
+    used: float                      # último uso: max(atime, mtime)
+    variants: list = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.size + sum(v.size for v in self.variants)
+
+# ------------------ Conjunto vivo ------------------
+def _path_for(url: str | None) -> Path | None:
+    if not url or not isinstance(url, str):
+        return None
+    # URLs absolutas (PUBLIC_BACKEND_ORIGIN) y con ?v= → solo la ruta
+    return assets.path_for_url(urlsplit(url.strip()).path)
+
+def _walk_urls(obj, out: set):
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if k in _URL_KEYS:
+                p = _path_for(v)
+                if p is not None:
+                    out.add(p)
+            else:
+                _walk_urls(v, out)
+    elif isinstance(obj, list):
+        for v in obj:
+            _walk_urls(v, out)
+
+def live_set(db: Session) -> tuple[set[Path], dict[Path, list[tuple[int, str, str]]]]:
+    """
+    (referencias fijas, referencias de caché de user_topics → [(id, columna, url)]).
+    Lo fijo no se borra nunca; lo de caché se puede desalojar limpiando la columna.
+    """
+    hard: set[Path] = set()
+    soft: dict[Path, list[tuple[int, str, str]]] = {}
+
+    rows = db.execute(
+        select(UserTopic.id, UserTopic.cached_expl_audio_url, UserTopic.cached_visual_image_url)
+        .execution_options(yield_per=1000)
+    )
+    for ut_id, audio, image in rows:
+        for col, url in (("cached_expl_audio_url", audio), ("cached_visual_image_url", image)):
+            p = _path_for(url)
+            if p is not None:
+                soft.setdefault(p, []).append((ut_id, col, url))
+
+    for stmt in (
+        select(TopicSession.items),
+        select(AssistantExplanation.payload),
+        select(AssistantArtifact.payload),
+    ):
+        for (data,) in db.execute(stmt.execution_options(yield_per=500)):
+            _walk_urls(data, hard)
+    return hard, soft
+
+# ------------------ Archivos ------------------
+def _stat(p: Path) -> _File | None:
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    return _File(p, st.st_size, st.st_mtime, max(st.st_atime, st.st_mtime))
+
+def _scan() -> tuple[list[_File], list[_File], list[_File]]:
+    """(originales, variantes huérfanas, temporales abandonados)."""
+    sources: dict[Path, _File] = {}
+    variants: list[tuple[Path, _File]] = []
+    temps: list[_File] = []
+    for root in GC_DIRS:
+        if not root.exists():
+            continue
+        for p in root.rglob("*"):
+            if not p.is_file():
+                continue
+            f = _stat(p)
+            if f is None:
+                continue
+            if p.name.startswith(".") and p.name.endswith(".tmp"):
+                temps.append(f)
+            elif p.parent.name == image_variants.VARIANT_DIR:
+                variants.append((p, f))
+            else:
+                sources[p] = f
+
+    by_stem: dict[tuple[Path, str], _File] = {(p.parent, p.stem): f for p, f in sources.items()}
+    orphans: list[_File] = []
+    for p, f in variants:
+        stem = p.name.split(".", 1)[0]  # <stem>.<w640|full>.<fmt>
+        owner = by_stem.get((p.parent.parent, stem))
+        if owner is None:
+            orphans.append(f)
+        else:
+            owner.variants.append(f)
+    return list(sources.values()), orphans, temps
+
+def _delete(f: _File, reason: str, dry_run: bool) -> int:
+    freed = 0
+    for x in [f, *f.variants]:
+        if not dry_run:
+            try:
+                x.path.unlink(missing_ok=True)
+            except OSError as e:
+                log.warning("storage gc: cannot delete %s: %r", x.path, e)
+                continue
+        freed += x.size
+    metrics.inc("storage_gc_deleted_total", reason=reason)
+    return freed
+
+# ------------------ GC ------------------
+def collect(db: Session, dry_run: bool = False, now: float | None = None) -> dict:
+    now = now or time.time()
+    grace_cutoff = now - STORAGE_GC_GRACE_SEC
+    quota = STORAGE_GC_QUOTA_MB * 1024 * 1024
+
+    hard, soft = live_set(db)
+    files, orphans, temps = _scan()
+    stats = {"files": len(files), "referenced": 0, "unreferencedDeleted": 0, "orphanVariants": 0,
+             "tempFiles": 0, "evicted": 0, "cacheRefsCleared": 0, "freedBytes": 0, "dryRun": dry_run}
+
+    for f in orphans:
+        stats["freedBytes"] += _delete(f, "orphan_variant", dry_run); stats["orphanVariants"] += 1
+    for f in temps:
+        if f.mtime < grace_cutoff:
+            stats["freedBytes"] += _delete(f, "temp", dry_run); stats["tempFiles"] += 1
+
+    kept: list[_File] = []
+    young_unref: list[_File] = []
+    cached_only: list[_File] = []
+    for f in files:
+        if f.path in hard:
+            stats["referenced"] += 1
+            kept.append(f)
+        elif _SHARED_RE.match(f.path.name):
+            kept.append(f)
+        elif f.path in soft:
+            stats["referenced"] += 1
+            cached_only.append(f)
+        elif f.mtime < grace_cutoff:
+            stats["freedBytes"] += _delete(f, "unreferenced", dry_run); stats["unreferencedDeleted"] += 1
+        else:
+            young_unref.append(f)
+
+    total = sum(f.total for f in kept + young_unref + cached_only)
+    if total > quota:
+        # LRU: primero lo no referenciado (ya pasado el margen no queda nada), luego lo cacheado
+        ut_refs: list[tuple[int, str, str]] = []
+        for f in sorted(cached_only, key=lambda x: x.used):
+            if total <= quota:
+                break
+            if f.mtime >= grace_cutoff:
+                continue
+            freed = _delete(f, "quota", dry_run)
+            total -= freed; stats["freedBytes"] += freed; stats["evicted"] += 1
+            ut_refs.extend(soft[f.path])
+        if ut_refs and not dry_run:
+            for ut_id, col, url in ut_refs:
+                # solo si la columna no cambió desde que se leyó
+                column = getattr(UserTopic, col)
+                db.execute(update(UserTopic).where(UserTopic.id == ut_id, column == url).values({col: None}))
+            db.commit()
+        stats["cacheRefsCleared"] = len(ut_refs)
+        if total > quota:
+            log.warning("storage gc: %.1f MB still above quota %d MB (referenced files are kept)",
+                        total / 1048576, STORAGE_GC_QUOTA_MB)
+
+    stats["bytes"] = total
+    metrics.set_gauge("storage_gc_bytes", total)
+    log.info("storage gc: %s", stats)
+    return stats
+
+def run_once(dry_run: bool = False) -> dict | None:
+    """Corre el GC si ningún otro proceso lo está haciendo (None si el lock está tomado)."""
+    from app.db import SessionLocal
+    if not isinstance(get_store(), LocalStore):
+        log.info("storage gc: backend %s is not local, skipping", get_store().name)
+        return None
+    STORAGE_GC_LOCK.parent.mkdir(parents=True, exist_ok=True)
+    with open(STORAGE_GC_LOCK, "a") as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+        try:
+            with SessionLocal() as db:
+                return collect(db, dry_run=dry_run)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def start_gc_loop():
+    """Hilo daemon: primera pasada a los pocos minutos del arranque, luego cada intervalo."""
+    def _loop():
+        time.sleep(min(300, STORAGE_GC_INTERVAL_SEC))
+        while True:
+            try:
+                run_once()
+            except Exception as e:
+                log.warning("storage gc failed: %r", e)
+            time.sleep(STORAGE_GC_INTERVAL_SEC)
+    threading.Thread(target=_loop, name="storage-gc", daemon=True).start()
@@ -0,0 +1,102 @@
+"""
+Compara el render raster de figuras (app/core/raster.py) con el dibujo anterior,
+celda a celda con ImageFont.truetype("arial.ttf") en cada llamada.
+Uso:  python scripts/bench_figures.py [repeticiones]
+"""
+import sys, io, time
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path: sys.path.insert(0, str(ROOT))
+
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+
+from app.core import raster
+
+# ------------- versión anterior (referencia) -------------
+def legacy_fraction_bar(n: int, d: int, size=(1200, 400)) -> Image.Image:
+    w, h = size
+    img = Image.new("RGB", size, color=(255,255,255))
+    draw = ImageDraw.Draw(img)
+    margin, gap = 40, 8
+    cell_h = 140
+    y = h//2 - cell_h//2
+    den = max(1, d)
+    cell_w = (w - 2*margin - (den-1)*gap) / den
+
+    draw.rounded_rectangle([20, 20, w-20, h-20], radius=24, outline=(229,231,235), width=2, fill=(255,255,255))
+
+    for k in range(den):
+        x = margin + k*(cell_w+gap)
+        fill = (96,165,250) if k < n else (229,231,235)
+        draw.rectangle([x, y, x+cell_w, y+cell_h], fill=fill, outline=(31,41,55), width=2)
+
+    label = f"{max(0,min(n,den))}/{den}"
+    try:
+        font = ImageFont.truetype("arial.ttf", 48)
+    except:
+        font = None
+    tw, th = (draw.textbbox((0,0), label, font=font)[2:] if font else (len(label)*20, 40))
+    draw.text(((w-tw)/2, y+cell_h+24), label, fill=(17,24,39), font=font)
+    return img
+
+def legacy_percent_grid(percent: int, size=(1200, 400)) -> Image.Image:
+    """Rejilla 10×10; sombrea `percent` celdas (por filas)."""
+    percent = max(0, min(100, percent))
+    w, h = size
+    img = Image.new("RGB", size, color=(255,255,255))
+    draw = ImageDraw.Draw(img)
+
+    draw.rounded_rectangle([20, 20, w-20, h-20], radius=24, outline=(229,231,235), width=2, fill=(255,255,255))
+
+    grid_w, grid_h = w - 120, h - 180
+    left, top = 60, 140
+    cols = rows = 10
+    gap = 2
+    cw = (grid_w - (cols-1)*gap) / cols
+    ch = (grid_h - (rows-1)*gap) / rows
+
+    filled = round(percent)  # número de celdas a sombrear
+    k = 0
+    for r in range(rows):
+        for c in range(cols):
+            x = left + c*(cw+gap)
+            y = top  + r*(ch+gap)
+            fill = (96,165,250) if k < filled else (229,231,235)
+            draw.rectangle([x, y, x+cw, y+ch], fill=fill, outline=(31,41,55), width=2)
+            k += 1
+    return img
+
+# ------------- medición -------------
+CASES = [("frac", (n, d)) for d in (2, 3, 4, 5, 8, 10, 12) for n in range(0, d + 1, max(1, d // 3))] \
+      + [("pct", (p,)) for p in range(0, 101, 7)]
+
+def _run(fns, reps: int, encode: bool) -> float:
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        for kind, args in CASES:
+            img = fns[kind](*args)
+            if encode:
+                img.save(io.BytesIO(), "PNG")
+    return (time.perf_counter() - t0) / (reps * len(CASES)) * 1000
+
+def main() -> int:
+    reps = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    old = {"frac": legacy_fraction_bar, "pct": legacy_percent_grid}
+    new = {"frac": raster.render_fraction_bar, "pct": raster.render_percent_grid}
+    for kind, args in CASES:  # calienta plantillas y fuentes
+        new[kind](*args)
+
+    diff = max(
+        float(np.mean(np.asarray(old[k](*a), dtype=np.int16) != np.asarray(new[k](*a), dtype=np.int16)))
+        for k, a in CASES if k == "pct"
+    )
+    print(f"{len(CASES)} figuras x {reps} repeticiones (ms por figura)")
+    for label, encode in (("solo dibujo", False), ("dibujo + PNG", True)):
+        t_old, t_new = _run(old, reps, encode), _run(new, reps, encode)
+        print(f"  {label:13s} anterior {t_old:7.2f}   nuevo {t_new:7.2f}   x{t_old / t_new:.1f}")
+    print(f"  rejilla: {diff:.2%} de píxeles distintos frente a la versión anterior (máx.)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
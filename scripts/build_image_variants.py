@@ -0,0 +1,31 @@
+"""
+Pregenera las variantes WebP/PNG (app/core/image_variants.py) de las imágenes de
+static/ (covers, avatars, badges) para que el primer request no pague la codificación.
+Uso:  python scripts/build_image_variants.py [png]
+"""
+import sys, time
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path: sys.path.insert(0, str(ROOT))
+
+from app.core import image_variants
+from app.core.settings_static import MEDIA_DIR
+
+def main() -> int:
+    formats = ("webp", "png") if "png" in sys.argv[1:] else ("webp",)
+    total_src = total_out = 0
+    for src in sorted(MEDIA_DIR.rglob("*")):
+        if src.suffix.lower() not in image_variants.SOURCE_SUFFIXES or image_variants.is_variant(src.relative_to(MEDIA_DIR).as_posix()):
+            continue
+        t0 = time.perf_counter()
+        image_variants.write_variants(src, formats=formats)
+        full = image_variants.variant_path(src, "webp", 0)
+        size, out = src.stat().st_size, full.stat().st_size
+        total_src += size; total_out += out
+        print(f"{src.relative_to(MEDIA_DIR)}  {size // 1024} KB → webp {out // 1024} KB  ({time.perf_counter() - t0:.1f}s)")
+    if total_out:
+        print(f"total: {total_src // 1024} KB → {total_out // 1024} KB (x{total_src / total_out:.1f})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+Arma los atlas de sprites (app/core/sprites.py) de insignias y avatares de stock,
+para que el primer request no pague el empaquetado. Correr tras agregar o cambiar imágenes.
+Uso:  python scripts/build_sprites.py [grupo ...]
+"""
+import sys, time
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path: sys.path.insert(0, str(ROOT))
+
+from app.core import sprites
+
+def main() -> int:
+    groups = sys.argv[1:] or list(sprites.SPRITE_GROUPS)
+    for group in groups:
+        if group not in sprites.SPRITE_GROUPS:
+            print(f"grupo desconocido: {group} (opciones: {', '.join(sprites.SPRITE_GROUPS)})")
+            return 1
+        t0 = time.perf_counter()
+        m = sprites.build(group)
+        png = sprites.SPRITE_DIR / f"{group}.png"
+        print(f"{group}: {len(m['sprites'])} imágenes, {m['width']}x{m['height']}, "
+              f"{png.stat().st_size // 1024} KB ({time.perf_counter() - t0:.1f}s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
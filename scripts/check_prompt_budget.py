@@ -0,0 +1,43 @@
+"""
+Comprueba que los prompts de cada tema no superan PROMPT_BUDGETS (app/ai/prompts.py).
+Uso:  python scripts/check_prompt_budget.py        → sale con código 1 si alguno se pasa
+"""
+import sys, json
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path: sys.path.insert(0, str(ROOT))
+
+from app.ai import prompts
+
+STYLES = ("visual", "auditivo", "kinestesico")
+
+def build_all(ctx: dict):
+    for style in STYLES:
+        yield f"exercises/{style}", "exercises", prompts.build_exercises_prompt(ctx, style, list(range(1, 11)))
+        if style != "kinestesico":
+            yield f"assistant/{style}", "assistant", prompts.build_assistant_prompt(ctx, style)
+    yield "explanation", "explanation", prompts.build_explanation_prompt(ctx)
+
+def main() -> int:
+    files = sorted((ROOT / "content").glob("grade-*/*.json"))
+    if not files:
+        print("No hay temas en content/")
+        return 1
+    failed = 0
+    for f in files:
+        ctx = json.loads(f.read_text(encoding="utf-8"))
+        full = len(json.dumps(ctx, ensure_ascii=False).encode("utf-8"))
+        print(f"{f.relative_to(ROOT)}  (context_json completo: {full} B)")
+        for label, task, text in build_all(ctx):
+            size = len(text.encode("utf-8"))
+            budget = prompts.PROMPT_BUDGETS[task]
+            mark = "OK " if size <= budget else "MAL"
+            failed += size > budget
+            print(f"  {mark} {label:<22} {size:>6} B  ~{prompts.estimate_tokens(text):>5} tok  (máx {budget} B)")
+    if failed:
+        print(f"{failed} prompt(s) por encima del presupuesto")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Servidor local que imita los endpoints externos que usa el backend, para pruebas
+de carga y de caminos de fallback sin tocar Gemini ni Google Cloud TTS.
+
+Endpoints:
+  POST /v1beta/models/{model}:generateContent        (Gemini)
+  POST /v1beta/models/{model}:streamGenerateContent  (Gemini; ?alt=sse → SSE, si no array JSON)
+  POST /v1/text:synthesize                           (Cloud TTS REST, LINEAR16 en base64)
+  POST /ai/tts                                       (nuestro /ai/tts: devuelve WAV)
+  GET  /standin/stats   · POST /standin/config       (contadores y cambio de parámetros en caliente)
+
+Uso:
+  python scripts/genai_standin.py --port 8790 --latency lognormal:0.8,0.5 --error-rate 0.02 --rate-429 0.05
+  # y en el backend:
+  GEMINI_BASE_URL=http://127.0.0.1:8790/v1beta/models
+  TTS_ENDPOINT=http://127.0.0.1:8790/ai/tts
+  TTS_API_ENDPOINT=http://127.0.0.1:8790
+
+Grabar respuestas reales y reproducirlas después:
+  python scripts/genai_standin.py --record rec/ --upstream https://generativelanguage.googleapis.com
+  python scripts/genai_standin.py --replay rec/ [--strict]
+
+Latencias: "0", "fixed:S", "uniform:A,B", "exp:MEDIA", "lognormal:MEDIANA,SIGMA" (segundos).
+"""
+import io, json, math, wave, zlib, struct, base64, random, hashlib, asyncio, argparse
+from collections import Counter
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# ------------------ Configuración ------------------
+class Config:
+    latency = "0"
+    tts_latency = "0"
+    error_rate = 0.0
+    rate_429 = 0.0
+    retry_after = 1
+    replay_dir: Path | None = None
+    record_dir: Path | None = None
+    upstream = ""
+    strict = False
+
+cfg = Config()
+stats: Counter = Counter()
+rng = random.Random()
+
+def sample_latency(spec: str) -> float:
+    spec = (spec or "0").strip()
+    if spec in ("", "0"):
+        return 0.0
+    kind, _, args = spec.partition(":")
+    a = [float(x) for x in args.split(",") if x.strip()]
+    if kind == "fixed":
+        return a[0]
+    if kind == "uniform":
+        return rng.uniform(a[0], a[1])
+    if kind == "exp":
+        return rng.expovariate(1.0 / a[0])
+    if kind == "lognormal":
+        return rng.lognormvariate(math.log(a[0]), a[1] if len(a) > 1 else 0.5)
+    raise ValueError(f"latencia desconocida: {spec}")
+
+async def fault(endpoint: str, latency_spec: str) -> Response | None:
+    """Aplica latencia y, con la probabilidad configurada, devuelve un 429/503."""
+    stats[f"{endpoint}.requests"] += 1
+    await asyncio.sleep(sample_latency(latency_spec))
+    r = rng.random()
+    if r < cfg.rate_429:
+        stats[f"{endpoint}.429"] += 1
+        return JSONResponse(
+            {"error": {"code": 429, "message": "Resource has been exhausted (stand-in)", "status": "RESOURCE_EXHAUSTED"}},
+            status_code=429, headers={"Retry-After": str(cfg.retry_after)},
+        )
+    if r < cfg.rate_429 + cfg.error_rate:
+        stats[f"{endpoint}.503"] += 1
+        return JSONResponse(
+            {"error": {"code": 503, "message": "The model is overloaded (stand-in)", "status": "UNAVAILABLE"}},
+            status_code=503,
+        )
+    return None
+
+# ------------------ Record / replay ------------------
+def _rec_key(path: str, body: dict) -> str:
+    canon = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{path}\0{canon}".encode("utf-8")).hexdigest()
+
+def replay(path: str, body: dict) -> dict | None:
+    if not cfg.replay_dir:
+        return None
+    f = cfg.replay_dir / f"{_rec_key(path, body)}.json"
+    if not f.exists():
+        stats["replay.miss"] += 1
+        return None
+    stats["replay.hit"] += 1
+    return json.loads(f.read_text(encoding="utf-8"))
+
+async def record(path: str, query: str, body: dict) -> dict:
+    import httpx
+    url = cfg.upstream.rstrip("/") + path + (f"?{query}" if query else "")
+    async with httpx.AsyncClient(timeout=120) as client:
+        r = await client.post(url, json=body)
+    rec = {"status": r.status_code, "body": r.json() if r.content else None}
+    if r.status_code == 200:
+        cfg.record_dir.mkdir(parents=True, exist_ok=True)
+        (cfg.record_dir / f"{_rec_key(path, body)}.json").write_text(
+            json.dumps(rec, ensure_ascii=False), encoding="utf-8")
+        stats["record.saved"] += 1
+    return rec
+
+# ------------------ Respuestas sintéticas ------------------
+def _tiny_png(w: int = 64, h: int = 32, rgb=(120, 160, 220)) -> bytes:
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    row = b"\x00" + bytes(rgb) * w
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * h))
+            + chunk(b"IEND", b""))
+
+def _fake_exercises(types: list[str]) -> list[dict]:
+    out = []
+    for i in range(10):
+        t = types[i % len(types)]
+        n, d = rng.randint(1, 8), rng.randint(9, 12)
+        if t == "multiple_choice":
+            choices = [f"{n}/{d}", f"{n+1}/{d}", f"{n}/{d-1}", f"{d}/{n}"]
+            out.append({"type": t, "question": f"¿Qué fracción representa {n} de {d} partes?",
+                        "choices": choices, "correct_index": 0, "explain": "Numerador = partes tomadas."})
+        elif t == "match_pairs":
+            out.append({"type": t, "title": "Empareja", "explain": "Relaciona cada fracción.",
+                        "pairs": [{"left": f"{k}/{d}", "right": f"{k} de {d}"} for k in range(1, 4)]})
+        else:
+            items = [f"{n}/{d}", f"{d}/{n}", f"{n}/{d+1}", f"{d+1}/{n}"]
+            out.append({"type": t, "title": "Propias o impropias", "explain": "Compara numerador y denominador.",
+                        "items": items, "buckets": ["Propias", "Impropias"],
+                        "solution": [{"bucket": "Propias", "items": [items[0], items[2]]},
+                                     {"bucket": "Impropias", "items": [items[1], items[3]]}]})
+    return out
+
+def fake_generate(model: str, body: dict) -> dict:
+    prompt = " ".join(p.get("text", "") for c in (body.get("contents") or []) for p in (c.get("parts") or []))
+    gc = body.get("generationConfig") or {}
+    if "image" in model:
+        parts = [{"inlineData": {"mimeType": "image/png", "data": base64.b64encode(_tiny_png()).decode()}}]
+    elif gc.get("responseSchema"):
+        enum = (((gc["responseSchema"].get("items") or {}).get("properties") or {}).get("type") or {}).get("enum")
+        parts = [{"text": json.dumps(_fake_exercises(enum or ["multiple_choice"]), ensure_ascii=False)}]
+    elif '"paragraphs"' in prompt:
+        paras = [{"text": f"Párrafo {i+1} de prueba: una fracción indica partes iguales de un todo."} for i in range(4)]
+        exs = [{"title": "Ejemplo 1", "text": "1/2 de 8 es 4: divide 8 entre 2."}]
+        parts = [{"text": json.dumps({"paragraphs": paras, "examples": exs}, ensure_ascii=False)}]
+    else:
+        parts = [{"text": "Explicación de prueba. Una fracción tiene numerador y denominador. "
+                          "El denominador dice en cuántas partes se divide el todo."}]
+    ptoks = max(1, len(prompt) // 4)
+    otoks = sum(len(p.get("text", "")) // 4 for p in parts) or 258
+    return {
+        "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": ptoks, "candidatesTokenCount": otoks, "totalTokenCount": ptoks + otoks},
+        "modelVersion": model,
+    }
+
+def _tone_pcm(text: str, sr: int = 24000) -> bytes:
+    dur = min(10.0, max(0.3, 0.06 * len(text or "")))
+    n = int(sr * dur)
+    return b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / sr))) for i in range(n))
+
+def _wav(pcm: bytes, sr: int = 24000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1); wf.setsampwidth(2); wf.setframerate(sr)
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+# ------------------ App ------------------
+app = FastAPI(title="GenAI stand-in")
+
+async def _generate(model: str, body: dict, path: str, query: str) -> tuple[int, dict]:
+    rec = replay(path, body)
+    if rec is not None:
+        return rec["status"], rec["body"]
+    if cfg.record_dir and cfg.upstream:
+        rec = await record(path, query, body)
+        return rec["status"], rec["body"]
+    if cfg.strict and cfg.replay_dir:
+        return 404, {"error": {"code": 404, "message": "sin grabación para esta petición (stand-in --strict)"}}
+    return 200, fake_generate(model, body)
+
+@app.post("/v1beta/models/{model_action}")
+async def models_action(model_action: str, request: Request):
+    model, _, action = model_action.partition(":")
+    body = await request.json()
+    endpoint = action or "unknown"
+    if (resp := await fault(endpoint, cfg.latency)) is not None:
+        return resp
+    # para grabar/reproducir, la clave ignora la api key
+    query = str(request.query_params)
+    status, data = await _generate(model, body, request.url.path, query)
+
+    if action == "generateContent" or status != 200:
+        return JSONResponse(data, status_code=status)
+    if action != "streamGenerateContent":
+        return JSONResponse({"error": {"code": 404, "message": f"acción no soportada: {action}"}}, status_code=404)
+
+    # divide el texto en trozos para simular el streaming de Gemini
+    parts = ((data.get("candidates") or [{}])[0].get("content") or {}).get("parts") or []
+    text = "".join(p.get("text", "") for p in parts)
+    step = max(1, len(text) // 3)
+    chunks = [text[i:i + step] for i in range(0, len(text), step)] or [""]
+
+    def piece(t: str, last: bool) -> dict:
+        c = {"candidates": [{"content": {"role": "model", "parts": [{"text": t}]}, "index": 0}]}
+        if last:
+            c["candidates"][0]["finishReason"] = "STOP"
+            c["usageMetadata"] = data.get("usageMetadata")
+        return c
+
+    sse = request.query_params.get("alt") == "sse"
+
+    async def gen():
+        if not sse:
+            yield "["
+        for i, t in enumerate(chunks):
+            if i:
+                await asyncio.sleep(sample_latency(cfg.latency) / 4)
+            payload = json.dumps(piece(t, i == len(chunks) - 1), ensure_ascii=False)
+            yield f"data: {payload}\r\n\r\n" if sse else (("," if i else "") + payload)
+        if not sse:
+            yield "]"
+
+    return StreamingResponse(gen(), media_type="text/event-stream" if sse else "application/json")
+
+@app.post("/v1/text:synthesize")
+async def cloud_tts(request: Request):
+    body = await request.json()
+    if (resp := await fault("synthesize", cfg.tts_latency)) is not None:
+        return resp
+    text = ((body.get("input") or {}).get("text") or (body.get("input") or {}).get("ssml") or "")
+    sr = int((body.get("audioConfig") or {}).get("sampleRateHertz") or 24000)
+    audio = _wav(_tone_pcm(text, sr), sr)  # LINEAR16 de GC TTS trae cabecera RIFF
+    return {"audioContent": base64.b64encode(audio).decode()}
+
+@app.post("/ai/tts")
+async def our_tts(request: Request):
+    body = await request.json()
+    if (resp := await fault("ai_tts", cfg.tts_latency)) is not None:
+        return resp
+    return Response(_wav(_tone_pcm(body.get("text") or "")), media_type="audio/wav")
+
+@app.get("/standin/stats")
+def get_stats():
+    return {"stats": dict(stats), "config": {k: getattr(cfg, k) for k in
+            ("latency", "tts_latency", "error_rate", "rate_429", "retry_after", "strict")}}
+
+@app.post("/standin/config")
+async def set_config(request: Request):
+    """Cambia latencias/tasas de error en caliente (p.ej. para forzar el circuit breaker)."""
+    body = await request.json()
+    for k in ("latency", "tts_latency", "error_rate", "rate_429", "retry_after", "strict"):
+        if k in body:
+            setattr(cfg, k, type(getattr(cfg, k))(body[k]))
+    if body.get("reset_stats"):
+        stats.clear()
+    return get_stats()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Stand-in local de Gemini y TTS")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8790)
+    ap.add_argument("--latency", default="0", help="latencia de Gemini (ver docstring)")
+    ap.add_argument("--tts-latency", default="0")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="probabilidad de 503")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="probabilidad de 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--replay", type=Path, help="directorio con respuestas grabadas")
+    ap.add_argument("--strict", action="store_true", help="con --replay, 404 si no hay grabación")
+    ap.add_argument("--record", type=Path, help="graba en este directorio (requiere --upstream)")
+    ap.add_argument("--upstream", default="", help="p.ej. https://generativelanguage.googleapis.com")
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args(argv)
+
+    cfg.latency, cfg.tts_latency = args.latency, args.tts_latency
+    cfg.error_rate, cfg.rate_429, cfg.retry_after = args.error_rate, args.rate_429, args.retry_after
+    cfg.replay_dir, cfg.record_dir, cfg.upstream, cfg.strict = args.replay, args.record, args.upstream, args.strict
+    if args.record and not args.upstream:
+        ap.error("--record necesita --upstream")
+    if args.seed is not None:
+        rng.seed(args.seed)
+    sample_latency(cfg.latency); sample_latency(cfg.tts_latency)  # valida el formato al arrancar
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
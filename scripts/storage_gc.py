@@ -0,0 +1,25 @@
+"""
+Corre una pasada del GC de archivos generados (app/services/storage_gc.py).
+Uso:  python scripts/storage_gc.py [--dry-run]
+"""
+import sys, json, logging
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path: sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+load_dotenv(ROOT / ".env")
+
+from app.services import storage_gc
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    stats = storage_gc.run_once(dry_run="--dry-run" in sys.argv[1:])
+    if stats is None:
+        print("Otro proceso está corriendo el GC")
+        return 1
+    print(json.dumps(stats, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())